@@ -1,8 +1,12 @@
 const BACKEND_URL = "http://127.0.0.1:5173/api/chrome-activity";
+const BATCH_URL = "http://127.0.0.1:5173/api/chrome-activity/batch";
+const HEALTH_URL = "http://127.0.0.1:5173/api/health";
 const SYNC_INTERVAL_SECONDS = 10;
 const DOMAIN_CHANGE_MIN_MS = 2000;
+const SYNC_BATCH_SIZE = 200;
 
 let currentSession = null;
+let syncing = false;
 const pendingTimers = new Map();
 
 // --- Storage promisified helpers ---
@@ -43,6 +47,15 @@ async function readCurrentSessionFromStorage() { const res = await storageGet('c
 async function getQueuedSessions() { const res = await storageGet('unsentSessions'); return res.unsentSessions || []; }
 async function setQueuedSessions(sessions) { await storageSet({ unsentSessions: sessions }); }
 
+// Every change to the queue runs here, one at a time, on a fresh read of it,
+// so endSession and syncQueuedSessions never overwrite each other's changes
+let queueUpdate = Promise.resolve();
+function updateQueuedSessions(change) {
+  const next = queueUpdate.then(async () => setQueuedSessions(change(await getQueuedSessions())));
+  queueUpdate = next.catch(() => {});
+  return next;
+}
+
 // --- Session lifecycle ---
 async function startSession(windowId, url) {
   if (!url || url.startsWith('chrome://')) return;
@@ -64,10 +77,11 @@ async function endSession(endReason = 'unknown') {
     windowId: currentSession.windowId,
     end_reason: endReason
   };
+  const { chrome_profile } = await storageGet('chrome_profile');
+  payload.chrome_profile = chrome_profile || null;
   await removeCurrentSessionFromStorage();
-  const queue = await getQueuedSessions();
-  queue.push({ created_at: toISTIsoString(), session: payload });
-  await setQueuedSessions(queue);
+  const item = { created_at: toISTIsoString(), key: sessionKey(payload), session: payload };
+  await updateQueuedSessions(queue => queue.filter(it => it.key !== item.key).concat(item));
   currentSession = null;
   syncQueuedSessions();
 }
@@ -75,30 +89,60 @@ async function endSession(endReason = 'unknown') {
 // --- Backend helpers ---
 async function backendIsOnline() {
   try {
-    const resp = await fetch(BACKEND_URL, { method: 'GET' });
+    const resp = await fetch(HEALTH_URL, { method: 'HEAD' });
     return resp.ok;
   } catch { return false; }
 }
 
+// Same identity the backend dedupes on, so a resent session is never stored twice
+function sessionKey(session) {
+  return [session.chrome_profile, session.windowId, session.start_time, session.url]
+    .map(v => (v === undefined || v === null ? '' : String(v)))
+    .join('|');
+}
+
+// Drop sessions the backend has answered for; sessions queued meanwhile are kept
+async function trimQueuedSessions(doneKeys) {
+  if (doneKeys.size === 0) return;
+  await updateQueuedSessions(queue => queue.filter(it => !doneKeys.has(it.key)));
+}
+
 async function syncQueuedSessions() {
-  const items = await getQueuedSessions();
-  if (items.length === 0) return;
-  if (!(await backendIsOnline())) return;
-  for (const it of items) {
-    const session = it.session;
-    // attach chrome_profile before sending
+  if (syncing) return;
+  syncing = true;
+  try {
+    if ((await getQueuedSessions()).length === 0) return;
+    if (!(await backendIsOnline())) return;
+    // sessions queued before they were keyed at endSession get their chrome_profile and key now
     const { chrome_profile } = await storageGet('chrome_profile');
-    session.chrome_profile = chrome_profile || null;
-    try {
-      const resp = await fetch(BACKEND_URL, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(session)
-      });
-      if (!resp.ok) return; // stop on first bad response
-    } catch { return; }
+    await updateQueuedSessions(queue => queue.map(it => {
+      if (it.key) return it;
+      const session = { ...it.session, chrome_profile: chrome_profile || null };
+      return { ...it, key: sessionKey(session), session };
+    }));
+    const items = await getQueuedSessions();
+
+    for (let i = 0; i < items.length; i += SYNC_BATCH_SIZE) {
+      const batch = items.slice(i, i + SYNC_BATCH_SIZE)
+        .map(it => ({ ...it.session, idempotency_key: it.key }));
+      let result;
+      try {
+        const resp = await fetch(BATCH_URL, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify(batch)
+        });
+        if (!resp.ok) return; // keep the rest for the next sync
+        result = await resp.json();
+      } catch { return; }
+      // accepted, already stored or never storable: none of these need resending
+      const done = new Set([...result.accepted, ...result.duplicates]);
+      for (const r of result.rejected) { if (r.key !== null) done.add(r.key); }
+      await trimQueuedSessions(done);
+    }
+  } finally {
+    syncing = false;
   }
-  await setQueuedSessions([]);
 }
 
 // --- Timers ---
@@ -1,5 +1,7 @@
 # config.py
 import os
+import re
+import socket
 
 class TrackerConfig:
     """Configuration settings for the activity tracker"""
@@ -10,9 +12,66 @@ class TrackerConfig:
     # Minimum duration (in seconds) to log an app session
     MIN_DURATION = 1
     
-    # How often to check for active window changes (in seconds)
+    # How often to check for active window changes (in seconds) when
+    # ADAPTIVE_SAMPLING is off
     CHECK_INTERVAL = 1
     
+    # Adaptive sampling: poll every SAMPLE_MIN_INTERVAL seconds after a switch
+    # and back off by SAMPLE_BACKOFF per unchanged poll up to MAX_SWITCH_DELAY.
+    # After IDLE_THRESHOLD seconds without input, poll every IDLE_INTERVAL.
+    # A switch (and so a logged start/end time) is noticed at most
+    # max(MAX_SWITCH_DELAY, IDLE_INTERVAL) seconds late: MAX_SWITCH_DELAY while
+    # the user is active, IDLE_INTERVAL for a switch made as input resumes or by
+    # a window that opens on its own. Set IDLE_INTERVAL = MAX_SWITCH_DELAY to
+    # bound both by MAX_SWITCH_DELAY.
+    ADAPTIVE_SAMPLING = True
+    SAMPLE_MIN_INTERVAL = 0.5
+    SAMPLE_BACKOFF = 1.5
+    MAX_SWITCH_DELAY = 2
+    IDLE_THRESHOLD = 60
+    IDLE_INTERVAL = 5
+    
+    # Process names are cached by pid (checked against the creation time)
+    PROCESS_CACHE_SIZE = 256
+    
+    # Storage mode: "json" rewrites JSON_FILE on every session,
+    # "journal" appends to JSON_FILE + ".journal" and compacts in the background,
+    # "sqlite" inserts into SQLITE_FILE (the backend's STORAGE_BACKEND = "sqlite"),
+    # "partitioned" writes one file per day to PARTITION_DIR (STORAGE_BACKEND = "partitioned")
+    STORAGE_MODE = "json"
+    SQLITE_FILE = r"C:\Users\Ujjwal\Documents\Tracker saved data\activity.db"
+    PARTITION_DIR = r"C:\Users\Ujjwal\Documents\Tracker saved data\app_usage_days"
+    
+    # Partitioned mode: days older than this are compressed ("gzip" or "lzma";
+    # None keeps every day as plain JSON)
+    PARTITION_COMPRESS_AFTER_DAYS = 7
+    PARTITION_COMPRESSION = "gzip"
+    
+    # "http" pushes sessions to BACKEND_URL tagged with DEVICE_ID (this
+    # machine's host name when None), from an outbox next to JSON_FILE
+    BACKEND_URL = "http://localhost:5173"
+    DEVICE_ID = None
+    PUSH_INTERVAL = 10
+    PUSH_BATCH_SIZE = 500
+    
+    # Journal mode: seconds between fsyncs and between compactions into JSON_FILE
+    JOURNAL_FSYNC_INTERVAL = 5
+    JOURNAL_COMPACT_INTERVAL = 300
+    
+    # Write JSON_FILE in the dictionary-encoded compact format (json and
+    # journal modes); the backend reads both formats
+    COMPACT_FORMAT = False
+    
+    # Retention: sessions older than RETENTION_DAYS days are replaced by one
+    # entry per app per RETENTION_BUCKET ("minute" or "hour") holding their
+    # exact total time (None keeps every session). Pushed sessions ("http"
+    # mode) follow the backend's own RETENTION_* settings. With
+    # RETENTION_ARCHIVE_DIR set, the raw sessions are first appended to one
+    # gzip NDJSON file per month there.
+    RETENTION_DAYS = None
+    RETENTION_BUCKET = "hour"
+    RETENTION_ARCHIVE_DIR = None
+    
     # Apps to ignore for short session filtering
     DEFAULT_IGNORE_APPS = [
         'explorer.exe',
@@ -38,6 +97,13 @@ class TrackerConfig:
                 cls.JSON_FILE = "app_usage.json"
                 print(f"Fallback: Using current directory - {os.path.abspath(cls.JSON_FILE)}")
     
+    @classmethod
+    def get_device_id(cls):
+        """DEVICE_ID, or the host name cut down to the characters the backend accepts"""
+        if cls.DEVICE_ID:
+            return cls.DEVICE_ID
+        return re.sub(r"[^A-Za-z0-9_.-]", "-", socket.gethostname()).strip("-.")[:64] or "pc"
+    
     @classmethod
     def get_json_file_path(cls):
         """Get the JSON file path, ensuring directory exists"""
@@ -1,6 +1,20 @@
 # data_manager.py
+import gzip
+import hashlib
 import json
+import lzma
 import os
+import shutil
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import date as date_cls, timedelta
+from compact_format import decode, encode, is_compact
+from retention import DOWNSAMPLED, downsample_sessions, format_clock
 
 class DataManager:
     """Save sessions grouped by date:
@@ -11,10 +25,20 @@ class DataManager:
           "duration":10, "end_reason":"app_switch" }
       ]
     }
+
+    With `compact_format` the file is written in the dictionary-encoded format of
+    compact_format.py instead; either format is read.
+
+    With a `retention` policy (retention.py) the first write of each day also
+    downsamples the days that have fallen out of its window.
     """
 
-    def __init__(self, json_file):
+    def __init__(self, json_file, compact_format=False, retention=None):
         self.json_file = json_file
+        self.compact_format = compact_format
+        self.retention = retention
+        self._retained_on = None
+        self._upgrade_legacy_file()
 
     def log_app_change(self, app_info, start_time, end_time, duration=None, end_reason="app_switch"):
         date_str = start_time.strftime('%Y-%m-%d')
@@ -28,60 +52,138 @@ class DataManager:
         }
         self._append_entry(date_str, entry)
 
+    def close(self):
+        """Flush any buffered state. Plain JSON writes are synchronous."""
+        pass
+
     def _append_entry(self, date_str, entry):
         try:
-            data = {}
-            if os.path.exists(self.json_file):
-                try:
-                    with open(self.json_file, 'r', encoding='utf-8') as f:
-                        content = f.read().strip()
-                        if content:
-                            loaded = json.loads(content)
-                            # If file already uses the desired dict-by-date format
-                            if isinstance(loaded, dict):
-                                data = loaded
-                            # Convert legacy list-of-sessions format to dict-by-date if possible
-                            elif isinstance(loaded, list):
-                                grouped = {}
-                                for item in loaded:
-                                    if not isinstance(item, dict):
-                                        continue
-                                    d = item.get('date')
-                                    t = item.get('time', {})
-                                    start = t.get('start', '')
-                                    end = t.get('end', '')
-                                    app = item.get('app_name', '')
-                                    title = item.get('window_title', '')
-                                    dur = int(round(item.get('duration', 0)))
-                                    reason = item.get('session_end_reason', '')
-                                    new = {
-                                        "start": start,
-                                        "end": end,
-                                        "app": app,
-                                        "title": title,
-                                        "duration": dur,
-                                        "end_reason": reason
-                                    }
-                                    if d:
-                                        grouped.setdefault(d, []).append(new)
-                                data = grouped
-                            else:
-                                data = {}
-                except json.JSONDecodeError:
-                    print(f"Warning: JSON file {self.json_file} is corrupted, creating new structure")
-                    data = {}
+            data = self._load_data()
 
             # ensure date key exists and append
             data.setdefault(date_str, [])
             data[date_str].append(entry)
+            self._apply_retention(data)
 
-            with open(self.json_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            self._write_data(data)
 
         except Exception as e:
             print(f"Error saving JSON data: {e}")
             self._save_backup(date_str, entry)
 
+    def _retention_due(self):
+        """Today's date the first time this is asked each day, if there is a retention policy"""
+        today = date_cls.today().isoformat()
+        if self.retention is None or self._retained_on == today:
+            return None
+        self._retained_on = today
+        return today
+
+    def _apply_retention(self, data):
+        """Downsample old days of `data` in place, at most once a day; errors leave it as it was"""
+        today = self._retention_due()
+        if not today:
+            return
+        try:
+            downsampled = {date: data[date] for date in data}
+            changed = self.retention.apply(downsampled, today, self._archive_name())
+        except Exception as e:
+            print(f"Error downsampling old sessions: {e}")
+            return
+        data.update(downsampled)
+        if changed:
+            print(f"Downsampled {len(changed)} day(s) older than {self.retention.cutoff(today)}")
+
+    def _archive_name(self):
+        return os.path.splitext(os.path.basename(self.json_file))[0]
+
+    def _upgrade_legacy_file(self):
+        """Rewrite a legacy list-of-sessions file as dict-by-date once, at startup.
+
+        The original is kept as "<json_file>.legacy". Files in any other
+        format (including the SQLite database and the partition manifest
+        that subclasses pass here) are left alone.
+        """
+        try:
+            with open(self.json_file, 'rb') as f:
+                if not f.read(1024).lstrip().startswith(b'['):
+                    return
+            with open(self.json_file, 'r', encoding='utf-8') as f:
+                loaded = json.load(f)
+            shutil.copyfile(self.json_file, f"{self.json_file}.legacy")
+            self._write_data(self._convert_legacy(loaded))
+            print(f"Converted legacy session list in {self.json_file} to the dict-by-date format")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error converting legacy JSON file: {e}")
+
+    def _load_data(self):
+        """Read the JSON file as a dict-by-date (legacy lists are converted at startup)"""
+        data = {}
+        if os.path.exists(self.json_file):
+            try:
+                with open(self.json_file, 'r', encoding='utf-8') as f:
+                    content = f.read().strip()
+                    if content:
+                        loaded = json.loads(content)
+                        if is_compact(loaded):
+                            data = decode(loaded)
+                        # If file already uses the desired dict-by-date format
+                        elif isinstance(loaded, dict):
+                            data = loaded
+                        # Still a legacy list: the startup conversion failed, so do not overwrite it
+                        elif isinstance(loaded, list):
+                            raise ValueError(f"{self.json_file} is still in the legacy list format")
+                        else:
+                            data = {}
+            except json.JSONDecodeError:
+                print(f"Warning: JSON file {self.json_file} is corrupted, creating new structure")
+                data = {}
+        return data
+
+    @staticmethod
+    def _convert_legacy(loaded):
+        grouped = {}
+        for item in loaded:
+            if not isinstance(item, dict):
+                continue
+            d = item.get('date')
+            t = item.get('time', {})
+            start = t.get('start', '')
+            end = t.get('end', '')
+            app = item.get('app_name', '')
+            title = item.get('window_title', '')
+            dur = int(round(item.get('duration', 0)))
+            reason = item.get('session_end_reason', '')
+            new = {
+                "start": start,
+                "end": end,
+                "app": app,
+                "title": title,
+                "duration": dur,
+                "end_reason": reason
+            }
+            if d:
+                grouped.setdefault(d, []).append(new)
+        return grouped
+
+    def _write_data(self, data):
+        """Write the whole dict-by-date file via a temp file and an atomic rename"""
+        os.replace(self._write_temp(data), self.json_file)
+
+    def _write_temp(self, data):
+        """Write and fsync the dict-by-date file to "<json_file>.tmp"; returns its path"""
+        tmp_file = f"{self.json_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            if self.compact_format:
+                json.dump(encode(data), f, separators=(',', ':'), ensure_ascii=False)
+            else:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_file
+
     def _save_backup(self, date_str, entry):
         try:
             backup_file = f"{self.json_file}.backup"
@@ -100,3 +202,595 @@ class DataManager:
             print(f"Session data saved to backup file: {backup_file}")
         except Exception:
             print("Could not save backup data")
+
+
+class JournalDataManager(DataManager):
+    """Append sessions to an NDJSON journal instead of rewriting the JSON file.
+
+    Each session is one line in "<json_file>.journal":
+        {"date":"2025-08-15", "start":"01:58:01", "end":"01:58:11", ...}
+
+    A background thread fsyncs the journal every `fsync_interval` seconds and
+    every `compact_interval` seconds folds it into the dict-by-date JSON file
+    (written to a temp file and atomically renamed). The journal is renamed to
+    "<json_file>.journal.compacting" while it is folded, so a crash during
+    compaction is recovered on the next start.
+
+    Before the JSON file is replaced, "<json_file>.journal.folded" records the
+    SHA-256 of the .compacting file and of the new JSON file. If a crash
+    leaves the .compacting file behind after the rename, the digests match on
+    the next start and it is removed instead of being folded a second time.
+    """
+
+    def __init__(self, json_file, fsync_interval=5, compact_interval=300, compact_format=False, retention=None):
+        super().__init__(json_file, compact_format, retention)
+        self.journal_file = f"{json_file}.journal"
+        self.compacting_file = f"{self.journal_file}.compacting"
+        self.folded_file = f"{self.journal_file}.folded"
+        self.fsync_interval = fsync_interval
+        self.compact_interval = compact_interval
+
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._journal = None
+        self._dirty = False
+        self._stop = threading.Event()
+
+        # Fold whatever a previous run left behind before appending new sessions
+        self.compact()
+
+        self._worker = threading.Thread(target=self._run, name="journal-sync", daemon=True)
+        self._worker.start()
+
+    def _append_entry(self, date_str, entry):
+        record = {"date": date_str}
+        record.update(entry)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        try:
+            with self._lock:
+                if self._journal is None:
+                    self._journal = open(self.journal_file, 'a', encoding='utf-8')
+                self._journal.write(line)
+                self._journal.flush()
+                self._dirty = True
+        except Exception as e:
+            print(f"Error appending to journal: {e}")
+            self._save_backup(date_str, entry)
+
+    def _run(self):
+        last_compact = time.monotonic()
+        while not self._stop.wait(self.fsync_interval):
+            self._sync()
+            if time.monotonic() - last_compact >= self.compact_interval:
+                self.compact()
+                last_compact = time.monotonic()
+
+    def _sync(self):
+        with self._lock:
+            if self._journal is not None and self._dirty:
+                try:
+                    os.fsync(self._journal.fileno())
+                    self._dirty = False
+                except OSError as e:
+                    print(f"Error syncing journal: {e}")
+
+    def compact(self):
+        """Fold the journal into the JSON file with an atomic rename"""
+        with self._compact_lock:
+            with self._lock:
+                # A leftover .compacting file from a crash is folded first;
+                # the live journal then waits for the next round.
+                if not os.path.exists(self.compacting_file):
+                    if self._journal is not None:
+                        self._journal.flush()
+                        os.fsync(self._journal.fileno())
+                        self._journal.close()
+                        self._journal = None
+                        self._dirty = False
+                    if not os.path.exists(self.journal_file):
+                        return
+                    os.replace(self.journal_file, self.compacting_file)
+
+            try:
+                journal_digest = self._digest(self.compacting_file)
+                if self._folded() == [journal_digest, self._digest(self.json_file)]:
+                    print(f"Journal {self.compacting_file} was already folded into {self.json_file}")
+                else:
+                    entries = list(self._read_journal(self.compacting_file))
+                    if entries:
+                        data = self._load_data()
+                        for date_str, entry in entries:
+                            data.setdefault(date_str, []).append(entry)
+                        self._apply_retention(data)
+                        tmp_file = self._write_temp(data)
+                        self._write_folded([journal_digest, self._digest(tmp_file)])
+                        os.replace(tmp_file, self.json_file)
+                os.remove(self.compacting_file)
+                if os.path.exists(self.folded_file):
+                    os.remove(self.folded_file)
+            except Exception as e:
+                # Keep the .compacting file so the next round retries it
+                print(f"Error compacting journal: {e}")
+
+    @staticmethod
+    def _digest(path):
+        """SHA-256 of a file's bytes, or None if it does not exist"""
+        digest = hashlib.sha256()
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        except FileNotFoundError:
+            return None
+        return digest.hexdigest()
+
+    def _folded(self):
+        """[journal digest, JSON file digest] of the last fold that was started, or None"""
+        try:
+            with open(self.folded_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_folded(self, digests):
+        tmp_file = f"{self.folded_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(digests, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.folded_file)
+
+    def _read_journal(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line after a crash; everything before it is intact
+                    print(f"Warning: skipping corrupted journal line {line_no} in {path}")
+                    continue
+                date_str = record.pop('date', None)
+                if date_str:
+                    yield date_str, record
+
+    def close(self):
+        """Stop the background thread and fold the journal into the JSON file"""
+        self._stop.set()
+        self._worker.join()
+        self._sync()
+        self.compact()
+        # Fold the live journal too if a leftover .compacting file went first
+        if os.path.exists(self.journal_file):
+            self.compact()
+
+
+class HTTPDataManager(DataManager):
+    """Push sessions to a backend's POST /api/devices/<device_id>/sessions.
+
+    Each session is first appended to the NDJSON outbox "<json_file>.outbox"
+    (same lines as the journal). A background thread posts the outbox in
+    batches of `batch_size` every `push_interval` seconds. While a batch is
+    in flight the outbox is renamed to ".outbox.sending", and sent lines are
+    only dropped once the backend has accepted them, so sessions wait on disk
+    while the backend is unreachable or busy. A batch the backend refuses
+    outright (a 4xx other than 408/429) is appended to ".outbox.rejected"
+    instead of blocking the lines after it, and torn lines are skipped.
+    Every line carries a random "session_id", so a batch that is sent again
+    after a lost response is stored only once.
+    """
+
+    def __init__(self, json_file, url, device_id, push_interval=10, batch_size=500, timeout=10):
+        super().__init__(json_file)
+        self.outbox_file = f"{json_file}.outbox"
+        self.sending_file = f"{self.outbox_file}.sending"
+        self.rejected_file = f"{self.outbox_file}.rejected"
+        self._end_torn_line()
+        self.url = f"{url.rstrip('/')}/api/devices/{urllib.parse.quote(device_id)}/sessions"
+        self.push_interval = push_interval
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._push_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="session-push", daemon=True)
+        self._worker.start()
+
+    def _end_torn_line(self):
+        """End a line a crash left half written, so the next session gets a line of its own"""
+        try:
+            with open(self.outbox_file, 'rb+') as f:
+                if f.seek(0, os.SEEK_END) == 0:
+                    return
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+        except FileNotFoundError:
+            pass
+
+    def _append_entry(self, date_str, entry):
+        record = {"date": date_str}
+        record.update(entry)
+        record["session_id"] = uuid.uuid4().hex
+        try:
+            with self._lock:
+                with open(self.outbox_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"Error appending to outbox: {e}")
+            self._save_backup(date_str, entry)
+
+    def _run(self):
+        while not self._stop.wait(self.push_interval):
+            try:
+                self.push()
+            except Exception as e:
+                print(f"Error pushing sessions: {e}")
+
+    def push(self):
+        """Send everything in the outbox; returns False if the backend did not take it all"""
+        with self._push_lock:
+            with self._lock:
+                # A batch left over from a failed push goes first
+                if not os.path.exists(self.sending_file):
+                    if not os.path.exists(self.outbox_file):
+                        return True
+                    os.replace(self.outbox_file, self.sending_file)
+
+            lines = []
+            with open(self.sending_file, 'r', encoding='utf-8') as f:
+                for line_no, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        lines.append((line, json.loads(line)))
+                    except json.JSONDecodeError:
+                        # A torn last line after a crash; everything before it is intact
+                        print(f"Warning: skipping corrupted outbox line {line_no} in {self.sending_file}")
+            while lines:
+                batch = lines[:self.batch_size]
+                result = self._post([session for _, session in batch])
+                if result == "retry":
+                    return False
+                if result == "rejected":
+                    with open(self.rejected_file, 'a', encoding='utf-8') as f:
+                        f.writelines(line if line.endswith("\n") else line + "\n" for line, _ in batch)
+                    print(f"Moved {len(batch)} rejected sessions to {self.rejected_file}")
+                lines = lines[len(batch):]
+                # Sent lines are dropped right away so a later failure cannot resend them
+                with open(self.sending_file, 'w', encoding='utf-8') as f:
+                    f.writelines(line for line, _ in lines)
+            os.remove(self.sending_file)
+            return True
+
+    def _post(self, sessions):
+        """POST one batch; returns "sent", "retry" (unreachable, busy or failing)
+        or "rejected" (the backend will never accept it)"""
+        body = json.dumps(sessions, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(
+            self.url, data=body, method='POST', headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return "sent" if 200 <= response.status < 300 else "retry"
+        except urllib.error.HTTPError as e:
+            # 503: the backend's ingest queue is full; try again next round
+            if e.code != 503:
+                print(f"Backend rejected {len(sessions)} sessions: {e.code} {e.reason}")
+            if 400 <= e.code < 500 and e.code not in (408, 429):
+                return "rejected"
+            return "retry"
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Could not reach backend: {e}")
+            return "retry"
+
+    def close(self):
+        """Stop the background thread and make a last attempt to send the outbox"""
+        self._stop.set()
+        self._worker.join()
+        self.push()
+
+
+class SQLiteDataManager(DataManager):
+    """Insert sessions into a local SQLite database (WAL mode) shared with the backend.
+
+    The app_sessions table is defined in app_sessions.sql, which the backend
+    ships a copy of; start and end are stored as seconds since midnight of `date`.
+    """
+
+    SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app_sessions.sql")
+
+    def __init__(self, db_file, retention=None):
+        super().__init__(db_file, retention=retention)
+        self.db_file = db_file
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_file, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with open(self.SCHEMA_FILE, 'r', encoding='utf-8') as f:
+            self._conn.executescript(f.read())
+
+    def _append_entry(self, date_str, entry):
+        try:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO app_sessions (date, start_sec, end_sec, duration, app, app_key, title, end_reason) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        date_str,
+                        self._clock_seconds(entry["start"]),
+                        self._clock_seconds(entry["end"]),
+                        entry["duration"],
+                        entry["app"],
+                        entry["app"].lower(),
+                        entry["title"],
+                        entry["end_reason"],
+                    ),
+                )
+        except Exception as e:
+            print(f"Error saving session to SQLite: {e}")
+            # Fall back to the JSON backup next to the database
+            self._save_backup(date_str, entry)
+
+        today = self._retention_due()
+        if today:
+            try:
+                self.downsample_cold_days(today)
+            except Exception as e:
+                print(f"Error downsampling old sessions: {e}")
+
+    def downsample_cold_days(self, today):
+        """Replace the raw sessions of days before the retention cutoff with their buckets,
+        one transaction per day"""
+        cutoff = self.retention.cutoff(today)
+        dates = [row[0] for row in self._conn.execute(
+            "SELECT DISTINCT date FROM app_sessions WHERE date < ? AND end_reason != ? ORDER BY date",
+            (cutoff, DOWNSAMPLED),
+        )]
+        for date_str in dates:
+            entries = [
+                {"start": format_clock(start), "end": format_clock(end), "app": app,
+                 "title": title, "duration": duration, "end_reason": reason}
+                for start, end, duration, app, title, reason in self._conn.execute(
+                    "SELECT start_sec, end_sec, duration, app, title, end_reason FROM app_sessions "
+                    "WHERE date = ? ORDER BY id",
+                    (date_str,),
+                )
+            ]
+            self.retention.archive(
+                "app_usage", date_str[:7],
+                [dict({"date": date_str}, **e) for e in entries if e["end_reason"] != DOWNSAMPLED],
+            )
+            with self._conn:
+                self._conn.execute("DELETE FROM app_sessions WHERE date = ?", (date_str,))
+                self._conn.executemany(
+                    "INSERT INTO app_sessions (date, start_sec, end_sec, duration, app, app_key, title, end_reason) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (date_str, self._clock_seconds(e["start"]), self._clock_seconds(e["end"]), e["duration"],
+                         e["app"], e["app"].lower(), e["title"], e["end_reason"])
+                        for e in downsample_sessions(entries, self.retention.bucket_seconds)
+                    ],
+                )
+        if dates:
+            print(f"Downsampled {len(dates)} day(s) older than {cutoff}")
+
+    @staticmethod
+    def _clock_seconds(value):
+        h, m, s = value.split(':')
+        return int(h) * 3600 + int(m) * 60 + int(s)
+
+    def close(self):
+        self._conn.close()
+
+
+class PartitionedDataManager(DataManager):
+    """Write each day's sessions to its own file under `partition_dir`:
+
+        manifest.json         {"format": "partitions-v2", "revision": 57,
+                               "months": {"2025-08": {"file": "2025-08.index.json", "revision": 57}}}
+        2025-08.index.json    {"month": "2025-08", "revision": 57,
+                               "days": {"2025-08-15": {"file": "2025-08-15.json", "revision": 57,
+                                        "sessions": 140, "total_seconds": 31234,
+                                        "apps": [["code.exe", 20110], ...]}}}
+        2025-08-15.json       [{"start":"01:58:01", ...}, ...]
+        2025-08-01.json.gz    days older than `compress_after_days`
+
+    A session only rewrites its own day's file, its month's index and the
+    small manifest (each via a temp file, fsync and an atomic rename), so
+    writes stay the same size however long the history gets. The backend's
+    STORAGE_BACKEND = "partitioned" reads this layout
+    (Backend.v2/models/partitions.py). A partitions-v1 manifest, which held
+    every day's totals itself, is converted when the tracker starts.
+
+    With a `retention` policy, days before its cutoff are downsampled once
+    and marked "downsampled": true in their month's index.
+    """
+
+    MANIFEST = "manifest.json"
+    FORMAT = "partitions-v2"
+    COMPRESSORS = {"gzip": (".gz", gzip.open), "lzma": (".xz", lzma.open)}
+
+    def __init__(self, partition_dir, compress_after_days=7, compression="gzip", retention=None):
+        super().__init__(os.path.join(partition_dir, self.MANIFEST), retention=retention)
+        self.partition_dir = partition_dir
+        self.compress_after_days = compress_after_days
+        self.compression = compression
+        os.makedirs(partition_dir, exist_ok=True)
+        # month -> {date: day entry}, and the revision each month's index was last written at
+        self.revision = 0
+        self.months = {}
+        self._month_revisions = {}
+        self._changed_months = set()
+        self._load_manifest()
+        self._compressed_on = None
+
+    def _load_manifest(self):
+        try:
+            with open(self.json_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        except json.JSONDecodeError:
+            print(f"Warning: partition manifest {self.json_file} is corrupted, creating new structure")
+            manifest = {}
+        self.revision = manifest.get("revision", 0)
+        for month, entry in manifest.get("months", {}).items():
+            index = self._read_index(entry["file"])
+            self.months[month] = index.get("days", {})
+            self._month_revisions[month] = entry["revision"]
+        if "days" in manifest:
+            # partitions-v1: move the per-day totals into month indexes
+            for date, day in manifest["days"].items():
+                self._put_day(date, day)
+            self._write_manifest()
+            print(f"Converted {self.json_file} to {self.FORMAT}")
+
+    def _read_index(self, name):
+        try:
+            with open(os.path.join(self.partition_dir, name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Warning: partition index {name} is missing or corrupted: {e}")
+            return {}
+
+    def _day(self, date_str):
+        return self.months.get(date_str[:7], {}).get(date_str)
+
+    def _days(self):
+        """(date, day entry) of every day in date order"""
+        for month in sorted(self.months):
+            yield from self.months[month].items()
+
+    def _put_day(self, date_str, day):
+        month = date_str[:7]
+        days = self.months.setdefault(month, {})
+        added = date_str not in days
+        days[date_str] = day
+        if added and any(d > date_str for d in days):
+            self.months[month] = dict(sorted(days.items()))
+        self._changed_months.add(month)
+
+    def _write_manifest(self):
+        """Write the indexes of the months that changed, then the manifest"""
+        for month in sorted(self._changed_months):
+            self._write_json(
+                os.path.join(self.partition_dir, f"{month}.index.json"),
+                {"month": month, "revision": self.revision, "days": self.months[month]},
+            )
+            self._month_revisions[month] = self.revision
+        self._changed_months.clear()
+        months = {
+            month: {"file": f"{month}.index.json", "revision": self._month_revisions[month]}
+            for month in sorted(self.months)
+        }
+        self._write_json(self.json_file, {"format": self.FORMAT, "revision": self.revision, "months": months})
+
+    def _append_entry(self, date_str, entry):
+        try:
+            day = self._day(date_str)
+            entries = self._read_partition(day["file"]) if day else []
+            entries.append(entry)
+
+            name = f"{date_str}.json"
+            self._write_json(os.path.join(self.partition_dir, name), entries)
+
+            self.revision += 1
+            apps = dict(day["apps"]) if day else {}
+            key = entry["app"].lower()
+            apps[key] = apps.get(key, 0) + entry["duration"]
+            self._put_day(date_str, {
+                "file": name,
+                "revision": self.revision,
+                "sessions": (day["sessions"] if day else 0) + 1,
+                "total_seconds": (day["total_seconds"] if day else 0) + entry["duration"],
+                "apps": list(apps.items()),
+            })
+            self._write_manifest()
+
+            # A late session for a day that was already compressed
+            if day and day["file"] != name:
+                self._remove_partition(day["file"])
+
+            if self._compressed_on != date_str:
+                if self.retention is not None:
+                    self.downsample_cold_days(date_str)
+                self.compress_cold_days(date_str)
+                self._compressed_on = date_str
+
+        except Exception as e:
+            print(f"Error saving partitioned data: {e}")
+            self._save_backup(date_str, entry)
+
+    def downsample_cold_days(self, today):
+        """Replace the partitions of days before the retention cutoff with their buckets"""
+        cutoff = self.retention.cutoff(today)
+        cold = [date for date, day in self._days() if date < cutoff and not day.get("downsampled")]
+        for date in cold:
+            day = self._day(date)
+            data = {date: self._read_partition(day["file"])}
+            self.retention.apply(data, today, "app_usage")
+            compression = next(
+                (method for method, (suffix, _) in self.COMPRESSORS.items() if day["file"].endswith(suffix)), None
+            )
+            self._write_json(os.path.join(self.partition_dir, day["file"]), data[date], compression)
+            self.revision += 1
+            # Totals are unchanged; only the session count drops
+            self._put_day(date, dict(day, revision=self.revision, sessions=len(data[date]), downsampled=True))
+        if cold:
+            self._write_manifest()
+            print(f"Downsampled {len(cold)} day(s) older than {cutoff}")
+
+    def compress_cold_days(self, today):
+        """Compress the partitions of days more than `compress_after_days` before `today`"""
+        if not self.compression:
+            return
+        suffix, _ = self.COMPRESSORS[self.compression]
+        cutoff = (date_cls.fromisoformat(today) - timedelta(days=self.compress_after_days)).isoformat()
+        cold = [(date, day["file"]) for date, day in self._days() if date < cutoff and day["file"].endswith(".json")]
+        for date, name in cold:
+            entries = self._read_partition(name)
+            self._write_json(os.path.join(self.partition_dir, name + suffix), entries, self.compression)
+            self._put_day(date, dict(self._day(date), file=name + suffix))
+        if cold:
+            # A new revision makes readers read the month indexes again; until
+            # they do, they still find the old files
+            self.revision += 1
+            self._write_manifest()
+            for _, name in cold:
+                self._remove_partition(name)
+
+    def _read_partition(self, name):
+        path = os.path.join(self.partition_dir, name)
+        opener = open
+        for suffix, compressed_open in self.COMPRESSORS.values():
+            if name.endswith(suffix):
+                opener = compressed_open
+        try:
+            with opener(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _write_json(self, path, data, compression=None):
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'wb') as raw:
+            if compression:
+                with self.COMPRESSORS[compression][1](raw, 'wt', encoding='utf-8') as f:
+                    json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+            else:
+                raw.write(json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_file, path)
+
+    def _remove_partition(self, name):
+        try:
+            os.remove(os.path.join(self.partition_dir, name))
+        except OSError as e:
+            print(f"Could not remove old partition {name}: {e}")
@@ -9,7 +9,8 @@ def main():
         min_duration=TrackerConfig.MIN_DURATION,
         ignore_apps=TrackerConfig.DEFAULT_IGNORE_APPS
     )
-    tracker.start_tracking(check_interval=TrackerConfig.CHECK_INTERVAL)
+    # Adaptive sampling unless TrackerConfig.ADAPTIVE_SAMPLING is off
+    tracker.start_tracking()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,161 @@
+# retention.py
+"""Downsampling of old app sessions (the same algorithm as Backend.v2/models/retention.py).
+
+Days older than the retention window keep one entry per app per minute or
+hour bucket instead of one per window switch:
+
+    {"start": "14:00:00", "end": "14:41:07", "app": "Code.exe",
+     "title": <the title with the most time in the bucket>,
+     "duration": 2467, "end_reason": "downsampled"}
+
+Each session's duration is split at bucket boundaries, so per-app, per-day
+and per-hour totals stay exact. A bucket's entries are laid end to end
+from the start of the bucket, so they do not overlap each other, and an
+app that fills one bucket into the next stays a single entry.
+"""
+import gzip
+import json
+import os
+from datetime import date as date_cls, timedelta
+
+DOWNSAMPLED = "downsampled"
+BUCKET_SECONDS = {"minute": 60, "hour": 3600}
+
+
+def clock_seconds(value):
+    """'HH:MM:SS' -> seconds since midnight (0 if the value is malformed)"""
+    try:
+        h, m, s = str(value).split(':')
+        return int(h) * 3600 + int(m) * 60 + int(float(s))
+    except (ValueError, TypeError):
+        return 0
+
+
+def format_clock(seconds):
+    seconds = int(seconds) % 86400
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def downsample_sessions(entries, bucket_seconds):
+    """One day's session dicts as one entry per app per bucket, in time order.
+
+    Sessions are cut at midnight. A session that ran past it ends the last
+    bucket and keeps the time after midnight, so its entry ends before it
+    starts like the tracker's own entries for such sessions.
+    """
+    last_bucket = 86400 - bucket_seconds
+    buckets = {}  # (bucket start, app) -> [seconds, {title: seconds}]
+    crossed = {}  # app -> [seconds after midnight, {title: seconds}]
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            remaining = int(entry.get("duration", 0))
+        except (ValueError, TypeError):
+            continue
+        app = str(entry.get("app", ""))
+        title = str(entry.get("title", ""))
+        t = clock_seconds(entry.get("start"))
+        while remaining > 0 and t < 86400:
+            bucket = t - t % bucket_seconds
+            part = min(remaining, bucket + bucket_seconds - t)
+            totals = buckets.get((bucket, app))
+            if totals is None:
+                totals = buckets[(bucket, app)] = [0, {}]
+            totals[0] += part
+            totals[1][title] = totals[1].get(title, 0) + part
+            t += part
+            remaining -= part
+        if remaining > 0:
+            past = crossed.setdefault(app, [0, {}])
+            past[0] += remaining
+            past[1][title] = past[1].get(title, 0) + remaining
+
+    def order(item):
+        (bucket, app), _ = item
+        # In the last bucket the apps that ran past midnight go last, up to it
+        return bucket, bucket == last_bucket and app in crossed
+
+    runs = []  # [start, seconds, app, {title: seconds}]
+    cursor = 0
+    # Dicts keep insertion order, so apps within a bucket stay in first-seen order
+    for (bucket, app), (seconds, titles) in sorted(buckets.items(), key=order):
+        if bucket == last_bucket and app in crossed:
+            start = 86400 - seconds
+        else:
+            # Overlapping sessions can fill a bucket past its end; never pack past midnight
+            start = min(max(bucket, cursor), 86400 - seconds)
+        cursor = start + seconds
+        run = runs[-1] if runs else None
+        if run is not None and run[2] == app and run[0] + run[1] == start:
+            # A session that runs across buckets stays one entry
+            run[1] += seconds
+            for title, title_seconds in titles.items():
+                run[3][title] = run[3].get(title, 0) + title_seconds
+        else:
+            runs.append([start, seconds, app, titles])
+
+    for run in runs:
+        if run[0] + run[1] == 86400 and run[2] in crossed:
+            seconds, titles = crossed.pop(run[2])
+            run[1] += seconds
+            for title, title_seconds in titles.items():
+                run[3][title] = run[3].get(title, 0) + title_seconds
+    return [
+        {
+            "start": format_clock(start),
+            "end": format_clock(start + seconds),
+            "app": app,
+            "title": max(titles, key=titles.get),
+            "duration": seconds,
+            "end_reason": DOWNSAMPLED,
+        }
+        for start, seconds, app, titles in runs
+    ]
+
+
+class RetentionPolicy:
+    """Keep raw sessions for `keep_days` days, downsample older days into
+    `bucket` ("minute" or "hour") buckets and, with an `archive_dir`, append
+    the raw sessions to "<archive_dir>/<name>-<YYYY-MM>.ndjson.gz" first.
+    """
+
+    def __init__(self, keep_days, bucket="hour", archive_dir=None):
+        if keep_days < 1:
+            raise ValueError("keep_days must be at least 1")
+        if bucket not in BUCKET_SECONDS:
+            raise ValueError(f"bucket must be one of {', '.join(BUCKET_SECONDS)}")
+        self.keep_days = keep_days
+        self.bucket_seconds = BUCKET_SECONDS[bucket]
+        self.archive_dir = archive_dir
+
+    def cutoff(self, today):
+        """The oldest date that keeps its raw sessions"""
+        return (date_cls.fromisoformat(today) - timedelta(days=self.keep_days)).isoformat()
+
+    def archive(self, name, month, records):
+        """Append records as NDJSON lines to the month's gzip archive and fsync it"""
+        if not self.archive_dir or not records:
+            return
+        path = os.path.join(self.archive_dir, f"{name}-{month}.ndjson.gz")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode('utf-8')
+        # Every call adds a gzip member; gzip readers read them back as one stream
+        with open(path, 'ab') as f:
+            f.write(gzip.compress(payload))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def apply(self, data, today, name):
+        """Downsample the days of a dict-by-date before the cutoff in place; returns the dates changed"""
+        cutoff = self.cutoff(today)
+        changed = []
+        for date in sorted(d for d in data if d < cutoff):
+            entries = [e for e in data[date] if isinstance(e, dict)]
+            raw = [e for e in entries if e.get("end_reason") != DOWNSAMPLED]
+            if not raw:
+                continue
+            self.archive(name, date[:7], [dict({"date": date}, **e) for e in raw])
+            data[date] = downsample_sessions(entries, self.bucket_seconds)
+            changed.append(date)
+        return changed
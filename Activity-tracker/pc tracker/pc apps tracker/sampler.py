@@ -0,0 +1,46 @@
+# sampler.py
+
+
+class AdaptiveSampler:
+    """How long AppTracker sleeps between foreground checks.
+
+    After a switch it polls every `min_interval`; while the foreground stays
+    the same the interval grows by `backoff` per poll up to `max_interval`.
+    Once the user has been idle for `idle_threshold` seconds it polls every
+    `idle_interval` until input resumes, so a switch made as input resumes,
+    or by a window that opens on its own, can be noticed that late.
+
+    `max_delay`, max(max_interval, idle_interval), is therefore the
+    worst-case delay in noticing a switch and so the largest error in a
+    logged start/end time. Pass idle_interval <= max_interval to keep it at
+    max_interval.
+    """
+
+    def __init__(self, min_interval=0.5, max_interval=2.0, backoff=1.5, idle_threshold=60, idle_interval=5.0):
+        if min_interval <= 0 or idle_interval <= 0:
+            raise ValueError("sampling intervals must be positive")
+        if backoff < 1:
+            raise ValueError("backoff must be at least 1")
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = backoff
+        self.idle_threshold = idle_threshold
+        self.idle_interval = idle_interval
+        self.max_delay = max(self.max_interval, idle_interval)
+        self.interval = min_interval
+
+    @classmethod
+    def fixed(cls, interval):
+        """Poll every `interval` seconds, like the tracker always did"""
+        return cls(interval, interval, 1.0, float("inf"), interval)
+
+    def changed(self):
+        self.interval = self.min_interval
+        return self.interval
+
+    def unchanged(self, idle_seconds=0.0):
+        if idle_seconds >= self.idle_threshold:
+            self.interval = self.idle_interval
+        else:
+            self.interval = min(self.max_interval, max(self.min_interval, self.interval * self.backoff))
+        return self.interval
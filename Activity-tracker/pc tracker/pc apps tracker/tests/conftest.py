@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# The tracker's modules import each other as top-level modules (run from its folder)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
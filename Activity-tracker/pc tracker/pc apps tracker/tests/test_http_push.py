@@ -0,0 +1,77 @@
+# tests/test_http_push.py
+import json
+import os
+from datetime import datetime, timedelta
+from data_manager import HTTPDataManager
+
+START = datetime(2025, 9, 16, 9, 0, 0)
+
+
+def _open(tmp_path, responses):
+    """A manager whose POSTs answer with `responses` in turn; returns it and the batches sent"""
+    manager = HTTPDataManager(str(tmp_path / "app_usage.json"), "http://backend", "laptop",
+                              push_interval=3600, batch_size=2)
+    sent = []
+    manager._post = lambda sessions: sent.append([s["app"] for s in sessions]) or responses.pop(0)
+    return manager, sent
+
+
+def _log(manager, *apps):
+    for i, app in enumerate(apps):
+        start = START + timedelta(minutes=i)
+        manager.log_app_change({"app_name": app, "window_title": ""}, start, start + timedelta(seconds=30), 30)
+
+
+def _apps(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["app"] for line in f]
+
+
+def test_a_torn_outbox_line_is_skipped(tmp_path):
+    manager, _ = _open(tmp_path, [])
+    _log(manager, "a.exe", "b.exe")
+    with open(manager.outbox_file, "a", encoding="utf-8") as f:
+        f.write('{"date": "2025-09-16", "start": "09:0')
+
+    # The tracker restarts after the crash
+    manager, sent = _open(tmp_path, ["sent", "sent"])
+    _log(manager, "c.exe")
+
+    assert manager.push()
+    assert sent == [["a.exe", "b.exe"], ["c.exe"]]
+    assert not os.path.exists(manager.sending_file)
+
+
+def test_a_rejected_batch_is_moved_aside(tmp_path):
+    manager, sent = _open(tmp_path, ["rejected", "sent"])
+    _log(manager, "a.exe", "b.exe", "c.exe")
+
+    assert manager.push()
+    assert sent == [["a.exe", "b.exe"], ["c.exe"]]
+    assert _apps(manager.rejected_file) == ["a.exe", "b.exe"]
+
+
+def test_a_batch_is_kept_until_the_backend_takes_it(tmp_path):
+    manager, sent = _open(tmp_path, ["sent", "retry", "sent"])
+    _log(manager, "a.exe", "b.exe", "c.exe")
+
+    assert not manager.push()
+    assert _apps(manager.sending_file) == ["c.exe"]
+    _log(manager, "d.exe")
+    assert manager.push()
+    assert sent == [["a.exe", "b.exe"], ["c.exe"], ["c.exe"]]
+    assert _apps(manager.outbox_file) == ["d.exe"]
+
+
+def test_every_session_gets_its_own_id(tmp_path):
+    manager, _ = _open(tmp_path, [])
+    start = START
+    # Two sessions of one app in the same second look the same apart from their id
+    for _ in range(2):
+        manager.log_app_change({"app_name": "a.exe", "window_title": ""}, start, start, 0)
+
+    with open(manager.outbox_file, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    ids = [line.pop("session_id") for line in lines]
+    assert lines[0] == lines[1]
+    assert len(set(ids)) == 2
@@ -0,0 +1,103 @@
+# tests/test_journal.py
+import json
+import os
+from datetime import datetime, timedelta
+import data_manager
+from data_manager import JournalDataManager
+
+START = datetime(2025, 8, 15, 9, 0, 0)
+
+
+def _open(path):
+    # Long intervals: the tests drive syncs and compactions themselves
+    return JournalDataManager(str(path), fsync_interval=3600, compact_interval=3600)
+
+
+def _log(manager, count, offset=0):
+    for i in range(offset, offset + count):
+        start = START + timedelta(minutes=i)
+        manager.log_app_change({"app_name": f"app{i}.exe", "window_title": f"t{i}"}, start, start + timedelta(seconds=30), 30)
+
+
+def _sessions(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["2025-08-15"]
+
+
+def test_close_folds_journal_into_json(tmp_path):
+    path = tmp_path / "app_usage.json"
+    manager = _open(path)
+    _log(manager, 3)
+    manager.close()
+
+    assert [s["app"] for s in _sessions(path)] == ["app0.exe", "app1.exe", "app2.exe"]
+    assert not os.path.exists(manager.journal_file)
+    assert not os.path.exists(manager.compacting_file)
+    assert not os.path.exists(manager.folded_file)
+
+
+def test_journal_left_by_a_crash_is_folded_on_start(tmp_path):
+    path = tmp_path / "app_usage.json"
+    crashed = _open(path)
+    _log(crashed, 2)
+    crashed._stop.set()  # the process dies: no close(), no compaction
+
+    # A torn last line, as left by a crash in the middle of a write
+    with open(crashed.journal_file, "a", encoding="utf-8") as f:
+        f.write('{"date": "2025-08-15", "start": "09:0')
+
+    _open(path).close()
+    assert [s["app"] for s in _sessions(path)] == ["app0.exe", "app1.exe"]
+
+
+def test_crash_after_json_rename_does_not_fold_twice(tmp_path, monkeypatch):
+    path = tmp_path / "app_usage.json"
+    manager = _open(path)
+    _log(manager, 2)
+    manager.close()
+    second = _open(path)
+    _log(second, 3, offset=2)
+
+    # Crash after the JSON file was replaced but before the journal was removed
+    real_remove = os.remove
+
+    def crash(target):
+        if str(target).endswith(".compacting"):
+            raise OSError("simulated crash")
+        real_remove(target)
+
+    monkeypatch.setattr(data_manager.os, "remove", crash)
+    second.compact()
+    monkeypatch.setattr(data_manager.os, "remove", real_remove)
+    second._stop.set()
+    assert os.path.exists(second.compacting_file)
+    assert len(_sessions(path)) == 5
+
+    _open(path).close()
+    assert [s["app"] for s in _sessions(path)] == [f"app{i}.exe" for i in range(5)]
+    assert not os.path.exists(second.compacting_file)
+    assert not os.path.exists(second.folded_file)
+
+
+def test_crash_before_json_rename_folds_again(tmp_path, monkeypatch):
+    path = tmp_path / "app_usage.json"
+    manager = _open(path)
+    _log(manager, 2)
+
+    # Crash after the digests were recorded but before the JSON file was replaced
+    real_replace = os.replace
+
+    def crash(src, dst):
+        if str(dst) == str(path):
+            raise OSError("simulated crash")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(data_manager.os, "replace", crash)
+    manager.compact()
+    monkeypatch.setattr(data_manager.os, "replace", real_replace)
+    manager._stop.set()
+    assert not os.path.exists(path)
+    assert os.path.exists(manager.folded_file)
+
+    _open(path).close()
+    assert [s["app"] for s in _sessions(path)] == ["app0.exe", "app1.exe"]
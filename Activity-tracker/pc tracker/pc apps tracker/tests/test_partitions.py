@@ -0,0 +1,64 @@
+# tests/test_partitions.py
+import json
+import os
+from datetime import datetime, timedelta
+from data_manager import PartitionedDataManager
+
+START = datetime(2025, 7, 1, 9, 0, 0)
+
+
+def _log(manager, day, minute=0, app="Code.exe"):
+    start = START + timedelta(days=day, minutes=minute)
+    manager.log_app_change({"app_name": app, "window_title": ""}, start, start + timedelta(seconds=30), 30)
+
+
+def _json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_a_session_rewrites_only_its_day_its_month_and_the_manifest(tmp_path, monkeypatch):
+    manager = PartitionedDataManager(str(tmp_path), compression=None)
+    for day in range(90):
+        _log(manager, day)
+
+    written = []
+    write_json = manager._write_json
+    monkeypatch.setattr(manager, "_write_json", lambda path, *args: written.append(path) or write_json(path, *args))
+    _log(manager, 89, minute=5)
+    assert [os.path.basename(p) for p in written] == ["2025-09-28.json", "2025-09.index.json", "manifest.json"]
+
+    manifest = _json(tmp_path / "manifest.json")
+    assert manifest["format"] == "partitions-v2" and "days" not in manifest
+    assert list(manifest["months"]) == ["2025-07", "2025-08", "2025-09"]
+    index = _json(tmp_path / "2025-09.index.json")
+    assert index["days"]["2025-09-28"]["sessions"] == 2
+    assert index["days"]["2025-09-28"]["revision"] == manifest["revision"] == 91
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_a_partitions_v1_manifest_is_converted(tmp_path):
+    day = {"file": "2025-07-01.json", "revision": 3, "sessions": 1, "total_seconds": 30, "apps": [["code.exe", 30]]}
+    (tmp_path / "2025-07-01.json").write_text(json.dumps([{"start": "09:00:00", "end": "09:00:30",
+        "app": "Code.exe", "title": "", "duration": 30, "end_reason": "app_switch"}]), encoding="utf-8")
+    (tmp_path / "manifest.json").write_text(json.dumps(
+        {"format": "partitions-v1", "revision": 3, "days": {"2025-07-01": day}}), encoding="utf-8")
+
+    manager = PartitionedDataManager(str(tmp_path), compression=None)
+    assert _json(tmp_path / "manifest.json") == {
+        "format": "partitions-v2", "revision": 3, "months": {"2025-07": {"file": "2025-07.index.json", "revision": 3}},
+    }
+    assert _json(tmp_path / "2025-07.index.json")["days"] == {"2025-07-01": day}
+
+    _log(manager, 0, minute=1)
+    assert PartitionedDataManager(str(tmp_path), compression=None)._day("2025-07-01")["sessions"] == 2
+
+
+def test_compressed_days_stay_readable(tmp_path):
+    manager = PartitionedDataManager(str(tmp_path), compress_after_days=7, compression="gzip")
+    for day in range(10):
+        _log(manager, day)
+    assert manager._day("2025-07-01")["file"] == "2025-07-01.json.gz"
+    assert manager._day("2025-07-10")["file"] == "2025-07-10.json"
+    assert manager._read_partition("2025-07-01.json.gz")[0]["app"] == "Code.exe"
+    assert not os.path.exists(tmp_path / "2025-07-01.json")
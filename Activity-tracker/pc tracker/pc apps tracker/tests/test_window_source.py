@@ -0,0 +1,119 @@
+# tests/test_window_source.py
+import pytest
+from config import TrackerConfig
+from sampler import AdaptiveSampler
+from tracker import AppTracker
+from window_source import FakeWindowSource, ProcessNameCache
+
+# About an hour of work, with one idle stretch (no input after the switch)
+SCRIPT = [
+    (600, "Code.exe", "main.py"),
+    (45, "chrome.exe", "Docs"),
+    (1800, "Code.exe", "main.py"),
+    (300, "slack.exe", "general", True),
+    (20, "chrome.exe", "Mail"),
+    (900, "Code.exe", "tests.py"),
+]
+
+
+class RecordingDataManager:
+    def __init__(self):
+        self.sessions = []
+        self.closed = False
+
+    def log_app_change(self, app_info, start_time, end_time, duration=None, end_reason="app_switch"):
+        self.sessions.append((app_info["app_name"], app_info["window_title"], start_time, end_time, end_reason))
+
+    def close(self):
+        self.closed = True
+
+
+def _replay(check_interval=None):
+    source = FakeWindowSource(SCRIPT)
+    data = RecordingDataManager()
+    AppTracker(window_source=source, data_manager=data).start_tracking(check_interval)
+    assert data.closed
+    return source, data.sessions
+
+
+def test_adaptive_sampling_logs_the_same_sessions_with_fewer_wakeups(monkeypatch):
+    monkeypatch.setattr(TrackerConfig, "ADAPTIVE_SAMPLING", True)
+    fixed_source, fixed = _replay(check_interval=1)
+    adaptive_source, adaptive = _replay()
+
+    assert [s[:2] for s in adaptive] == [s[:2] for s in fixed] == [step[1:3] for step in SCRIPT]
+    assert [s[4] for s in adaptive] == ["app_switch"] * 5 + ["tracking_stopped"]
+    # A switch is noticed at most MAX_SWITCH_DELAY late, or IDLE_INTERVAL after an idle stretch
+    tracker = AppTracker(window_source=FakeWindowSource(SCRIPT), data_manager=RecordingDataManager())
+    tolerance = tracker._make_sampler(None).max_delay
+    assert tolerance == max(TrackerConfig.MAX_SWITCH_DELAY, TrackerConfig.IDLE_INTERVAL)
+    for (_, _, start, end, _), (_, _, fixed_start, fixed_end, _) in zip(adaptive, fixed):
+        assert abs((start - fixed_start).total_seconds()) <= tolerance
+        assert abs((end - fixed_end).total_seconds()) <= tolerance
+
+    assert adaptive_source.wakeups < fixed_source.wakeups / 2
+    # One name lookup per app: the pid's name is cached across switches
+    assert adaptive_source.name_lookups == fixed_source.name_lookups == 3
+
+
+def test_sampler_never_sleeps_past_its_max_delay():
+    sampler = AdaptiveSampler(min_interval=0.5, max_interval=2, idle_interval=5)
+    assert sampler.max_delay == 5
+    intervals = [sampler.unchanged() for _ in range(10)] + [sampler.unchanged(idle_seconds=120)]
+    assert max(intervals) == sampler.max_delay
+    assert sampler.changed() == 0.5
+
+    # With the idle interval below the back-off cap the bound is the cap
+    assert AdaptiveSampler(max_interval=2, idle_interval=2).max_delay == 2
+    for bad in (dict(min_interval=0), dict(idle_interval=0), dict(backoff=0.5)):
+        with pytest.raises(ValueError):
+            AdaptiveSampler(**bad)
+
+
+class ReusedPidSource:
+    """Processes by pid whose creation time can change, as when Windows reuses a pid"""
+
+    def __init__(self):
+        self.processes = {}
+        self.lookups = 0
+
+    def process_create_time(self, pid):
+        process = self.processes.get(pid)
+        return process[0] if process else None
+
+    def process_name(self, pid):
+        self.lookups += 1
+        return self.processes[pid][1]
+
+
+def test_process_name_cache_looks_a_reused_pid_up_again():
+    source = ReusedPidSource()
+    cache = ProcessNameCache(source)
+    source.processes[4242] = (100.0, "Code.exe")
+    assert cache.get(4242) == "Code.exe"
+    assert cache.get(4242) == "Code.exe"
+    assert source.lookups == 1
+
+    # The process exited and a new one got the same pid
+    source.processes[4242] = (250.0, "notepad.exe")
+    assert cache.get(4242) == "notepad.exe"
+    assert source.lookups == 2
+
+    del source.processes[4242]
+    assert cache.get(4242) is None
+
+
+def test_process_name_cache_evicts_the_least_recently_used():
+    source = ReusedPidSource()
+    cache = ProcessNameCache(source, max_size=2)
+    for pid in (1, 2, 3):
+        source.processes[pid] = (0.0, f"app{pid}.exe")
+    cache.get(1)
+    cache.get(2)
+    cache.get(1)
+    cache.get(3)  # evicts pid 2
+    assert source.lookups == 3
+    cache.get(1)
+    assert source.lookups == 3
+    cache.get(2)
+    assert source.lookups == 4
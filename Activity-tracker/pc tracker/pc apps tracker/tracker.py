@@ -1,39 +1,112 @@
 # tracker.py
-import time
-from datetime import datetime
 from config import TrackerConfig
-from utils import get_active_window_info, should_log_session
-from data_manager import DataManager
+from utils import ignore_set, should_log_session
+from data_manager import DataManager, HTTPDataManager, JournalDataManager, PartitionedDataManager, SQLiteDataManager
+from retention import RetentionPolicy
+from sampler import AdaptiveSampler
+from window_source import ProcessNameCache, Win32WindowSource
 
 class AppTracker:
     """Main class for tracking Windows application usage"""
     
-    def __init__(self, json_file=None, min_duration=None, ignore_apps=None):
+    def __init__(self, json_file=None, min_duration=None, ignore_apps=None, window_source=None, data_manager=None):
         self.json_file = json_file or TrackerConfig.JSON_FILE
         self.min_duration = min_duration or TrackerConfig.MIN_DURATION
         self.ignore_apps = ignore_apps or TrackerConfig.DEFAULT_IGNORE_APPS
+        self._ignore_set = ignore_set(self.ignore_apps)
+        
+        # Foreground window source (FakeWindowSource in tests) and name cache
+        self.window_source = window_source or Win32WindowSource()
+        self.process_names = ProcessNameCache(self.window_source, TrackerConfig.PROCESS_CACHE_SIZE)
         
         # Tracking state
         self.current_app = None
         self.start_time = None
         self.is_running = True
+        self._last_window = None
         
         # Data management
-        self.data_manager = DataManager(self.json_file)
+        retention = None
+        if TrackerConfig.RETENTION_DAYS:
+            retention = RetentionPolicy(
+                TrackerConfig.RETENTION_DAYS, TrackerConfig.RETENTION_BUCKET, TrackerConfig.RETENTION_ARCHIVE_DIR
+            )
+        if data_manager is not None:
+            self.data_manager = data_manager
+        elif TrackerConfig.STORAGE_MODE == "journal":
+            self.data_manager = JournalDataManager(
+                self.json_file,
+                fsync_interval=TrackerConfig.JOURNAL_FSYNC_INTERVAL,
+                compact_interval=TrackerConfig.JOURNAL_COMPACT_INTERVAL,
+                compact_format=TrackerConfig.COMPACT_FORMAT,
+                retention=retention
+            )
+        elif TrackerConfig.STORAGE_MODE == "sqlite":
+            self.data_manager = SQLiteDataManager(TrackerConfig.SQLITE_FILE, retention=retention)
+        elif TrackerConfig.STORAGE_MODE == "partitioned":
+            self.data_manager = PartitionedDataManager(
+                TrackerConfig.PARTITION_DIR,
+                compress_after_days=TrackerConfig.PARTITION_COMPRESS_AFTER_DAYS,
+                compression=TrackerConfig.PARTITION_COMPRESSION,
+                retention=retention
+            )
+        elif TrackerConfig.STORAGE_MODE == "http":
+            self.data_manager = HTTPDataManager(
+                self.json_file,
+                TrackerConfig.BACKEND_URL,
+                TrackerConfig.get_device_id(),
+                push_interval=TrackerConfig.PUSH_INTERVAL,
+                batch_size=TrackerConfig.PUSH_BATCH_SIZE
+            )
+        else:
+            self.data_manager = DataManager(
+                self.json_file, compact_format=TrackerConfig.COMPACT_FORMAT, retention=retention
+            )
     
     def log_app_change(self, app_info, start_time, end_time, duration=None, end_reason="app_switch"):
         """Log an app change if it meets the criteria"""
         if duration is not None and not should_log_session(
-            app_info['app_name'], duration, self.min_duration, self.ignore_apps
+            app_info['app_name'], duration, self.min_duration, self._ignore_set
         ):
             print(f"Skipped short session: {app_info['app_name']} - {duration:.1f}s")
             return
         
         self.data_manager.log_app_change(app_info, start_time, end_time, duration, end_reason)
     
+    def _make_sampler(self, check_interval):
+        if check_interval or not TrackerConfig.ADAPTIVE_SAMPLING:
+            return AdaptiveSampler.fixed(check_interval or TrackerConfig.CHECK_INTERVAL)
+        return AdaptiveSampler(
+            min_interval=TrackerConfig.SAMPLE_MIN_INTERVAL,
+            max_interval=TrackerConfig.MAX_SWITCH_DELAY,
+            backoff=TrackerConfig.SAMPLE_BACKOFF,
+            idle_threshold=TrackerConfig.IDLE_THRESHOLD,
+            idle_interval=TrackerConfig.IDLE_INTERVAL,
+        )
+    
+    def _current_app_id(self):
+        """'app|title' of the foreground window, or None if it cannot be read.
+        
+        The process name is only looked up when the window changed.
+        """
+        window = self.window_source.foreground()
+        if window is None:
+            return None
+        if window == self._last_window:
+            return self.current_app
+        app_name = self.process_names.get(window[0])
+        if app_name is None:
+            return None
+        self._last_window = window
+        return f"{app_name}|{window[1]}"
+    
     def start_tracking(self, check_interval=None):
-        """Start the tracking process"""
-        check_interval = check_interval or TrackerConfig.CHECK_INTERVAL
+        """Start the tracking process.
+        
+        A `check_interval` polls at that fixed rate; without one the
+        adaptive sampler from TrackerConfig is used.
+        """
+        sampler = self._make_sampler(check_interval)
         
         print("Starting Windows app usage tracking...")
         print(f"JSON data: {self.json_file}")
@@ -43,12 +116,13 @@ class AppTracker:
         
         try:
             while self.is_running:
-                current_info = get_active_window_info()
-                if current_info:
-                    current_app_id = f"{current_info['app_name']}|{current_info['window_title']}"
-                    
-                    if self.current_app != current_app_id:
-                        end_time = datetime.now()
+                current_app_id = self._current_app_id()
+                if current_app_id:
+                    if self.current_app == current_app_id:
+                        sampler.unchanged(self.window_source.idle_seconds())
+                    else:
+                        sampler.changed()
+                        end_time = self.window_source.now()
                         
                         # Log the previous app session
                         if self.current_app and self.start_time:
@@ -59,15 +133,16 @@ class AppTracker:
                             }
                             self.log_app_change(prev_info, self.start_time, end_time, duration, "app_switch")
                             
-                            if should_log_session(prev_info['app_name'], duration, self.min_duration, self.ignore_apps):
+                            if should_log_session(prev_info['app_name'], duration, self.min_duration, self._ignore_set):
                                 print(f"Logged: {prev_info['app_name']} - {duration:.1f}s (switched)")
                         
                         # Start tracking new app
                         self.current_app = current_app_id
                         self.start_time = end_time
-                        print(f"Switched to: {current_info['app_name']} - {current_info['window_title']}")
+                        app_name, window_title = current_app_id.split('|', 1)
+                        print(f"Switched to: {app_name} - {window_title}")
                 
-                time.sleep(check_interval)
+                self.window_source.sleep(sampler.interval)
                 
         except KeyboardInterrupt:
             self._handle_shutdown("tracking_stopped")
@@ -82,7 +157,7 @@ class AppTracker:
         
         if self.current_app and self.start_time:
             try:
-                end_time = datetime.now()
+                end_time = self.window_source.now()
                 duration = (end_time - self.start_time).total_seconds()
                 final_info = {
                     'app_name': self.current_app.split('|')[0],
@@ -90,9 +165,10 @@ class AppTracker:
                 }
                 self.log_app_change(final_info, self.start_time, end_time, duration, end_reason)
                 
-                if should_log_session(final_info['app_name'], duration, self.min_duration, self.ignore_apps):
+                if should_log_session(final_info['app_name'], duration, self.min_duration, self._ignore_set):
                     print(f"Final app logged: {final_info['app_name']} - {duration:.1f}s ({end_reason})")
             except Exception as e:
                 print(f"Could not save final session due to error: {e}")
         
+        self.data_manager.close()
         print("Tracking stopped. Data saved.")
\ No newline at end of file
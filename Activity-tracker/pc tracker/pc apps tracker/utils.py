@@ -1,31 +1,43 @@
 # utils.py 
-import win32gui
-import win32process
-import psutil
-from datetime import datetime
+from window_source import ProcessNameCache, Win32WindowSource
+
+_default_source = None
+_default_names = None
 
 def get_active_window_info():
     """Get information about the currently active window"""
+    global _default_source, _default_names
     try:
-        hwnd = win32gui.GetForegroundWindow()
-        window_title = win32gui.GetWindowText(hwnd)
-        _, pid = win32process.GetWindowThreadProcessId(hwnd)
-        process = psutil.Process(pid)
-        app_name = process.name()
+        if _default_source is None:
+            _default_source = Win32WindowSource()
+            _default_names = ProcessNameCache(_default_source)
+        window = _default_source.foreground()
+        if window is None:
+            return None
+        pid, window_title = window
         return {
-            'app_name': app_name,
+            'app_name': _default_names.get(pid),
             'window_title': window_title,
             'pid': pid,
-            'timestamp': datetime.now()
+            'timestamp': _default_source.now()
         }
     except Exception as e:
         print(f"Error getting window info: {e}")
         return None
 
+def ignore_set(ignore_apps):
+    """Lower-cased frozenset of app names, built once for should_log_session"""
+    return frozenset(app.lower() for app in ignore_apps)
+
 def should_log_session(app_name, duration, min_duration, ignore_apps):
-    """Determine if a session should be logged based on duration and app type"""
+    """Determine if a session should be logged based on duration and app type.
+
+    `ignore_apps` is ideally an ignore_set(); any other iterable is converted per call.
+    """
     if duration >= min_duration:
         return True
-    if app_name.lower() in [app.lower() for app in ignore_apps]:
+    if not isinstance(ignore_apps, frozenset):
+        ignore_apps = ignore_set(ignore_apps)
+    if app_name.lower() in ignore_apps:
         return False
-    return True
\ No newline at end of file
+    return True
@@ -0,0 +1,167 @@
+# window_source.py
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+
+class WindowSource:
+    """Where the tracker gets the foreground window from.
+
+    foreground() returns (pid, window_title) or None; process names are
+    resolved separately (see ProcessNameCache) so an unchanged foreground
+    costs no process lookup at all. now() and sleep() are the tracker's
+    clock, which lets FakeWindowSource replay a whole day instantly.
+    """
+
+    def foreground(self):
+        raise NotImplementedError
+
+    def idle_seconds(self):
+        """Seconds since the last keyboard or mouse input"""
+        return 0.0
+
+    def process_create_time(self, pid):
+        """Creation time of `pid`, or None if it no longer exists"""
+        raise NotImplementedError
+
+    def process_name(self, pid):
+        raise NotImplementedError
+
+    def now(self):
+        return datetime.now()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class Win32WindowSource(WindowSource):
+    """The real foreground window, via pywin32 and psutil"""
+
+    def __init__(self):
+        import psutil
+        import win32api
+        import win32gui
+        import win32process
+        self._psutil = psutil
+        self._win32api = win32api
+        self._win32gui = win32gui
+        self._win32process = win32process
+
+    def foreground(self):
+        try:
+            hwnd = self._win32gui.GetForegroundWindow()
+            title = self._win32gui.GetWindowText(hwnd)
+            _, pid = self._win32process.GetWindowThreadProcessId(hwnd)
+            return pid, title
+        except Exception as e:
+            print(f"Error getting window info: {e}")
+            return None
+
+    def idle_seconds(self):
+        try:
+            ticks = (self._win32api.GetTickCount() - self._win32api.GetLastInputInfo()) & 0xFFFFFFFF
+            return ticks / 1000.0
+        except Exception:
+            return 0.0
+
+    def process_create_time(self, pid):
+        try:
+            return self._psutil.Process(pid).create_time()
+        except (self._psutil.NoSuchProcess, self._psutil.AccessDenied, ValueError):
+            return None
+
+    def process_name(self, pid):
+        return self._psutil.Process(pid).name()
+
+
+class FakeWindowSource(WindowSource):
+    """Replays a script of foreground windows on a fake clock (for tests on any OS).
+
+    `steps` is a list of (seconds, app_name, window_title) or
+    (seconds, app_name, window_title, idle) tuples. Each app gets a stable
+    fake pid. When the script runs out, sleep() raises KeyboardInterrupt so
+    AppTracker goes through its normal shutdown. The counters record how
+    much work the tracker did.
+    """
+
+    def __init__(self, steps, start=datetime(2025, 1, 1, 9, 0, 0)):
+        self.steps = [tuple(step) + (False,) * (4 - len(step)) for step in steps]
+        self.start = start
+        self.elapsed = 0.0
+        self.total = sum(step[0] for step in self.steps)
+        self._pids = {}
+        self.foreground_calls = 0
+        self.name_lookups = 0
+        self.wakeups = 0
+
+    def _step(self):
+        """(step, seconds since it started) at the current fake time"""
+        t = 0.0
+        for step in self.steps:
+            if self.elapsed < t + step[0]:
+                return step, self.elapsed - t
+            t += step[0]
+        return None, 0.0
+
+    def foreground(self):
+        self.foreground_calls += 1
+        step, _ = self._step()
+        if step is None:
+            return None
+        pid = self._pids.setdefault(step[1], 1000 + len(self._pids))
+        return pid, step[2]
+
+    def idle_seconds(self):
+        # An idle step has no input after the switch that started it
+        step, into = self._step()
+        return into if step is not None and step[3] else 0.0
+
+    def process_create_time(self, pid):
+        return 0.0 if pid in self._pids.values() else None
+
+    def process_name(self, pid):
+        self.name_lookups += 1
+        return next(name for name, p in self._pids.items() if p == pid)
+
+    def now(self):
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def sleep(self, seconds):
+        self.wakeups += 1
+        self.elapsed += seconds
+        if self.elapsed >= self.total:
+            raise KeyboardInterrupt
+
+
+class ProcessNameCache:
+    """pid -> process name, validated by the process creation time.
+
+    A pid that was reused by a new process has a different creation time
+    and is looked up again. Least recently used entries are evicted past
+    `max_size`.
+    """
+
+    def __init__(self, source, max_size=256):
+        self.source = source
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, pid):
+        created = self.source.process_create_time(pid)
+        if created is None:
+            self._entries.pop(pid, None)
+            return None
+        entry = self._entries.get(pid)
+        if entry is not None and entry[0] == created:
+            self._entries.move_to_end(pid)
+            return entry[1]
+        try:
+            name = self.source.process_name(pid)
+        except Exception as e:
+            print(f"Error getting process name for pid {pid}: {e}")
+            return None
+        self._entries[pid] = (created, name)
+        self._entries.move_to_end(pid)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return name
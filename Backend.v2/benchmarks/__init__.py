@@ -0,0 +1,7 @@
+# benchmarks/__init__.py
+"""Synthetic-data benchmarks for the backend and the tracker's DataManager.
+
+    python -m benchmarks generate --days 1826 --out bench-data
+    python -m benchmarks run --data-dir bench-data --out before.json
+    python -m benchmarks compare before.json after.json
+"""
@@ -0,0 +1,80 @@
+# benchmarks/__main__.py
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks.generate import write_dataset
+from benchmarks.run import compare, run_all
+
+
+def generate_command(args):
+    """Write a deterministic synthetic dataset"""
+    for path in write_dataset(args.out, args.days, args.seed, args.compact):
+        print(f"Wrote {path} ({os.path.getsize(path)} bytes)")
+    return 0
+
+
+def run_command(args):
+    """Run the benchmarks and write the results as JSON"""
+    data_dir = args.data_dir
+    if data_dir is None:
+        data_dir = tempfile.mkdtemp(prefix="activity-bench-data-")
+        write_dataset(data_dir, args.days, args.seed, args.compact)
+    results = run_all(data_dir, args.iterations, args.backend, args.only, args.days, args.seed)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+    return 0
+
+
+def compare_command(args):
+    """Compare two result files and fail if the second one regressed"""
+    with open(args.base, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    regressions = compare(base, new, args.threshold)
+    for name, metric, old, value in regressions:
+        print(f"REGRESSION {name} {metric}: {old:.3f} -> {value:.3f} ({(value / old - 1) * 100:+.1f}%)")
+    if regressions:
+        return 1
+    print(f"No regressions over {args.threshold:.0%}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Activity Tracker benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help=generate_command.__doc__)
+    generate.add_argument("--days", type=int, default=30, help="1 day up to 5 years (1826)")
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--out", default="bench-data")
+    generate.add_argument("--compact", action="store_true", help="write app_usage.json in the compact format")
+    generate.set_defaults(func=generate_command)
+
+    run = commands.add_parser("run", help=run_command.__doc__)
+    run.add_argument("--days", type=int, default=30, help="size of the generated dataset")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--data-dir", help="use a dataset written by 'generate' instead")
+    run.add_argument("--compact", action="store_true", help="generate app_usage.json in the compact format")
+    run.add_argument("--iterations", type=int, default=50)
+    run.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    run.add_argument("--only", help="only run benchmarks whose name contains this")
+    run.add_argument("--out", default="bench-results.json")
+    run.set_defaults(func=run_command)
+
+    cmp = commands.add_parser("compare", help=compare_command.__doc__)
+    cmp.add_argument("base")
+    cmp.add_argument("new")
+    cmp.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown as a fraction")
+    cmp.set_defaults(func=compare_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
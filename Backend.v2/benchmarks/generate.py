@@ -0,0 +1,117 @@
+# benchmarks/generate.py
+import json
+import os
+import random
+from datetime import date, datetime, timedelta
+from models.compact_format import encode
+
+# (app, weight, titles) - a few apps dominate, like real usage
+APPS = [
+    ("chrome.exe", 40, ["New Tab - Google Chrome", "YouTube - Google Chrome", "Inbox (3) - Gmail - Google Chrome",
+                        "Stack Overflow - Google Chrome", "GitHub - Google Chrome", "ChatGPT - Google Chrome"]),
+    ("Code.exe", 25, ["app_usage.json - Code - Visual Studio Code", "tracker.py - Code - Visual Studio Code",
+                      "main.py - Backend.v2 - Visual Studio Code", "README.md - Code - Visual Studio Code"]),
+    ("WindowsTerminal.exe", 8, ["Windows PowerShell", "Command Prompt", "python main.py"]),
+    ("explorer.exe", 6, ["File Explorer", "Downloads", "Desktop", ""]),
+    ("Discord.exe", 6, ["#general - Discord", "Friends - Discord"]),
+    ("Spotify.exe", 4, ["Spotify Premium", "Discover Weekly - Spotify"]),
+    ("WINWORD.EXE", 3, ["Report.docx - Word", "Notes.docx - Word"]),
+    ("EXCEL.EXE", 3, ["Budget.xlsx - Excel"]),
+    ("vlc.exe", 3, ["movie.mkv - VLC media player"]),
+    ("Notepad.exe", 2, ["Untitled - Notepad", "todo.txt - Notepad"]),
+]
+
+DOMAINS = [
+    ("youtube.com", 30), ("chatgpt.com", 15), ("github.com", 12), ("stackoverflow.com", 10),
+    ("mail.google.com", 8), ("docs.python.org", 6), ("reddit.com", 6), ("en.wikipedia.org", 5),
+    ("netflix.com", 4), ("localhost", 4),
+]
+
+END_REASONS = ["switch_tab", "domain_change", "url_change_same_domain", "tab_closed"]
+
+
+def _weighted(rng, items):
+    return rng.choices(items, weights=[item[1] for item in items])[0]
+
+
+def _duration(rng):
+    """Seconds; mostly short switches with a long tail of focused work"""
+    return max(1, min(3 * 3600, int(rng.lognormvariate(4.0, 1.4))))
+
+
+def generate_app_usage(days, seed=0, first_day=date(2021, 1, 1)):
+    """Dict-by-date app usage like the tracker writes, for `days` consecutive days"""
+    rng = random.Random(seed)
+    data = {}
+    for n in range(days):
+        day = first_day + timedelta(days=n)
+        t = rng.randint(7 * 3600, 11 * 3600)
+        day_end = rng.randint(20 * 3600, 86399)
+        sessions = []
+        while t < day_end:
+            app, _, titles = _weighted(rng, APPS)
+            duration = min(_duration(rng), 86399 - t)
+            if duration <= 0:
+                break
+            sessions.append({
+                "start": f"{t // 3600:02d}:{t % 3600 // 60:02d}:{t % 60:02d}",
+                "end": f"{(t + duration) // 3600:02d}:{(t + duration) % 3600 // 60:02d}:{(t + duration) % 60:02d}",
+                "app": app,
+                "title": rng.choice(titles),
+                "duration": duration,
+                "end_reason": "app_switch",
+            })
+            # Occasional idle gap between sessions
+            t += duration + (rng.randint(60, 1800) if rng.random() < 0.05 else 0)
+        data[day.isoformat()] = sessions
+    return data
+
+
+def _chrome_time(dt):
+    return dt.strftime("%Y-%m-%d %H:%M:%S.") + f"{dt.microsecond // 1000:03d}"
+
+
+def generate_chrome_record(rng, start, legacy=False):
+    """One raw extension record starting at datetime `start`, in either shape"""
+    domain = _weighted(rng, DOMAINS)[0]
+    url = f"https://{domain}/{rng.randrange(10 ** 6):x}"
+    end = start + timedelta(milliseconds=rng.randint(500, 600000))
+    if legacy:
+        return {"site": domain, "url": url, "ST": _chrome_time(start), "ET": _chrome_time(end)}
+    return {
+        "domain": domain,
+        "url": url,
+        "start_time": _chrome_time(start),
+        "end_time": _chrome_time(end),
+        "end_reason": rng.choice(END_REASONS),
+        "windowId": 1125671955,
+    }
+
+
+def generate_chrome_usage(days, seed=0, first_day=date(2021, 1, 1), per_day=60, legacy_share=0.05):
+    """Array of raw Chrome records over `days` days, mixing both record shapes"""
+    rng = random.Random(seed + 1)
+    records = []
+    for n in range(days):
+        t = datetime.combine(first_day + timedelta(days=n), datetime.min.time()) + timedelta(hours=8)
+        for _ in range(per_day):
+            t += timedelta(milliseconds=rng.randint(1000, 900000))
+            record = generate_chrome_record(rng, t, legacy=rng.random() < legacy_share)
+            records.append(record)
+    return records
+
+
+def write_dataset(out_dir, days, seed=0, compact=False):
+    """Write app_usage.json (optionally in the compact format) and chrome_usage.json to out_dir; returns their paths"""
+    os.makedirs(out_dir, exist_ok=True)
+    app_file = os.path.join(out_dir, "app_usage.json")
+    chrome_file = os.path.join(out_dir, "chrome_usage.json")
+    with open(app_file, "w", encoding="utf-8") as f:
+        if compact:
+            json.dump(encode(generate_app_usage(days, seed)), f, separators=(",", ":"), ensure_ascii=False)
+        else:
+            json.dump(generate_app_usage(days, seed), f, indent=2, ensure_ascii=False)
+    with open(chrome_file, "w", encoding="utf-8") as f:
+        json.dump(generate_chrome_usage(days, seed), f, indent=2, ensure_ascii=False)
+    return app_file, chrome_file
+
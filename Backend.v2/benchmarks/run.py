@@ -0,0 +1,306 @@
+# benchmarks/run.py
+import json
+import math
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from random import Random
+from models.compact_format import is_compact
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRACKER_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "Activity-tracker", "pc tracker", "pc apps tracker")
+
+# name -> setup(env) returning a zero-argument step, or (step, close)
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class Env:
+    """Paths of one benchmark's private copy of the dataset"""
+
+    def __init__(self, work_dir, data_dir, backend):
+        self.work_dir = work_dir
+        self.app_file = os.path.join(work_dir, "app_usage.json")
+        self.chrome_file = os.path.join(work_dir, "chrome_usage.json")
+        self.segment_dir = os.path.join(work_dir, "chrome_segments")
+        self.db_file = os.path.join(work_dir, "activity.db")
+        self.backend = backend
+        shutil.copy(os.path.join(data_dir, "app_usage.json"), self.app_file)
+        shutil.copy(os.path.join(data_dir, "chrome_usage.json"), self.chrome_file)
+        with open(self.app_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        dates = sorted(data["days"] if is_compact(data) else data)
+        # A day in the middle of the history, so range scans have work on both sides
+        self.date = dates[len(dates) // 2]
+        self.rng = Random(0)
+
+    def configure(self):
+        """Point the backend Config at this copy (before anything reads it)"""
+        from config import Config
+        Config.JSON_FILE = self.app_file
+        Config.CHROME_JSON_FILE = self.chrome_file
+        Config.CHROME_SEGMENT_DIR = self.segment_dir
+        Config.SQLITE_FILE = self.db_file
+        Config.STORAGE_BACKEND = self.backend
+        if self.backend == "sqlite":
+            from models.chrome_store import ChromeSegmentStore
+            from models.sqlite_store import migrate_from_json
+            from models.usage_store import UsageStore
+            migrate_from_json(self.db_file, UsageStore(self.app_file), ChromeSegmentStore(self.segment_dir, self.chrome_file))
+
+    def client(self):
+        self.configure()
+        from main import create_app
+        from models.chrome_store import get_chrome_store
+        app = create_app(background_jobs=False)
+        # Run the one-off normalization before anything is timed
+        get_chrome_store().migrate_in_background().join()
+        return app.test_client()
+
+    def chrome_record(self):
+        from benchmarks.generate import generate_chrome_record
+        return generate_chrome_record(self.rng, datetime.now() - timedelta(minutes=5))
+
+
+# ---- tracker writes ----
+
+def _log_app_change(manager):
+    app_info = {"app_name": "Code.exe", "window_title": "main.py - Backend.v2 - Visual Studio Code"}
+
+    def step():
+        end = datetime.now()
+        manager.log_app_change(app_info, end - timedelta(seconds=42), end, 42)
+    return step, manager.close
+
+
+@benchmark("tracker.log_app_change[json]")
+def _bench_log_json(env):
+    from data_manager import DataManager
+    return _log_app_change(DataManager(env.app_file))
+
+
+@benchmark("tracker.log_app_change[journal]")
+def _bench_log_journal(env):
+    from data_manager import JournalDataManager
+    return _log_app_change(JournalDataManager(env.app_file))
+
+
+@benchmark("tracker.log_app_change[sqlite]")
+def _bench_log_sqlite(env):
+    from data_manager import SQLiteDataManager
+    return _log_app_change(SQLiteDataManager(env.db_file))
+
+
+# ---- chrome ingest ----
+
+@benchmark("chrome.process_chrome_activity")
+def _bench_process_chrome(env):
+    env.client()
+    from models.chrome_activity import process_chrome_activity
+    return lambda: process_chrome_activity([env.chrome_record()])
+
+
+@benchmark("chrome.post")
+def _bench_chrome_post(env):
+    client = env.client()
+    return lambda: _check(client.post("/api/chrome-activity", json=env.chrome_record()), 201)
+
+
+@benchmark("chrome.post_batch[50 new + 50 replayed]")
+def _bench_chrome_post_batch(env):
+    client = env.client()
+    previous = []
+
+    def step():
+        batch = [env.chrome_record() for _ in range(50)]
+        _check(client.post("/api/chrome-activity/batch", json=previous + batch))
+        previous[:] = batch
+    return step
+
+
+@benchmark("chrome.get")
+def _bench_chrome_get(env):
+    client = env.client()
+    return lambda: _check(client.get("/api/chrome-activity"))
+
+
+@benchmark("chrome.get[day,limit=100]")
+def _bench_chrome_get_page(env):
+    client = env.client()
+    url = f"/api/chrome-activity?from={env.date}&to={env.date}&limit=100"
+    return lambda: _check(client.get(url))
+
+
+# ---- analytics routes ----
+
+def _route(path):
+    def setup(env):
+        client = env.client()
+        url = f"/api/{env.date}/{path}"
+        return lambda: _check(client.get(url))
+    return setup
+
+
+for _path in (
+    "top-applications", "total-screen-time", "top-domains", "domains-by-hour", "sunBurst-Chart",
+    "browser-domains", "sunBurst-Chart?split=domains",
+):
+    benchmark(f"route./<date>/{_path}")(_route(_path))
+
+
+@benchmark("route./heatmap[365 days]")
+def _bench_heatmap(env):
+    client = env.client()
+    first = (datetime.fromisoformat(env.date) - timedelta(days=364)).date().isoformat()
+    url = f"/api/heatmap?from={first}&to={env.date}"
+    return lambda: _check(client.get(url))
+
+
+@benchmark("route./search[all time]")
+def _bench_search(env):
+    client = env.client()
+    return lambda: _check(client.get("/api/search?q=code"))
+
+
+def _check(response, status=200):
+    if response.status_code != status:
+        raise RuntimeError(f"Unexpected status {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+# ---- measurement ----
+
+def _peak_rss():
+    """Peak resident set size of this process in bytes, or None if unknown"""
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    except (ImportError, AttributeError):
+        return None
+
+
+def _io_bytes():
+    """(bytes read, bytes written) by this process so far, or None if unknown"""
+    try:
+        with open("/proc/self/io", "r") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except OSError:
+        pass
+    try:
+        import psutil
+        io = psutil.Process().io_counters()
+        return io.read_bytes, io.write_bytes
+    except (ImportError, AttributeError):
+        return None
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def run_one(name, data_dir, iterations, backend="json"):
+    """Run one benchmark in this process and return its result dict"""
+    sys.path[:0] = [BACKEND_DIR, TRACKER_DIR]
+    work_dir = tempfile.mkdtemp(prefix="activity-bench-")
+    try:
+        env = Env(work_dir, data_dir, backend)
+        setup = BENCHMARKS[name](env)
+        step, close = setup if isinstance(setup, tuple) else (setup, None)
+
+        start = time.perf_counter()
+        step()
+        first = time.perf_counter() - start
+
+        io_before = _io_bytes()
+        times = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            step()
+            times.append(time.perf_counter() - start)
+        io_after = _io_bytes()
+        if close is not None:
+            close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    times.sort()
+    result = {
+        "iterations": iterations,
+        "first_ms": first * 1000,
+        "p50_ms": _percentile(times, 0.50) * 1000,
+        "p99_ms": _percentile(times, 0.99) * 1000,
+        "mean_ms": sum(times) / len(times) * 1000,
+        "peak_rss_bytes": _peak_rss(),
+        "bytes_read": None,
+        "bytes_written": None,
+    }
+    if io_before and io_after:
+        # Per iteration, so runs with different --iterations compare
+        result["bytes_read"] = (io_after[0] - io_before[0]) // iterations
+        result["bytes_written"] = (io_after[1] - io_before[1]) // iterations
+    return result
+
+
+def run_all(data_dir, iterations=50, backend="json", only=None, days=None, seed=None):
+    """Run every benchmark (or those whose name contains `only`), each in a fresh process.
+
+    A fresh process per benchmark keeps caches and peak RSS from leaking
+    between them.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in BENCHMARKS:
+        if only and only not in name:
+            continue
+        with context.Pool(1) as pool:
+            results[name] = pool.apply(run_one, (name, data_dir, iterations, backend))
+        r = results[name]
+        print(f"{name:40} p50 {r['p50_ms']:9.3f} ms  p99 {r['p99_ms']:9.3f} ms  first {r['first_ms']:9.3f} ms")
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "days": days,
+            "seed": seed,
+            "iterations": iterations,
+            "backend": backend,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(base, new, threshold=0.10):
+    """Names and metrics where `new` is worse than `base` by more than `threshold` (a fraction)"""
+    regressions = []
+    for name, after in new["results"].items():
+        before = base["results"].get(name)
+        if before is None:
+            continue
+        for metric in ("p50_ms", "p99_ms", "peak_rss_bytes", "bytes_read", "bytes_written"):
+            old, value = before.get(metric), after.get(metric)
+            if old is None or value is None:
+                continue
+            # Ignore noise on metrics that are tiny to begin with
+            floor = 0.05 if metric.endswith("_ms") else 4096
+            if value > max(old, floor) * (1 + threshold):
+                regressions.append((name, metric, old, value))
+    return regressions
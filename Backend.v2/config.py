@@ -14,8 +14,90 @@ class Config:
     # Data file settings
     JSON_FILE = r"C:\Users\Ujjwal\Desktop\Code\Activity tracker\activity tracker 4.0\Activity-Tracker-All-in-One\Backend.v2\Tracker saved data\app_usage.json"
     CHROME_JSON_FILE = r"C:\Users\Ujjwal\Desktop\Code\Activity tracker\activity tracker 4.0\Activity-Tracker-All-in-One\Backend.v2\Tracker saved data\chrome_usage.json"
+    # Per-day totals of JSON_FILE are saved next to it as "<JSON_FILE>.rollups";
+    # check them against the raw sessions with: python manage.py rebuild-rollups --check
 
+    # Chrome activity is appended to NDJSON segments in this folder;
+    # CHROME_JSON_FILE is only read as the legacy first segment
+    CHROME_SEGMENT_DIR = r"C:\Users\Ujjwal\Desktop\Code\Activity tracker\activity tracker 4.0\Activity-Tracker-All-in-One\Backend.v2\Tracker saved data\chrome_segments"
+    CHROME_SEGMENT_MAX_BYTES = 8 * 1024 * 1024
 
-    
+    # POST /api/chrome-activity/batch takes at most CHROME_BATCH_MAX sessions
+    # and skips ones already stored. Keys of the newest CHROME_DEDUPE_RECENT_DAYS
+    # days are kept exactly, older ones in a Bloom filter sized for
+    # CHROME_DEDUPE_BLOOM_CAPACITY keys (about 1.2 MB per million).
+    CHROME_BATCH_MAX = 500
+    CHROME_DEDUPE_RECENT_DAYS = 2
+    CHROME_DEDUPE_BLOOM_CAPACITY = 1000000
+
+    # App sessions of this process are split into the Chrome extension's
+    # domains by /api/<date>/browser-domains and sunBurst-Chart?split=domains
+    BROWSER_APP = "chrome.exe"
+
+    # Storage backend: "json" (files above), "sqlite" (SQLITE_FILE, WAL mode)
+    # or "partitioned" (one app usage file per day in PARTITION_DIR).
+    # Fill a new database from the JSON files with: python manage.py migrate-sqlite
+    # Split app_usage.json into partitions with: python manage.py partition
+    STORAGE_BACKEND = "json"
+    SQLITE_FILE = r"C:\Users\Ujjwal\Desktop\Code\Activity tracker\activity tracker 4.0\Activity-Tracker-All-in-One\Backend.v2\Tracker saved data\activity.db"
+    PARTITION_DIR = r"C:\Users\Ujjwal\Desktop\Code\Activity tracker\activity tracker 4.0\Activity-Tracker-All-in-One\Backend.v2\Tracker saved data\app_usage_days"
+    # Days kept parsed in memory by the partitioned store
+    PARTITION_CACHE_DAYS = 32
+
+    # Longest span (days) of ?from=&to= accepted by the /api/range routes and
+    # /api/heatmap, and by /api/range with granularity=day; longer ranges get
+    # a 400. RANGE_CACHE_SIZE merged range results are kept (least recently used go).
+    RANGE_MAX_DAYS = 20 * 366
+    RANGE_MAX_DAYS_DAILY = 5 * 366
+    RANGE_CACHE_SIZE = 32
+
+    # HTTP caching: responses that only cover days before today may be cached
+    # this long (seconds) before they are revalidated with their ETag. Past days
+    # still change (late device pushes, Chrome batches, retention downsampling),
+    # so keep this short. JSON bodies at least this big are gzip/brotli encoded.
+    HTTP_PAST_DAY_MAX_AGE = 300
+    HTTP_COMPRESS_MIN_BYTES = 1024
+
+    # Prometheus metrics at /api/metrics (latency histograms, bytes read and
+    # written, cache hit ratios). Read at startup; when off nothing is timed.
+    METRICS_ENABLED = False
+    # With metrics on, a request sent with "X-Profile: 1" returns a sampled
+    # stack profile (folded format) instead of its normal body
+    PROFILE_REQUESTS = False
+
+    # Data pushed by other machines (POST /api/devices/<id>/sessions and Chrome
+    # records sent with X-Device-Id) is stored per device under DEVICE_DATA_DIR.
+    # Pushed sessions wait in a queue of at most INGEST_QUEUE_SIZE batches.
+    DEVICE_DATA_DIR = r"C:\Users\Ujjwal\Desktop\Code\Activity tracker\activity tracker 4.0\Activity-Tracker-All-in-One\Backend.v2\Tracker saved data\devices"
+    INGEST_QUEUE_SIZE = 1000
+
+    # Retention: Chrome records and pushed device sessions older than
+    # RETENTION_DAYS days are replaced once a day by one record per domain
+    # (or app) per RETENTION_BUCKET ("minute" or "hour") holding the exact
+    # total time; None keeps everything. This machine's app sessions follow
+    # the tracker's own RETENTION_* settings. With RETENTION_ARCHIVE_DIR set,
+    # the raw data is first appended to one gzip NDJSON file per month there.
+    # Run it by hand with: python manage.py downsample
+    RETENTION_DAYS = None
+    RETENTION_BUCKET = "hour"
+    RETENTION_ARCHIVE_DIR = None
+
+    # Live updates at /api/stream (Server-Sent Events): seconds between polls
+    # of the data files, most open streams, events queued per client before
+    # it is sent a "resync" instead, and seconds between keepalive comments
+    STREAM_POLL_INTERVAL = 1.0
+    STREAM_MAX_CLIENTS = 4
+    STREAM_QUEUE_SIZE = 256
+    STREAM_KEEPALIVE = 15
+    STREAM_RETRY_MS = 3000
+    STREAM_CHROME_BATCH = 100
 
-    
\ No newline at end of file
+    # Production serving (python serve.py): threads per process and worker
+    # processes. With several workers the supervisor parses the app usage
+    # data once and publishes a memory-mapped snapshot to SNAPSHOT_DIR.
+    SERVE_THREADS = 8
+    SERVE_WORKERS = 1
+    SNAPSHOT_DIR = r"C:\Users\Ujjwal\Desktop\Code\Activity tracker\activity tracker 4.0\Activity-Tracker-All-in-One\Backend.v2\Tracker saved data\snapshots"
+    # Set by serve.py inside worker processes; leave these alone
+    USAGE_SNAPSHOT_DIR = None
+    CHROME_WRITER_TAG = ""
@@ -1,24 +1,60 @@
 # main.py
-from flask import Flask, send_from_directory
+from flask import Flask, jsonify, send_from_directory
 from flask_cors import CORS
 from config import Config
 from routes.analytics import analytics_bp
 from routes.chrome_activity import chrome_activity_bp
+from routes.devices import devices_bp
+from routes.metrics import metrics_bp
+from routes.stream import stream_bp
+from routes.http_cache import compress_response
+from models.chrome_store import get_chrome_store
+from models.retention import start_retention_job
 
-app = Flask(__name__, static_folder="../frontend/dist", static_url_path="/")
 
-# Enable CORS for all routes to allow extension requests
-CORS(app, resources={r"/*": {"origins": "*"}})
+def create_app(background_jobs=True):
+    """Build the Flask app.
 
-app.register_blueprint(analytics_bp, url_prefix="/api")
-app.register_blueprint(chrome_activity_bp, url_prefix="/api")
+    `background_jobs` starts the one-off Chrome record migration and the
+    daily retention job. With several workers, serve.py starts both once in
+    its supervisor process (serve._start_background_jobs) and passes False
+    to each worker.
+    """
+    app = Flask(__name__, static_folder="../frontend/dist", static_url_path="/")
+
+    # Enable CORS for all routes to allow extension requests
+    CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=["X-Next-Cursor"])
+
+    app.register_blueprint(analytics_bp, url_prefix="/api")
+    app.register_blueprint(chrome_activity_bp, url_prefix="/api")
+    app.register_blueprint(metrics_bp, url_prefix="/api")
+    app.register_blueprint(stream_bp, url_prefix="/api")
+    app.register_blueprint(devices_bp, url_prefix="/api")
+
+    # gzip/brotli for large API bodies when the client accepts it
+    app.after_request(compress_response)
+
+    if background_jobs:
+        # Normalize Chrome records stored before ingest-time normalization existed
+        get_chrome_store().migrate_in_background()
+        # Downsample old Chrome records once a day (when Config.RETENTION_DAYS is set)
+        start_retention_job()
+
+    @app.route("/")
+    def main_app():
+        return send_from_directory(app.static_folder, "index.html")
+
+    # Cheap liveness probe for the Chrome extension and monitoring
+    @app.route("/api/health", methods=["GET", "HEAD"])
+    def health():
+        return jsonify({"status": "ok"})
+
+    return app
 
-@app.route("/")
-def main_app():
-    return send_from_directory(app.static_folder, "index.html")
 
 if __name__ == "__main__":
-    app.run(
+    # Development server; use serve.py in production
+    create_app().run(
         debug=Config.DEBUG,
         host=Config.HOST,
         port=Config.PORT,
@@ -0,0 +1,230 @@
+# manage.py
+import argparse
+import json
+import os
+import sys
+from config import Config
+
+
+def rebuild_rollups(args):
+    """Fold the per-day rollups again from the raw sessions and check the saved ones against them"""
+    from models.rollups import compare_rollups, rollup_entry, rollup_sessions
+
+    if args.partition_dir:
+        from models.partitions import ManifestWriter, PartitionedUsageStore
+
+        store = PartitionedUsageStore(args.partition_dir)
+        if not store.exists():
+            print(f"No partitions in {args.partition_dir}")
+            return 1
+        fresh = {date: rollup_sessions(sessions) for date, sessions in store.days().items()}
+        stored = {date: store.rollup(date) for date in store.dates()}
+        current, stale = fresh, []
+        target = "the month indexes"
+    else:
+        from models.usage_store import UsageStore, day_fingerprint, read_saved_rollups, save_rollups
+
+        store = UsageStore(args.json_file or Config.JSON_FILE, save_rollups=False)
+        saved = read_saved_rollups(store.rollup_file)
+        days = store.base_days()
+        fresh = {date: rollup_sessions(sessions) for date, sessions in days.items()}
+        digests = {date: day_fingerprint(sessions) for date, sessions in days.items()}
+        # Days saved with another fingerprint are folded again on load, so only
+        # the ones the store would take from the file have to match
+        stored = {date: rollup for date, (digest, rollup) in saved.items() if digests.get(date) == digest}
+        current = {date: fresh[date] for date in stored}
+        stale = sorted(date for date in set(fresh) | set(saved) if date not in stored)
+        target = store.rollup_file
+
+    mismatched = compare_rollups(stored, current)
+    print(f"Folded rollups of {len(fresh)} days ({sum(r.session_count for r in fresh.values())} sessions)")
+    if stale:
+        print(f"{len(stale)} days are not saved in {target} or changed since (folded on load)")
+    if mismatched:
+        print(f"Saved rollups differ from the raw sessions on {len(mismatched)} days: {', '.join(mismatched)}")
+    else:
+        print("All saved rollups match the raw sessions")
+    if args.check:
+        return 1 if mismatched else 0
+
+    if args.partition_dir:
+        if mismatched:
+            index = ManifestWriter(args.partition_dir)
+            for date in mismatched:
+                index.put(date, dict(index.get(date), revision=index.bump(), **rollup_entry(fresh[date])))
+            index.write()
+            print(f"Rewrote the totals of {len(mismatched)} days in {target}")
+    else:
+        save_rollups(target, digests, fresh)
+        print(f"Wrote the rollups of {len(fresh)} days to {target}")
+    return 0
+
+
+def migrate_sqlite(args):
+    """Copy the JSON app usage file and Chrome activity into an empty SQLite database"""
+    from models.chrome_store import ChromeSegmentStore
+    from models.sqlite_store import migrate_from_json
+    from models.usage_store import UsageStore
+
+    usage_store = UsageStore(args.json_file or Config.JSON_FILE)
+    chrome_store = ChromeSegmentStore(
+        args.chrome_segment_dir or Config.CHROME_SEGMENT_DIR,
+        legacy_file=args.chrome_json_file or Config.CHROME_JSON_FILE,
+    )
+    db_file = args.db or Config.SQLITE_FILE
+    try:
+        app_count, chrome_count = migrate_from_json(db_file, usage_store, chrome_store)
+    except RuntimeError as e:
+        print(e)
+        return 1
+    print(f"Migrated {app_count} app sessions and {chrome_count} chrome records into {db_file}")
+    return 0
+
+
+def convert_format(args):
+    """Convert the app usage file between the dict-by-date and compact formats"""
+    from models.compact_format import decode, encode, is_compact
+    from models.usage_store import convert_legacy_list
+
+    source = args.json_file or Config.JSON_FILE
+    target = args.out or source
+    with open(source, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    data = json.loads(content) if content else {}
+    if is_compact(data):
+        data = decode(data)
+    elif isinstance(data, list):
+        data = convert_legacy_list(data)
+
+    tmp_file = f"{target}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        if args.to == "compact":
+            json.dump(encode(data), f, separators=(",", ":"), ensure_ascii=False)
+        else:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, target)
+    print(f"Wrote {target} as {args.to} ({len(content.encode('utf-8'))} -> {os.path.getsize(target)} bytes)")
+    return 0
+
+
+def partition(args):
+    """Split the app usage file (and its journal) into one file per day (STORAGE_BACKEND = "partitioned")"""
+    from datetime import date, timedelta
+    from models.partitions import write_partitions
+    from models.usage_store import UsageStore, format_clock
+
+    out_dir = args.out_dir or Config.PARTITION_DIR
+    if os.path.exists(os.path.join(out_dir, "manifest.json")):
+        print(f"{out_dir} already has partitions; remove them first")
+        return 1
+    store = UsageStore(args.json_file or Config.JSON_FILE)
+    data = {
+        day: [
+            {"start": format_clock(s.start), "end": format_clock(s.end), "app": s.app,
+             "title": s.title, "duration": s.duration, "end_reason": s.end_reason}
+            for s in sessions
+        ]
+        for day, sessions in store.days().items()
+    }
+    compress_before = None
+    if args.compression != "none":
+        compress_before = (date.today() - timedelta(days=args.compress_after_days)).isoformat()
+    count = write_partitions(data, out_dir, compress_before, args.compression)
+    print(f"Wrote {count} day partitions to {out_dir}")
+    return 0
+
+
+def bulk_convert(args):
+    """Stream, merge and deduplicate app usage files into json, compact, legacy, ndjson or csv"""
+    import time
+    from models.bulk_io import convert
+
+    missing = [path for path in args.inputs if not os.path.exists(path)]
+    if missing:
+        print(f"Not found: {', '.join(missing)}")
+        return 1
+    started = time.perf_counter()
+    read, written, duplicates = convert(
+        args.inputs, args.out, args.to, from_format=args.from_format, workers=args.workers, shards=args.shards
+    )
+    print(
+        f"Read {read} sessions from {len(args.inputs)} file(s), wrote {written} to {args.out} as {args.to} "
+        f"({duplicates} duplicates dropped) in {time.perf_counter() - started:.1f}s"
+    )
+    return 0
+
+
+def downsample(args):
+    """Replace Chrome records (this machine's and every device's) older than the retention window with buckets"""
+    from models.retention import RetentionPolicy, downsample_chrome
+
+    keep_days = args.days if args.days is not None else Config.RETENTION_DAYS
+    if keep_days is None:
+        print("Set Config.RETENTION_DAYS or pass --days")
+        return 1
+    try:
+        policy = RetentionPolicy(keep_days, args.bucket or Config.RETENTION_BUCKET,
+                                 args.archive_dir or Config.RETENTION_ARCHIVE_DIR)
+    except ValueError as e:
+        print(e)
+        return 1
+    replaced = downsample_chrome(policy)
+    print(f"Replaced {replaced} chrome records older than {keep_days} days with {args.bucket or Config.RETENTION_BUCKET} buckets")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Activity Tracker backend maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rollups = commands.add_parser("rebuild-rollups", help=rebuild_rollups.__doc__)
+    rollups.add_argument("--json-file", help="app usage file (defaults to Config.JSON_FILE)")
+    rollups.add_argument("--partition-dir", help="check a partition folder's month indexes instead "
+                                                 "(stop whatever writes it first)")
+    rollups.add_argument("--check", action="store_true", help="only compare; exit 1 on a mismatch")
+    rollups.set_defaults(func=rebuild_rollups)
+
+    migrate = commands.add_parser("migrate-sqlite", help=migrate_sqlite.__doc__)
+    migrate.add_argument("--json-file", help="app usage file (defaults to Config.JSON_FILE)")
+    migrate.add_argument("--chrome-json-file", help="legacy chrome file (defaults to Config.CHROME_JSON_FILE)")
+    migrate.add_argument("--chrome-segment-dir", help="chrome segments (defaults to Config.CHROME_SEGMENT_DIR)")
+    migrate.add_argument("--db", help="SQLite file (defaults to Config.SQLITE_FILE)")
+    migrate.set_defaults(func=migrate_sqlite)
+
+    convert = commands.add_parser("convert-format", help=convert_format.__doc__)
+    convert.add_argument("--to", choices=["compact", "json"], required=True)
+    convert.add_argument("--json-file", help="app usage file (defaults to Config.JSON_FILE)")
+    convert.add_argument("--out", help="output file (defaults to converting in place; stop the tracker first)")
+    convert.set_defaults(func=convert_format)
+
+    split = commands.add_parser("partition", help=partition.__doc__)
+    split.add_argument("--json-file", help="app usage file (defaults to Config.JSON_FILE)")
+    split.add_argument("--out-dir", help="partition folder (defaults to Config.PARTITION_DIR)")
+    split.add_argument("--compress-after-days", type=int, default=7, help="compress days older than this")
+    split.add_argument("--compression", choices=["gzip", "lzma", "none"], default="gzip")
+    split.set_defaults(func=partition)
+
+    bulk = commands.add_parser("bulk-convert", help=bulk_convert.__doc__)
+    bulk.add_argument("inputs", nargs="+", help="input files (.json, .ndjson/.jsonl/.journal or .csv)")
+    bulk.add_argument("--to", choices=["json", "compact", "legacy", "ndjson", "csv"], required=True)
+    bulk.add_argument("--out", required=True, help="output file")
+    bulk.add_argument("--from", dest="from_format", choices=["json", "ndjson", "csv"],
+                      help="input format when the extension does not say (json covers compact and legacy)")
+    bulk.add_argument("--workers", type=int, help="worker processes (defaults to the CPU count)")
+    bulk.add_argument("--shards", type=int, help="date shards (defaults to 4 per worker)")
+    bulk.set_defaults(func=bulk_convert)
+
+    retention = commands.add_parser("downsample", help=downsample.__doc__)
+    retention.add_argument("--days", type=int, help="days of raw records to keep (defaults to Config.RETENTION_DAYS)")
+    retention.add_argument("--bucket", choices=["minute", "hour"], help="defaults to Config.RETENTION_BUCKET")
+    retention.add_argument("--archive-dir", help="archive raw records here (defaults to Config.RETENTION_ARCHIVE_DIR)")
+    retention.set_defaults(func=downsample)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+-- app_sessions.sql
+-- App session table written by the tracker's SQLiteDataManager (data_manager.py)
+-- and read by the backend's STORAGE_BACKEND = "sqlite" (models/sqlite_store.py).
+-- Each tree ships a copy of this file; Backend.v2/tests/test_sqlite_store.py
+-- checks they are identical. start_sec/end_sec are seconds since midnight of date.
+CREATE TABLE IF NOT EXISTS app_sessions (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    start_sec INTEGER NOT NULL,
+    end_sec INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    app TEXT NOT NULL,
+    app_key TEXT NOT NULL,
+    title TEXT NOT NULL,
+    end_reason TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_app_sessions_date_app ON app_sessions (date, app_key);
+
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('app_version', 0);
+CREATE TRIGGER IF NOT EXISTS app_sessions_insert AFTER INSERT ON app_sessions
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'app_version'; END;
+CREATE TRIGGER IF NOT EXISTS app_sessions_delete AFTER DELETE ON app_sessions
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'app_version'; END;
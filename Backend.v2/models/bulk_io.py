@@ -0,0 +1,460 @@
+# models/bulk_io.py
+"""Streaming conversion of app usage history between file formats.
+
+Formats (the input format is detected from the extension and first byte):
+
+    json     {"2025-08-15": [{"start", "end", "app", "title", "duration", "end_reason"}, ...]}
+    compact  the compact-v1 document of models/compact_format.py
+    legacy   [{"date", "time": {"start", "end"}, "app_name", "window_title", "duration",
+              "session_end_reason"}, ...]
+    ndjson   one {"date", "start", ...} object per line, like the tracker's journal
+    csv      date,start,end,app,title,duration,end_reason
+
+JSON inputs are parsed one session at a time with JSONDecoder.raw_decode
+over a sliding buffer, never with a whole-file json.load.
+
+`convert` runs in three stages. Each input is read by a worker process and
+its sessions are spilled to shard files by a hash of the date. Each shard
+is then deduplicated, sorted and rendered in the output format, one date at
+a time, by another worker. Finally the rendered dates are copied into the
+output in date order. Memory is bounded by the largest shard, not the
+history.
+"""
+
+import csv
+import io
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from json.encoder import encode_basestring
+from models.compact_format import FORMAT as COMPACT_FORMAT
+from models.usage_store import format_clock, parse_clock
+
+FORMATS = ("json", "compact", "legacy", "ndjson", "csv")
+FIELDS = ("date", "start", "end", "app", "title", "duration", "end_reason")
+CHUNK_SIZE = 1 << 20
+
+# json.dumps with options builds a new encoder per call; rows are encoded with this one
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+_encode_compact = json.JSONEncoder(separators=(",", ":")).encode
+
+
+class JSONStream:
+    """Reads JSON values one at a time from a text file without loading all of it"""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self.eof:
+            return False
+        data = self.f.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ('' at the end of the file)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def take(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the buffer")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _next_item(self, close):
+        char = self.peek()
+        if char == ",":
+            self.pos += 1
+            return True
+        if char == close:
+            self.pos += 1
+            return False
+        raise ValueError(f"Expected ',' or {close!r}")
+
+    def iter_array(self):
+        self.take("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if not self._next_item("]"):
+                return
+
+    def iter_object(self):
+        """Yield each key; the caller must read its value before asking for the next"""
+        self.take("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.take(":")
+            yield key
+            if not self._next_item("}"):
+                return
+
+
+def _record(date, entry):
+    record = {"date": date}
+    record.update(entry)
+    return record
+
+
+def _legacy_record(item):
+    t = item.get("time") or {}
+    return {
+        "date": item.get("date"),
+        "start": t.get("start", ""),
+        "end": t.get("end", ""),
+        "app": item.get("app_name", ""),
+        "title": item.get("window_title", ""),
+        "duration": int(round(item.get("duration", 0) or 0)),
+        "end_reason": item.get("session_end_reason", ""),
+    }
+
+
+def _compact_records(tables, days):
+    apps, titles, reasons = tables["apps"], tables["titles"], tables["reasons"]
+    for date, rows in days:
+        for row in rows:
+            start, duration = row[0], row[1]
+            yield {
+                "date": date,
+                "start": format_clock(start % 86400),
+                "end": format_clock((start + duration + (row[5] if len(row) > 5 else 0)) % 86400),
+                "app": apps[row[2]],
+                "title": titles[row[3]],
+                "duration": duration,
+                "end_reason": reasons[row[4]],
+            }
+
+
+def _iter_json(f):
+    stream = JSONStream(f)
+    first = stream.peek()
+    if first == "[":
+        for item in stream.iter_array():
+            if isinstance(item, dict) and item.get("date"):
+                yield _legacy_record(item)
+        return
+    if first != "{":
+        return
+
+    tables = {}
+    pending_days = None
+    for key in stream.iter_object():
+        if key == "format":
+            stream.value()
+        elif key in ("apps", "titles", "reasons"):
+            tables[key] = stream.value()
+        elif key == "days":
+            if len(tables) == 3:
+                yield from _compact_records(tables, _iter_days(stream))
+            else:
+                # Tables after the days: only possible to decode at the end
+                pending_days = stream.value()
+        else:
+            # One day's sessions are small enough to decode at once
+            entries = stream.value()
+            for entry in entries if isinstance(entries, list) else ():
+                if isinstance(entry, dict):
+                    yield _record(key, entry)
+    if pending_days is not None:
+        yield from _compact_records(tables, pending_days.items())
+
+
+def _iter_days(stream):
+    for date in stream.iter_object():
+        yield date, stream.value()
+
+
+def _iter_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(record, dict) and record.get("date"):
+            yield record
+
+
+def _iter_csv(f):
+    for row in csv.DictReader(f):
+        if not row.get("date"):
+            continue
+        try:
+            row["duration"] = int(row.get("duration") or 0)
+        except ValueError:
+            row["duration"] = 0
+        yield {key: row.get(key, "") for key in FIELDS}
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".ndjson", ".jsonl", ".journal", ".compacting"):
+        return "ndjson"
+    return "json"
+
+
+def read_records(path, fmt=None):
+    """Yield every session in `path` as a {"date", "start", ...} dict, in file order.
+
+    "json" covers the dict-by-date, compact and legacy list documents.
+    """
+    fmt = fmt or detect_format(path)
+    newline = "" if fmt == "csv" else None
+    with open(path, "r", encoding="utf-8", newline=newline) as f:
+        if fmt == "csv":
+            yield from _iter_csv(f)
+        elif fmt == "ndjson":
+            yield from _iter_ndjson(f)
+        else:
+            yield from _iter_json(f)
+
+
+# ---- writers: a date's sessions are rendered on their own (in the shard
+# workers), then the pieces are joined in date order ----
+
+def _dumps(value):
+    return encode_basestring(value) if isinstance(value, str) else _encode(value)
+
+
+def _json_day(date, rows):
+    # Byte-for-byte what json.dump(data, f, indent=2, ensure_ascii=False) writes for the day
+    entries = ",\n".join(
+        f'    {{\n      "start": {_dumps(start)},\n      "end": {_dumps(end)},\n'
+        f'      "app": {_dumps(app)},\n      "title": {_dumps(title)},\n'
+        f'      "duration": {_dumps(duration)},\n      "end_reason": {_dumps(reason)}\n    }}'
+        for _, start, end, app, title, duration, reason in rows
+    )
+    return f"  {_dumps(date)}: [\n{entries}\n  ]"
+
+
+def _legacy_day(date, rows):
+    date = _dumps(date)
+    return ",\n".join(
+        f'  {{\n    "date": {date},\n    "time": {{\n      "start": {_dumps(start)},\n'
+        f'      "end": {_dumps(end)}\n    }},\n    "app_name": {_dumps(app)},\n'
+        f'    "window_title": {_dumps(title)},\n    "duration": {_dumps(duration)},\n'
+        f'    "session_end_reason": {_dumps(reason)}\n  }}'
+        for _, start, end, app, title, duration, reason in rows
+    )
+
+
+def _ndjson_day(date, rows):
+    return "".join(_encode(dict(zip(FIELDS, row))) + "\n" for row in rows)
+
+
+def _csv_day(date, rows):
+    out = io.StringIO()
+    csv.writer(out).writerows(rows)
+    return out.getvalue()
+
+
+def _rows_day(date, rows):
+    # compact needs tables built over every day, so its rows are joined in the final pass
+    return "".join(_encode(row) + "\n" for row in rows)
+
+
+# format: (render one day, separator between days, opening, closing, whole file when empty)
+WRITERS = {
+    "json": (_json_day, ",\n", "{\n", "\n}", "{}"),
+    "legacy": (_legacy_day, ",\n", "[\n", "\n]", "[]"),
+    "ndjson": (_ndjson_day, "", "", "", ""),
+    "csv": (_csv_day, "", ",".join(FIELDS) + "\r\n", "", ",".join(FIELDS) + "\r\n"),
+    "compact": (_rows_day, None, None, None, None),
+}
+
+
+def _write_compact(f, days):
+    """`days()` yields (date, NDJSON row lines); pass 1 collects the string tables, pass 2 writes the rows"""
+    tables = {"apps": {}, "titles": {}, "reasons": {}}
+    columns = (("apps", 3), ("titles", 4), ("reasons", 6))
+    for _, text in days():
+        for row in map(json.loads, text.splitlines()):
+            for table, column in columns:
+                tables[table].setdefault(str(row[column]), len(tables[table]))
+
+    f.write(json.dumps({"format": COMPACT_FORMAT}, separators=(",", ":"))[:-1])
+    for table in ("apps", "titles", "reasons"):
+        f.write(f',"{table}":' + json.dumps(list(tables[table]), separators=(",", ":"), ensure_ascii=False))
+    f.write(',"days":{')
+    apps, titles, reasons = tables["apps"], tables["titles"], tables["reasons"]
+    first = True
+    for date, text in days():
+        encoded = []
+        for _, start, end, app, title, duration, reason in map(json.loads, text.splitlines()):
+            start = parse_clock(start)
+            duration = int(duration or 0)
+            row = [start, duration, apps[str(app)], titles[str(title)], reasons[str(reason)]]
+            delta = parse_clock(end) - (start + duration)
+            if delta:
+                row.append(delta)
+            encoded.append(_encode_compact(row))
+        f.write(("" if first else ",") + json.dumps(date) + ":[" + ",".join(encoded) + "]")
+        first = False
+    f.write("}}")
+
+
+def _write_output(fmt, path, days):
+    """Join the rendered days from `days()` (date order) into `path` via a temp file"""
+    tmp_path = f"{path}.tmp"
+    newline = "" if fmt == "csv" else None
+    with open(tmp_path, "w", encoding="utf-8", newline=newline) as f:
+        if fmt == "compact":
+            _write_compact(f, days)
+        else:
+            _, separator, opening, closing, empty = WRITERS[fmt]
+            first = True
+            for _, text in days():
+                f.write(opening if first else separator)
+                f.write(text)
+                first = False
+            f.write(empty if first else closing)
+    os.replace(tmp_path, path)
+
+
+# ---- the parallel pipeline ----
+
+def _shard_of(date, shards):
+    return zlib.crc32(date.encode("utf-8")) % shards
+
+
+def _spill(args):
+    """Stage 1: read one input and append its sessions to per-shard files, one JSON row per line"""
+    index, path, fmt, work_dir, shards = args
+    files = {}
+    count = 0
+    try:
+        for record in read_records(path, fmt):
+            date = str(record["date"])
+            shard = _shard_of(date, shards)
+            f = files.get(shard)
+            if f is None:
+                f = files[shard] = open(os.path.join(work_dir, f"in{index:04d}-{shard:04d}.ndjson"), "w", encoding="utf-8")
+            row = [date] + [record.get(key, "") for key in FIELDS[1:]]
+            f.write(_encode(row) + "\n")
+            count += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return count
+
+
+def _sort_key(row):
+    return row[0], parse_clock(row[1])
+
+
+def _reduce(args):
+    """Stage 2: dedupe one shard (first occurrence wins), sort it and render each date.
+
+    Returns ([(date, shard, offset, length)], sessions kept, duplicates dropped);
+    the rendered days are in out-<shard>.part at those byte ranges.
+    """
+    shard, work_dir, inputs, to_format = args
+    seen = set()
+    rows = []
+    duplicates = 0
+    for index in range(inputs):
+        path = os.path.join(work_dir, f"in{index:04d}-{shard:04d}.ndjson")
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                # Rows are written the same way by every input, so equal lines are equal sessions
+                if line in seen:
+                    duplicates += 1
+                    continue
+                seen.add(line)
+                rows.append(json.loads(line))
+        os.remove(path)
+    seen.clear()
+    # sort is stable, so sessions with the same start keep input order
+    rows.sort(key=_sort_key)
+
+    render = WRITERS[to_format][0]
+    index = []
+    with open(os.path.join(work_dir, f"out-{shard:04d}.part"), "wb") as f:
+        for date, day_rows in itertools.groupby(rows, key=lambda row: row[0]):
+            data = render(date, list(day_rows)).encode("utf-8")
+            index.append((date, shard, f.tell(), len(data)))
+            f.write(data)
+    return index, len(rows), duplicates
+
+
+def convert(inputs, out_path, to_format, from_format=None, workers=None, shards=None):
+    """Convert and merge `inputs` into `out_path`; returns (sessions read, written, duplicates dropped)"""
+    workers = max(1, workers or os.cpu_count() or 1)
+    shards = max(1, shards or workers * 4)
+    work_dir = tempfile.mkdtemp(prefix="bulk-", dir=os.path.dirname(os.path.abspath(out_path)))
+    try:
+        spill_jobs = [(i, path, from_format, work_dir, shards) for i, path in enumerate(inputs)]
+        reduce_jobs = [(shard, work_dir, len(inputs), to_format) for shard in range(shards)]
+        if workers == 1:
+            read = sum(map(_spill, spill_jobs))
+            reduced = list(map(_reduce, reduce_jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                read = sum(pool.map(_spill, spill_jobs))
+                reduced = list(pool.map(_reduce, reduce_jobs))
+
+        # A date is always in exactly one shard, so the days only need ordering, not merging
+        order = sorted(entry for index, _, _ in reduced for entry in index)
+
+        def days():
+            parts = {}
+            try:
+                for date, shard, offset, length in order:
+                    f = parts.get(shard)
+                    if f is None:
+                        f = parts[shard] = open(os.path.join(work_dir, f"out-{shard:04d}.part"), "rb")
+                    f.seek(offset)
+                    yield date, f.read(length).decode("utf-8")
+            finally:
+                for f in parts.values():
+                    f.close()
+
+        _write_output(to_format, out_path, days)
+        return read, sum(kept for _, kept, _ in reduced), sum(dups for _, _, dups in reduced)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -1,27 +1,19 @@
 # models/chrome_activity_model.py
-from config import Config
-import json
 from datetime import datetime
+from models.chrome_store import get_chrome_store
+from models.metrics import timed
 
 
+@timed("process_chrome_activity")
 def process_chrome_activity(data):
-    """Process and save Chrome extension activity data to JSON file"""
+    """Process and append Chrome extension activity data to the configured store"""
     try:
-        # Load existing data
-        try:
-            with open(Config.CHROME_JSON_FILE, 'r') as f:
-                existing_data = json.load(f)
-        except FileNotFoundError:
-            existing_data = []
-
         # Append new records with timestamp processing
+        received_at = datetime.now().isoformat()
         for record in data:
-            record['received_at'] = datetime.now().isoformat()
-            existing_data.append(record)
+            record['received_at'] = received_at
 
-        # Save back to JSON file
-        with open(Config.CHROME_JSON_FILE, 'w') as f:
-            json.dump(existing_data, f, indent=4)
+        get_chrome_store().append(data)
 
         return {'added_records': len(data)}
 
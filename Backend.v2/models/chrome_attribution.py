@@ -0,0 +1,148 @@
+# models/chrome_attribution.py
+import heapq
+import threading
+from config import Config
+from models import metrics
+from models.chrome_records import DAY_MS, record_domain, record_end, record_start
+from models.chrome_store import get_chrome_store
+from models.metrics import timed
+from models.usage_store import day_epoch, format_epoch
+
+# Browser app time that no domain session covers
+UNATTRIBUTED = ""
+
+
+def foreground_segments(records):
+    """Non-overlapping (start_ms, end_ms, domain) pieces of domain sessions.
+
+    `records` are (start_ms, end_ms, domain) sorted by start. Where sessions
+    overlap, the one that started last is taken as the foreground tab until
+    it ends; a heap of the open sessions keeps this O(m log m).
+    """
+    segments = []
+    open_sessions = []  # (-start, end, domain): latest start on top
+    i, n = 0, len(records)
+    t = None
+    while i < n or open_sessions:
+        if not open_sessions:
+            t = records[i][0]
+        while i < n and records[i][0] <= t:
+            start, end, domain = records[i]
+            heapq.heappush(open_sessions, (-start, end, domain))
+            i += 1
+        while open_sessions and open_sessions[0][1] <= t:
+            heapq.heappop(open_sessions)
+        if not open_sessions:
+            continue
+        _, end, domain = open_sessions[0]
+        next_t = min(end, records[i][0]) if i < n else end
+        if segments and segments[-1][2] == domain and segments[-1][1] == t:
+            segments[-1] = (segments[-1][0], next_t, domain)
+        else:
+            segments.append((t, next_t, domain))
+        t = next_t
+    return segments
+
+
+def intersect(intervals, segments):
+    """Split each (start_ms, end_ms) interval by the domain segments covering it.
+
+    Both inputs are sorted and non-overlapping, so one forward pass over each
+    is enough. Parts of an interval no segment covers come back as
+    UNATTRIBUTED pieces.
+    """
+    pieces = []
+    j = 0
+    for start, end in intervals:
+        while j < len(segments) and segments[j][1] <= start:
+            j += 1
+        cursor = start
+        k = j
+        while k < len(segments) and segments[k][0] < end:
+            seg_start, seg_end, domain = segments[k]
+            seg_start = max(seg_start, start)
+            if seg_start > cursor:
+                pieces.append((cursor, seg_start, UNATTRIBUTED))
+            cursor = min(seg_end, end)
+            pieces.append((seg_start, cursor, domain))
+            k += 1
+        if cursor < end:
+            pieces.append((cursor, end, UNATTRIBUTED))
+    return pieces
+
+
+class ChromeAttribution:
+    """Browser app time of a day split into the domains the extension saw.
+
+    Joins the day's `Config.BROWSER_APP` sessions (from the LogAnalyzer's
+    columns, so sessions past midnight are already split) with the Chrome
+    extension's domain sessions. Results are cached per date and rebuilt only
+    when that date's app sessions or Chrome records change.
+    """
+
+    def __init__(self, analyzer, browser_app=None):
+        self.analyzer = analyzer
+        self.browser_app = (browser_app or Config.BROWSER_APP).lower()
+        self._lock = threading.Lock()
+        self._days = {}
+
+    def _browser_intervals(self, date):
+        columns = self.analyzer.day_columns(date)
+        names = self.analyzer.app_names
+        intervals = []
+        for start, end, app_id in zip(columns.starts, columns.ends, columns.app_ids):
+            if names[app_id].lower() != self.browser_app or end <= start:
+                continue
+            start, end = start * 1000, end * 1000
+            if intervals and start <= intervals[-1][1]:
+                intervals[-1] = (intervals[-1][0], max(end, intervals[-1][1]))
+            else:
+                intervals.append((start, end))
+        return intervals
+
+    def _domain_records(self, date):
+        day_start = day_epoch(date) * 1000
+        # A record that started the day before may still run into this one
+        rows = get_chrome_store().query(start_ms=day_start - DAY_MS, end_ms=day_start + DAY_MS - 1)
+        records = []
+        for _, record in rows:
+            start = max(record_start(record), day_start)
+            end = min(record_end(record), day_start + DAY_MS)
+            if start and end > start:
+                records.append((start, end, record_domain(record).lower()))
+        records.sort(key=lambda r: r[0])
+        return records
+
+    @timed("ChromeAttribution.day_pieces")
+    def day_pieces(self, date):
+        """[(start_ms, end_ms, domain)] covering the date's browser app time, in time order"""
+        version = (self.analyzer.day_version(date), get_chrome_store().day_version(date))
+        cached = self._days.get(date)
+        hit = cached is not None and cached[0] == version
+        metrics.cache_lookup("chrome_attribution", hit)
+        if hit:
+            return cached[1]
+
+        pieces = intersect(self._browser_intervals(date), foreground_segments(self._domain_records(date)))
+        with self._lock:
+            self._days[date] = (version, pieces)
+        return pieces
+
+    def domain_ms(self, date):
+        """{domain: ms of foreground browser time}; UNATTRIBUTED holds the rest"""
+        totals = {}
+        for start, end, domain in self.day_pieces(date):
+            totals[domain] = totals.get(domain, 0) + end - start
+        return totals
+
+    def split_sessions(self, date, grouped):
+        """Sunburst blocks of `date` with the browser app split into "<app>/<domain>" entries.
+
+        `grouped` is LogAnalyzer.get_merged_sessions output for the same date;
+        browser time without a domain stays under the app's own name.
+        """
+        split = {app: blocks for app, blocks in grouped.items() if app != self.browser_app}
+        for start, end, domain in self.day_pieces(date):
+            key = f"{self.browser_app}/{domain}" if domain else self.browser_app
+            split.setdefault(key, []).append(f"{format_epoch(start // 1000)} - {format_epoch(end // 1000)}")
+        return split
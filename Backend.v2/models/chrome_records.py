@@ -0,0 +1,293 @@
+# models/chrome_records.py
+import hashlib
+import math
+import sys
+from datetime import datetime, timedelta
+
+_EPOCH = datetime(1970, 1, 1)
+DAY_MS = 86400000
+HOUR_MS = 3600000
+
+# Keys of the two raw shapes the extension has sent over time
+_RAW_KEYS = ("domain", "site", "start_time", "ST", "end_time", "ET")
+
+
+def parse_timestamp(value, end_of_day=False):
+    """'YYYY-MM-DD[ HH:MM:SS[.fff]]' -> epoch milliseconds (wall clock, no time zone).
+
+    A bare date means the start of that day, or its last millisecond when
+    `end_of_day` is set (so ?to=2025-09-10 includes the whole day).
+    Raises ValueError for anything else.
+    """
+    value = str(value).strip().replace("T", " ")
+    if len(value) == 10:
+        ms = int((datetime.strptime(value, "%Y-%m-%d") - _EPOCH).total_seconds()) * 1000
+        return ms + DAY_MS - 1 if end_of_day else ms
+    return int(round((datetime.fromisoformat(value) - _EPOCH).total_seconds() * 1000))
+
+
+def format_timestamp(ms):
+    """Epoch milliseconds -> 'YYYY-MM-DD HH:MM:SS.fff'"""
+    seconds, millis = divmod(int(ms), 1000)
+    return f"{_EPOCH + timedelta(seconds=seconds):%Y-%m-%d %H:%M:%S}.{millis:03d}"
+
+
+def format_date(ms):
+    """Epoch milliseconds -> 'YYYY-MM-DD'"""
+    return (_EPOCH + timedelta(milliseconds=int(ms))).strftime("%Y-%m-%d")
+
+
+def normalize_record(record):
+    """Convert a raw extension record to the compact shape stored at ingest:
+
+        {"domain": "youtube.com", "url": "...", "start_ms": 1757486414691,
+         "end_ms": 1757486428382, "duration_ms": 13691, ...extra fields}
+
+    Both raw shapes (domain/start_time/end_time and site/ST/ET) are accepted.
+    Records that are already normalized, are not objects, or have missing or
+    unparseable times are returned unchanged.
+    """
+    if not isinstance(record, dict) or "start_ms" in record:
+        return record
+    try:
+        start = parse_timestamp(record.get("start_time") or record.get("ST"))
+        end = parse_timestamp(record.get("end_time") or record.get("ET"))
+    except (ValueError, TypeError):
+        return record
+
+    normalized = {
+        "domain": sys.intern(str(record.get("domain") or record.get("site") or "").lower()),
+        "url": record.get("url", ""),
+        "start_ms": start,
+        "end_ms": end,
+        "duration_ms": max(0, end - start),
+    }
+    for key, value in record.items():
+        if key not in _RAW_KEYS and key not in normalized:
+            normalized[key] = value
+    return normalized
+
+
+def _format_raw_time(ms):
+    # The extension leaves out the fraction when it is .000
+    text = format_timestamp(ms)
+    return text[:-4] if text.endswith(".000") else text
+
+
+def raw_record(record):
+    """A normalized record back in the shape the extension sent:
+
+        {"domain": "youtube.com", "url": "...", "start_time": "2025-09-10 12:10:14.691",
+         "end_time": "2025-09-10 12:10:28.382", ...extra fields}
+
+    Records that are not normalized are returned unchanged.
+    """
+    if not isinstance(record, dict) or "start_ms" not in record:
+        return record
+    raw = {
+        "domain": record.get("domain", ""),
+        "url": record.get("url", ""),
+        "start_time": _format_raw_time(record["start_ms"]),
+        "end_time": _format_raw_time(record.get("end_ms", record["start_ms"])),
+    }
+    for key, value in record.items():
+        if key not in ("start_ms", "end_ms", "duration_ms") and key not in raw:
+            raw[key] = value
+    return raw
+
+
+def needs_normalizing(record):
+    return normalize_record(record) is not record
+
+
+def record_domain(record):
+    if not isinstance(record, dict):
+        return ""
+    return str(record.get("domain") or record.get("site") or "")
+
+
+def _record_time(record, ms_key, key, legacy_key):
+    if not isinstance(record, dict):
+        return 0
+    if ms_key in record:
+        return record[ms_key]
+    try:
+        return parse_timestamp(record.get(key) or record.get(legacy_key))
+    except (ValueError, TypeError):
+        return 0
+
+
+def idempotency_key(record):
+    """Identity of a session across retries, "<chrome_profile>|<windowId>|<start_ms>|<url>" """
+    if not isinstance(record, dict):
+        return ""
+    parts = (record.get("chrome_profile"), record.get("windowId"), record_start(record), record.get("url"))
+    return "|".join("" if part is None else str(part) for part in parts)
+
+
+def record_start(record):
+    """Start of a record in epoch ms (0 if missing or malformed); handles every record shape"""
+    return _record_time(record, "start_ms", "start_time", "ST")
+
+
+def record_end(record):
+    return _record_time(record, "end_ms", "end_time", "ET")
+
+
+def int_ms(value):
+    """A record time as an int that fits array("q") (0 if it is not a usable number)"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return 0
+    return value if -(1 << 62) < value < (1 << 62) else 0
+
+
+class DomainIndex:
+    """Per-day browser time by domain, with an hour-of-day breakdown.
+
+    Sessions are split at hour (and therefore day) boundaries when added,
+    so a session running past midnight counts towards both days.
+    """
+
+    def __init__(self):
+        # date -> {domain: [ms in hour 0..23]}
+        self.days = {}
+        # date -> number of records that touched it, a cheap per-day version
+        self.versions = {}
+        # date -> (version, [ms in hour 0..23] over every domain)
+        self._totals = {}
+
+    def add(self, record):
+        start = record_start(record)
+        end = record_end(record)
+        if not start or end <= start:
+            return
+        domain = sys.intern(record_domain(record).lower())
+        t = start
+        while t < end:
+            hour_end = min(end, (t // HOUR_MS + 1) * HOUR_MS)
+            date = format_date(t)
+            if t == start or t % DAY_MS == 0:
+                self.versions[date] = self.versions.get(date, 0) + 1
+            hours = self.days.setdefault(date, {}).get(domain)
+            if hours is None:
+                hours = self.days[date][domain] = [0] * 24
+            hours[(t % DAY_MS) // HOUR_MS] += hour_end - t
+            t = hour_end
+
+    def domain_ms(self, date):
+        """{domain: ms} for one date"""
+        return {domain: sum(hours) for domain, hours in self.days.get(date, {}).items()}
+
+    def domain_hours(self, date):
+        """{domain: [ms per hour]} for one date"""
+        return {domain: list(hours) for domain, hours in self.days.get(date, {}).items()}
+
+    def day_hours(self, date, domain=None):
+        """[ms in hour 0..23] of one domain, or of every domain (cached per date version)"""
+        if domain is not None:
+            return list(self.days.get(date, {}).get(domain, [0] * 24))
+        version = self.versions.get(date, 0)
+        cached = self._totals.get(date)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        totals = [0] * 24
+        for hours in self.days.get(date, {}).values():
+            for hour, ms in enumerate(hours):
+                totals[hour] += ms
+        self._totals[date] = (version, totals)
+        return totals
+
+    def day_version(self, date):
+        return self.versions.get(date, 0)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 16-byte digests (double hashing)"""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest):
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, digest):
+        for p in self._positions(digest):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, digest):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(digest))
+
+
+class DedupeIndex:
+    """Idempotency keys of stored records, so replayed sessions are dropped at ingest.
+
+    Keys of the `recent_days` newest dates are kept exactly, as a set of
+    digests per date. When a date falls out of that window its keys move
+    into a Bloom filter sized for `capacity` keys, so memory stays bounded
+    however long the history. A Bloom hit may be a false positive, so
+    `contains` confirms it with `lookup(start_ms)`, which must return the
+    stored records starting at that time.
+    """
+
+    def __init__(self, recent_days=2, capacity=1000000, error_rate=0.01):
+        self.recent_days = max(1, recent_days)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.recent = {}
+        self.older = None
+        self.newest = None
+        self.cutoff = None
+
+    @staticmethod
+    def _digest(record):
+        return hashlib.blake2b(idempotency_key(record).encode("utf-8"), digest_size=16).digest()
+
+    def _add_older(self, digest):
+        if self.older is None:
+            self.older = BloomFilter(self.capacity, self.error_rate)
+        self.older.add(digest)
+
+    def add(self, record):
+        date = format_date(record_start(record))
+        if self.newest is None or date > self.newest:
+            self.newest = date
+            self.cutoff = format_date(parse_timestamp(date) - (self.recent_days - 1) * DAY_MS)
+            for old in [d for d in self.recent if d < self.cutoff]:
+                for digest in self.recent.pop(old):
+                    self._add_older(digest)
+        digest = self._digest(record)
+        if date >= self.cutoff:
+            self.recent.setdefault(date, set()).add(digest)
+        else:
+            self._add_older(digest)
+
+    def contains(self, record, lookup):
+        if self.newest is None:
+            return False
+        date = format_date(record_start(record))
+        digest = self._digest(record)
+        if date >= self.cutoff:
+            return digest in self.recent.get(date, ())
+        if self.older is None or digest not in self.older:
+            return False
+        key = idempotency_key(record)
+        return any(idempotency_key(r) == key for r in lookup(record_start(record)))
+
+
+def split_new(records, dedupe, lookup):
+    """Normalize `records` and flag each one: True if new, False if a stored record
+    (or an earlier one in the same batch) has the same idempotency key"""
+    normalized, flags, batch = [], [], set()
+    for record in records:
+        record = normalize_record(record)
+        key = idempotency_key(record)
+        flags.append(key not in batch and not dedupe.contains(record, lookup))
+        batch.add(key)
+        normalized.append(record)
+    return normalized, flags
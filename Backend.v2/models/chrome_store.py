@@ -0,0 +1,609 @@
+# models/chrome_store.py
+import json
+import os
+import queue
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from config import Config
+from models import metrics
+from models.chrome_records import (
+    DedupeIndex,
+    DomainIndex,
+    int_ms,
+    needs_normalizing,
+    normalize_record,
+    record_domain,
+    record_start,
+    split_new,
+)
+from models.metrics import timed
+from models.retention import is_downsampled
+
+def _dedupe_index():
+    return DedupeIndex(Config.CHROME_DEDUPE_RECENT_DAYS, Config.CHROME_DEDUPE_BLOOM_CAPACITY)
+
+
+class _Positions:
+    """Where each record of one index generation is stored, by arrival number (seq).
+
+    Columns only ever grow. `sorted_view` is (starts, seqs) ordered by
+    (start_ms, seq) and is replaced, never edited, when a record lands in
+    the middle, so a query that is still iterating keeps a consistent view.
+    """
+
+    def __init__(self):
+        self.names = []      # file id -> segment name
+        self.inodes = []     # file id -> inode the offsets belong to
+        self.raw_first = []  # file id -> earliest start of a record not downsampled yet (None: none)
+        self.file_ids = array("i")  # -1: a record of the legacy JSON file
+        self.offsets = array("q")   # byte offset in its segment (index into `legacy` for -1)
+        self.lengths = array("i")
+        self.starts = array("q")
+        self.domain_ids = array("i")
+        self.domains = []    # domain id -> lower-cased domain
+        self.domain_index = {}
+        self.legacy = []
+        self.sorted_view = (array("q"), array("q"))
+
+    def add(self, record, file_id, offset, length):
+        domain = record_domain(record).lower()
+        domain_id = self.domain_index.get(domain)
+        if domain_id is None:
+            self.domains.append(domain)
+            domain_id = self.domain_index[domain] = len(self.domains) - 1
+        self.file_ids.append(file_id)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.starts.append(int_ms(record_start(record)))
+        self.domain_ids.append(domain_id)
+
+    def sort_in(self, first_seq):
+        """Add the records from `first_seq` on to the sorted view"""
+        new = sorted(range(first_seq, len(self.starts)), key=self.starts.__getitem__)
+        if not new:
+            return
+        starts, seqs = self.sorted_view
+        if not seqs or self.starts[new[0]] >= starts[-1]:
+            # Seqs first: a reader bisecting `starts` only sees positions that are filled
+            seqs.extend(new)
+            starts.extend(self.starts[seq] for seq in new)
+            return
+        merged_starts, merged_seqs = array("q"), array("q")
+        prev = 0
+        for seq in new:
+            start = self.starts[seq]
+            # After every stored record with the same start: ties keep arrival order
+            i = bisect_right(starts, start, prev)
+            merged_starts.extend(starts[prev:i])
+            merged_seqs.extend(seqs[prev:i])
+            merged_starts.append(start)
+            merged_seqs.append(seq)
+            prev = i
+        merged_starts.extend(starts[prev:])
+        merged_seqs.extend(seqs[prev:])
+        self.sorted_view = (merged_starts, merged_seqs)
+
+
+class ChromeIndex:
+    """Positions of a ChromeSegmentStore's records, sorted by start time.
+
+    Records are not kept in memory. Each one is a row of arrays indexed by
+    its arrival number (segment, byte offset, length, start, domain), and a
+    query reads the records it returns back from their segments. Segments
+    are append-only, so a refresh only reads the bytes added to each segment
+    since the last one (a segment rewritten by the background migration or
+    by retention has a new inode and triggers a rebuild). A rebuild sorts
+    once; later records are merged into the sorted view. Records of the
+    legacy JSON array have no line offsets and stay in memory until the
+    migration has moved them into a segment.
+
+    A DomainIndex and a DedupeIndex are fed with every record on the way in.
+    """
+
+    READ_BATCH = 256
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self.positions = _Positions()
+        self.domains = DomainIndex()
+        self.dedupe = _dedupe_index()
+        self._generation = 0
+        self._legacy_identity = None
+        self._offsets = {}
+        self._file_ids = {}
+
+    @timed("ChromeIndex.refresh")
+    def refresh(self):
+        with self._lock:
+            legacy_identity = None
+            if self.store.legacy_file and os.path.exists(self.store.legacy_file):
+                st = os.stat(self.store.legacy_file)
+                legacy_identity = (st.st_ino, st.st_size, st.st_mtime_ns)
+            names = self.store.segment_names()
+            inodes = {}
+            for name in names:
+                try:
+                    inodes[name] = os.stat(os.path.join(self.store.segment_dir, name)).st_ino
+                except OSError:
+                    continue
+            positions = self.positions
+            first_seq = len(positions.starts)
+            if (
+                legacy_identity != self._legacy_identity
+                or any(inodes.get(n) != ino for n, (ino, _) in self._offsets.items())
+            ):
+                positions, first_seq = _Positions(), 0
+                self._offsets, self._file_ids = {}, {}
+                self.domains = DomainIndex()
+                self.dedupe = _dedupe_index()
+                self._generation += 1
+                self._legacy_identity = legacy_identity
+                for record in self.store.iter_legacy_records():
+                    self._feed(record)
+                    positions.add(record, -1, len(positions.legacy), 0)
+                    positions.legacy.append(record)
+
+            for name, inode in inodes.items():
+                path = os.path.join(self.store.segment_dir, name)
+                offset = self._offsets.get(name, (inode, 0))[1]
+                if os.path.getsize(path) <= offset:
+                    continue
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    chunk = f.read()
+                metrics.bytes_read("chrome_segments", len(chunk))
+                end = chunk.rfind(b"\n") + 1
+                file_id = self._file_ids.get(name)
+                if file_id is None:
+                    file_id = self._file_ids[name] = len(positions.names)
+                    positions.names.append(name)
+                    positions.inodes.append(inode)
+                    positions.raw_first.append(None)
+                line_start = 0
+                while line_start < end:
+                    line_end = chunk.index(b"\n", line_start)
+                    try:
+                        record = json.loads(chunk[line_start:line_end])
+                    except json.JSONDecodeError:
+                        record = None  # blank or torn line
+                    if isinstance(record, dict):
+                        self._feed(record)
+                        positions.add(record, file_id, offset + line_start, line_end - line_start)
+                        if not is_downsampled(record):
+                            first = positions.raw_first[file_id]
+                            start = positions.starts[-1]
+                            positions.raw_first[file_id] = start if first is None else min(first, start)
+                    line_start = line_end + 1
+                self._offsets[name] = (inode, offset + end)
+
+            positions.sort_in(first_seq)
+            self.positions = positions
+
+    def _feed(self, record):
+        self.domains.add(record)
+        self.dedupe.add(record)
+
+    def _read(self, positions, seqs):
+        """The records at arrival numbers `seqs`, read back from their segments"""
+        records = []
+        files = {}
+        read = 0
+        try:
+            for seq in seqs:
+                file_id = positions.file_ids[seq]
+                if file_id < 0:
+                    records.append(positions.legacy[positions.offsets[seq]])
+                    continue
+                f = files.get(file_id)
+                if f is None:
+                    name = positions.names[file_id]
+                    f = files[file_id] = open(os.path.join(self.store.segment_dir, name), "rb")
+                    if os.fstat(f.fileno()).st_ino != positions.inodes[file_id]:
+                        raise RuntimeError(f"Chrome segment {name} was rewritten while it was read; try again")
+                f.seek(positions.offsets[seq])
+                line = f.read(positions.lengths[seq])
+                read += len(line)
+                records.append(json.loads(line))
+        finally:
+            # Files are only held for one batch, so a rewrite can always replace them
+            for f in files.values():
+                f.close()
+        metrics.bytes_read("chrome_records", read)
+        return records
+
+    def _read_all(self, positions, seqs):
+        for first in range(0, len(seqs), self.READ_BATCH):
+            yield from self._read(positions, seqs[first:first + self.READ_BATCH])
+
+    def segments_with_raw_before(self, ms):
+        """Segments holding a record that started before `ms` and is not downsampled yet"""
+        self.refresh()
+        positions = self.positions
+        return [
+            name for name, first in zip(positions.names, positions.raw_first)
+            if first is not None and first < ms
+        ]
+
+    def query(self, start_ms=None, end_ms=None, domain=None, limit=None, cursor=None):
+        """Iterator of (cursor, record) in start order; pass a cursor back to resume after it"""
+        if cursor is not None:
+            try:
+                after = tuple(int(part) for part in cursor.split(":"))
+            except ValueError:
+                raise ValueError("Invalid cursor")
+            if len(after) != 2:
+                raise ValueError("Invalid cursor")
+        self.refresh()
+        positions = self.positions
+        starts, seqs = positions.sorted_view
+        lo = bisect_left(starts, start_ms) if start_ms is not None else 0
+        hi = bisect_right(starts, end_ms) if end_ms is not None else len(starts)
+        if cursor is not None:
+            # Among records starting at the cursor's start, seqs are ascending
+            tied = bisect_left(starts, after[0])
+            lo = max(lo, bisect_right(seqs, after[1], tied, bisect_right(starts, after[0], tied)))
+        domain_id = -1
+        if domain:
+            domain_id = positions.domain_index.get(domain)
+            if domain_id is None:
+                return iter(())
+        return self._iter(positions, starts, seqs, lo, hi, domain_id, limit)
+
+    def _iter(self, positions, starts, seqs, lo, hi, domain_id, limit):
+        domain_ids = positions.domain_ids
+        batch = []
+        returned = 0
+        for i in range(lo, hi):
+            if limit is not None and returned >= limit:
+                break
+            seq = seqs[i]
+            if domain_id >= 0 and domain_ids[seq] != domain_id:
+                continue
+            batch.append(i)
+            returned += 1
+            if len(batch) == self.READ_BATCH:
+                yield from self._cursors(positions, starts, seqs, batch)
+                batch = []
+        yield from self._cursors(positions, starts, seqs, batch)
+
+    def _cursors(self, positions, starts, seqs, batch):
+        records = self._read(positions, [seqs[i] for i in batch])
+        for i, record in zip(batch, records):
+            yield f"{starts[i]}:{seqs[i]}", record
+
+    def fingerprint(self):
+        self.refresh()
+        with self._lock:
+            return f"{self._legacy_identity}|{sorted(self._offsets.items())}"
+
+    def domain_ms(self, date):
+        self.refresh()
+        with self._lock:
+            return self.domains.domain_ms(date)
+
+    def domain_hours(self, date):
+        self.refresh()
+        with self._lock:
+            return self.domains.domain_hours(date)
+
+    def day_version(self, date):
+        self.refresh()
+        with self._lock:
+            return (self._generation, self.domains.day_version(date))
+
+    def day_hours(self, dates, domain=None):
+        self.refresh()
+        with self._lock:
+            return [self.domains.day_hours(date, domain) for date in dates]
+
+    def new_records(self, since=None):
+        self.refresh()
+        with self._lock:
+            positions, generation = self.positions, self._generation
+        previous, count = since if since is not None else (None, 0)
+        reset = previous != generation
+        if reset:
+            count = 0
+        total = len(positions.starts)
+        return (generation, total), self._read_all(positions, range(count, total)), reset
+
+    def split_new(self, records):
+        """Normalized records and a flag per record, True if it is not stored yet"""
+        self.refresh()
+        return split_new(records, self.dedupe, lambda ms: [r for _, r in self.query(ms, ms)])
+
+
+class ChromeSegmentStore:
+    """Append-only NDJSON segment store for Chrome activity records.
+
+    Records are written one per line to "chrome-<YYYY-MM-DD>-<NNNN>.ndjson"
+    files in `segment_dir`. A new segment is started when the day changes or
+    the current one grows past `max_segment_bytes`. A single writer thread
+    drains a queue, so concurrent requests never interleave partial lines and
+    an append costs the same no matter how much history exists.
+
+    Records are normalized at ingest (see models/chrome_records.py). The
+    original `chrome_usage.json` array is read as a legacy first segment
+    until `migrate_in_background` has rewritten it, and any old-shape
+    segments, into normalized segments.
+    """
+
+    def __init__(self, segment_dir, legacy_file=None, max_segment_bytes=8 * 1024 * 1024, writer_tag=""):
+        self.segment_dir = segment_dir
+        self.legacy_file = legacy_file
+        self.max_segment_bytes = max_segment_bytes
+        # Appended to segment names ("chrome-<day>-<NNNN><tag>.ndjson") so that
+        # each serve.py worker process writes only to its own files
+        self.writer_tag = writer_tag
+
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._ingest_lock = threading.Lock()
+        self._segment_path = None
+        self._segment_day = None
+        self._segment_lock = threading.Lock()
+        self._migration = None
+        self._index = ChromeIndex(self)
+
+    # ---- writing ----
+
+    @timed("ChromeSegmentStore.append")
+    def append(self, records):
+        """Normalize records, queue them for the writer thread and wait until they are on disk"""
+        if not records:
+            return 0
+        self._ensure_writer()
+        done = threading.Event()
+        job = {"records": [normalize_record(r) for r in records], "done": done, "error": None}
+        self._queue.put(job)
+        done.wait()
+        if job["error"] is not None:
+            raise job["error"]
+        return len(records)
+
+    def append_new(self, records):
+        """Append only the records whose idempotency key is not stored yet.
+
+        Returns a flag per record, True if it was written. Batches are checked
+        and written one at a time, so a replay racing the original is still
+        caught.
+        """
+        with self._ingest_lock:
+            records, flags = self._index.split_new(records)
+            self.append([record for record, new in zip(records, flags) if new])
+        return flags
+
+    def _ensure_writer(self):
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._writer_loop, name="chrome-segment-writer", daemon=True)
+                self._writer.start()
+
+    def _writer_loop(self):
+        while True:
+            jobs = [self._queue.get()]
+            # Group everything that queued up while the last batch was written
+            while True:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for job in jobs:
+                lines.extend(json.dumps(r, ensure_ascii=False) + "\n" for r in job["records"])
+            try:
+                self._write_lines(lines)
+            except Exception as e:
+                for job in jobs:
+                    job["error"] = RuntimeError(f"Failed to write chrome segment: {e}")
+            for job in jobs:
+                job["done"].set()
+
+    def _write_lines(self, lines):
+        payload = "".join(lines).encode("utf-8")
+        with self._segment_lock:
+            path = self._current_segment(len(payload))
+            with open(path, "ab") as f:
+                f.write(payload)
+        metrics.bytes_written("chrome_segments", len(payload))
+
+    def _current_segment(self, incoming_bytes):
+        day = datetime.now().strftime("%Y-%m-%d")
+        suffix = f"{self.writer_tag}.ndjson"
+        if self._segment_path is None or self._segment_day != day:
+            os.makedirs(self.segment_dir, exist_ok=True)
+            existing = [
+                n for n in self.segment_names()
+                if n.startswith(f"chrome-{day}-") and n[len("chrome-YYYY-MM-DD-NNNN"):] == suffix
+            ]
+            self._segment_day = day
+            self._segment_path = os.path.join(
+                self.segment_dir, existing[-1] if existing else f"chrome-{day}-0001{suffix}"
+            )
+
+        size = os.path.getsize(self._segment_path) if os.path.exists(self._segment_path) else 0
+        if size and size + incoming_bytes > self.max_segment_bytes:
+            seq = int(os.path.basename(self._segment_path)[len("chrome-YYYY-MM-DD-"):len("chrome-YYYY-MM-DD-NNNN")])
+            self._segment_path = os.path.join(self.segment_dir, f"chrome-{day}-{seq + 1:04d}{suffix}")
+        return self._segment_path
+
+    # ---- reading ----
+
+    def segment_names(self):
+        if not os.path.isdir(self.segment_dir):
+            return []
+        return sorted(
+            n for n in os.listdir(self.segment_dir)
+            if n.startswith("chrome-") and n.endswith(".ndjson")
+        )
+
+    # ---- background migration ----
+
+    def migrate_in_background(self):
+        """Start rewriting the legacy JSON file and old-shape segments into normalized segments"""
+        if self._migration is None or not self._migration.is_alive():
+            self._migration = threading.Thread(target=self._migrate, name="chrome-normalize", daemon=True)
+            self._migration.start()
+        return self._migration
+
+    def _migrate(self):
+        try:
+            if self.legacy_file and os.path.exists(self.legacy_file):
+                records = [normalize_record(r) for r in self.iter_legacy_records()]
+                os.makedirs(self.segment_dir, exist_ok=True)
+                # Sorts before every dated segment, so history stays in order
+                path = os.path.join(self.segment_dir, "chrome-0000-00-00-0001.ndjson")
+                with self._index._lock:
+                    self._write_segment(path, records)
+                    os.replace(self.legacy_file, f"{self.legacy_file}.migrated")
+                print(f"Migrated {len(records)} legacy chrome records into {path}")
+
+            for name in self.segment_names():
+                path = os.path.join(self.segment_dir, name)
+                with self._segment_lock:
+                    records = list(self._iter_segment(path))
+                    if any(needs_normalizing(r) for r in records):
+                        self._write_segment(path, [normalize_record(r) for r in records])
+                        print(f"Normalized chrome segment {name}")
+        except Exception as e:
+            print(f"Error migrating chrome records: {e}")
+
+    # ---- retention ----
+
+    @timed("ChromeSegmentStore.downsample")
+    def downsample(self, policy, today, archive_name):
+        """Replace the records that started before the retention cutoff with per-domain
+        buckets (models/retention.py), one segment at a time; returns how many were replaced.
+
+        Segments are picked by the start times of their records, not by their
+        names: a session the extension synced late sits in the segment of the
+        day it arrived. Segments of `today` may still be appended to, by this
+        process or another one, so their records wait until the next day.
+        """
+        replaced = 0
+        for name in self._index.segments_with_raw_before(policy.cutoff_ms(today)):
+            if name[len("chrome-"):len("chrome-YYYY-MM-DD")] >= today:
+                continue
+            path = os.path.join(self.segment_dir, name)
+            with self._segment_lock:
+                records = list(self._iter_segment(path))
+                old, buckets = policy.downsample_records(records, today, archive_name)
+                if not old:
+                    continue
+                old_ids = {id(r) for r in old}
+                self._write_segment(path, buckets + [r for r in records if id(r) not in old_ids])
+            replaced += len(old)
+        return replaced
+
+    @staticmethod
+    def _write_segment(path, records):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def iter_legacy_records(self):
+        if self.legacy_file and os.path.exists(self.legacy_file):
+            with open(self.legacy_file, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            metrics.bytes_read("chrome_legacy", len(content))
+            if content:
+                for record in json.loads(content):
+                    yield record
+
+    def iter_records(self):
+        """Yield every record: the legacy JSON array first, then each segment in order"""
+        yield from self.iter_legacy_records()
+
+        for name in self.segment_names():
+            yield from self._iter_segment(os.path.join(self.segment_dir, name))
+
+    @staticmethod
+    def _iter_segment(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn line from an interrupted write
+                    continue
+
+    @timed("ChromeSegmentStore.load_all")
+    def load_all(self):
+        return list(self.iter_records())
+
+    def query(self, start_ms=None, end_ms=None, domain=None, limit=None, cursor=None):
+        """Records with start in [start_ms, end_ms], optionally for one (lower-cased) domain.
+
+        Returns an iterator of (cursor, record) in start-time order; pass the
+        last cursor back to continue after it.
+        """
+        return self._index.query(start_ms, end_ms, domain, limit, cursor)
+
+    def fingerprint(self):
+        """Token that changes whenever a record is added or a segment is rewritten"""
+        return self._index.fingerprint()
+
+    def domain_ms(self, date):
+        """{domain: ms of browser time} for one date"""
+        return self._index.domain_ms(date)
+
+    def domain_hours(self, date):
+        """{domain: [ms in each hour of the day]} for one date"""
+        return self._index.domain_hours(date)
+
+    def day_version(self, date):
+        """Changes whenever a record touching `date` is added"""
+        return self._index.day_version(date)
+
+    def day_hours(self, dates, domain=None):
+        """[ms in each hour of the day] for each date, of one (lower-cased) domain or all of them"""
+        return self._index.day_hours(dates, domain)
+
+    def new_records(self, since=None):
+        """(position, records stored after `since`, reset) in arrival order.
+
+        The records are an iterator that reads them from disk as it goes.
+        Pass the returned position back to get only what arrived after it.
+        `reset` is True when `since` is None or the segments were rewritten
+        since then; the records are then every record, and anything built
+        from earlier calls should be dropped.
+        """
+        return self._index.new_records(since)
+
+
+chrome_store = ChromeSegmentStore(
+    Config.CHROME_SEGMENT_DIR,
+    legacy_file=Config.CHROME_JSON_FILE,
+    max_segment_bytes=Config.CHROME_SEGMENT_MAX_BYTES,
+    writer_tag=Config.CHROME_WRITER_TAG,
+)
+
+
+def get_chrome_store():
+    """The Chrome activity store of the device the current request asked for
+    (see models/devices.py); this machine's store by default"""
+    from models.devices import LOCAL_DEVICE, current_device, get_device_chrome_store
+    device = current_device.get()
+    if device is not None and device != LOCAL_DEVICE:
+        return get_device_chrome_store(device)
+    return get_local_chrome_store()
+
+
+def get_local_chrome_store():
+    """This machine's configured Chrome activity store (NDJSON segments or SQLite)"""
+    if Config.STORAGE_BACKEND == "sqlite":
+        from models.sqlite_store import get_sqlite_chrome_store
+        return get_sqlite_chrome_store(Config.SQLITE_FILE)
+    return chrome_store
@@ -0,0 +1,120 @@
+# models/compact_format.py
+"""Dictionary-encoded app usage file (the same codec as the tracker's compact_format.py).
+
+    {"format": "compact-v1",
+     "apps": ["chrome.exe", ...], "titles": [...], "reasons": ["app_switch", ...],
+     "days": {"2025-08-15": [[7081, 10, 0, 3, 0], ...]}}
+
+Each session is [start, duration, app id, title id, reason id] with start in
+seconds since midnight. The end is start + duration; when the stored end
+differs (a session running past midnight, rounding) a sixth element holds
+the difference. Written without indentation.
+"""
+
+import sys
+
+FORMAT = "compact-v1"
+
+
+def is_compact(data):
+    return isinstance(data, dict) and data.get("format") == FORMAT
+
+
+def _seconds(value):
+    try:
+        h, m, s = str(value).split(":")
+        return int(h) * 3600 + int(m) * 60 + int(float(s))
+    except (ValueError, TypeError):
+        return 0
+
+
+def _clock(seconds):
+    seconds %= 86400
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def encode(data):
+    """dict-by-date of session dicts -> compact document"""
+    tables = {"apps": ([], {}), "titles": ([], {}), "reasons": ([], {})}
+
+    def string_id(table, value):
+        values, ids = tables[table]
+        value = str(value)
+        sid = ids.get(value)
+        if sid is None:
+            sid = ids[value] = len(values)
+            values.append(value)
+        return sid
+
+    days = {}
+    for date, entries in data.items():
+        rows = []
+        for e in entries:
+            if not isinstance(e, dict):
+                continue
+            start = _seconds(e.get("start"))
+            try:
+                duration = int(e.get("duration", 0))
+            except (ValueError, TypeError):
+                duration = 0
+            row = [
+                start,
+                duration,
+                string_id("apps", e.get("app", "")),
+                string_id("titles", e.get("title", "")),
+                string_id("reasons", e.get("end_reason", "")),
+            ]
+            delta = _seconds(e.get("end")) - (start + duration)
+            if delta:
+                row.append(delta)
+            rows.append(row)
+        days[date] = rows
+
+    return {
+        "format": FORMAT,
+        "apps": tables["apps"][0],
+        "titles": tables["titles"][0],
+        "reasons": tables["reasons"][0],
+        "days": days,
+    }
+
+
+def decode(doc):
+    """Compact document -> dict-by-date of session dicts"""
+    apps, titles, reasons = doc["apps"], doc["titles"], doc["reasons"]
+    data = {}
+    for date, rows in doc["days"].items():
+        entries = []
+        for row in rows:
+            start, duration = row[0], row[1]
+            end = start + duration + (row[5] if len(row) > 5 else 0)
+            entries.append({
+                "start": _clock(start),
+                "end": _clock(end),
+                "app": apps[row[2]],
+                "title": titles[row[3]],
+                "duration": duration,
+                "end_reason": reasons[row[4]],
+            })
+        data[date] = entries
+    return data
+
+
+def iter_session_rows(doc):
+    """Yield (date, [(start, end, duration, app, title, end_reason), ...]) straight from
+    the integer rows, without building a dict per session; strings are interned once."""
+    apps = [sys.intern(v) for v in doc["apps"]]
+    titles = [sys.intern(v) for v in doc["titles"]]
+    reasons = [sys.intern(v) for v in doc["reasons"]]
+    for date, rows in doc["days"].items():
+        yield date, [
+            (
+                row[0],
+                row[0] + row[1] + (row[5] if len(row) > 5 else 0),
+                row[1],
+                apps[row[2]],
+                titles[row[3]],
+                reasons[row[4]],
+            )
+            for row in rows
+        ]
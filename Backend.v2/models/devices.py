@@ -0,0 +1,388 @@
+# models/devices.py
+import heapq
+import itertools
+import json
+import os
+import queue
+import re
+import threading
+from contextvars import ContextVar
+from datetime import date as date_cls
+from config import Config
+from models.chrome_records import record_start
+from models.metrics import timed
+from models.partitions import PartitionWriter, get_partitioned_store
+from models.retention import retention_policy
+from models.rollups import merge_rollups
+from models.usage_store import iter_dates
+
+# Data pushed by other machines lives under Config.DEVICE_DATA_DIR:
+#
+#   <device>/app_usage<tag>/    day partitions (models/partitions.py), one
+#                               folder per writing process (serve.py worker tag)
+#   <device>/chrome/            Chrome segments, one file series per profile:
+#                               chrome-<day>-<NNNN>-<profile><tag>.ndjson
+#
+# The analytics routes read the device named by ?device= (see routes/devices.py):
+# nothing or "local" is this machine's own tracker data, "all" combines
+# this machine and every device.
+
+LOCAL_DEVICE = "local"
+ALL_DEVICES = "all"
+DEVICE_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+# Device whose data the current request reads; set per request by routes/devices.py
+current_device = ContextVar("current_device", default=None)
+
+
+def valid_device_id(device):
+    return bool(DEVICE_ID.match(device or "")) and device not in (LOCAL_DEVICE, ALL_DEVICES)
+
+
+def _profile_tag(profile):
+    return re.sub(r"[^A-Za-z0-9_]", "_", str(profile or "default"))[:32]
+
+
+def list_devices():
+    """Ids of the devices that have pushed any data"""
+    if not os.path.isdir(Config.DEVICE_DATA_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(Config.DEVICE_DATA_DIR)
+        if valid_device_id(name) and os.path.isdir(os.path.join(Config.DEVICE_DATA_DIR, name))
+    )
+
+
+def _combined_version(versions):
+    # 0 still means "no data" to callers such as RollupIndex
+    versions = tuple(versions)
+    return versions if any(versions) else 0
+
+
+class CombinedUsageStore:
+    """Read-only usage store over several others (same interface as UsageStore).
+
+    `stores` is called on every refresh, so devices and writer folders that
+    appear later are picked up. Sessions of a day are merged in start order;
+    versions are tuples of the underlying versions.
+    """
+
+    def __init__(self, stores):
+        self._stores = stores
+        self._current = []
+
+    def refresh(self):
+        self._current = self._stores()
+        for store in self._current:
+            store.refresh()
+        return self.version
+
+    @property
+    def version(self):
+        return _combined_version(store.version for store in self._current)
+
+    def exists(self):
+        return any(store.exists() for store in self._stores())
+
+    def fingerprint(self):
+        self.refresh()
+        return "|".join(store.fingerprint() for store in self._current)
+
+    def day_fingerprint(self, date):
+        self.refresh()
+        return "|".join(store.day_fingerprint(date) for store in self._current)
+
+    def dates(self):
+        self.refresh()
+        return sorted(set().union(*(store.dates() for store in self._current)))
+
+    def get_day(self, date):
+        self.refresh()
+        days = [store.get_day(date) for store in self._current]
+        if len(days) == 1:
+            return days[0]
+        return tuple(heapq.merge(*days, key=lambda s: s.start))
+
+    def days(self):
+        return {date: self.get_day(date) for date in self.dates()}
+
+    def rollup(self, date):
+        self.refresh()
+        return merge_rollups(store.rollup(date) for store in self._current)
+
+    def days_rollups(self, first, last):
+        self.refresh()
+        rollups = []
+        for date in iter_dates(first, last):
+            rollup = merge_rollups(store.rollup(date) for store in self._current)
+            if rollup.session_count:
+                rollups.append(rollup)
+        return rollups
+
+    def all_time_rollup(self):
+        self.refresh()
+        return merge_rollups(store.all_time_rollup() for store in self._current)
+
+    def day_version(self, date):
+        self.refresh()
+        return _combined_version(store.day_version(date) for store in self._current)
+
+    def period_version(self, kind, key):
+        self.refresh()
+        return _combined_version(store.period_version(kind, key) for store in self._current)
+
+
+class CombinedChromeStore:
+    """Read-only Chrome store over several others.
+
+    Queries are merged in start order; their cursors cannot be resumed
+    across stores, so pagination (?cursor=) is refused.
+    """
+
+    def __init__(self, stores):
+        self._stores = stores
+
+    def query(self, start_ms=None, end_ms=None, domain=None, limit=None, cursor=None):
+        if cursor is not None:
+            raise ValueError("cursor is not supported with device=all")
+        rows = heapq.merge(
+            *(store.query(start_ms, end_ms, domain) for store in self._stores()),
+            key=lambda row: record_start(row[1]),
+        )
+        return ((None, record) for _, record in itertools.islice(rows, limit))
+
+    def iter_records(self):
+        for store in self._stores():
+            yield from store.iter_records()
+
+    def load_all(self):
+        return list(self.iter_records())
+
+    def new_records(self, since=None):
+        """ChromeSegmentStore.new_records over every store; the position maps each store to its own"""
+        since = since or {}
+        positions, records = {}, []
+        for store in self._stores():
+            previous = since.get(id(store))
+            positions[id(store)], store_records, reset = store.new_records(previous)
+            if reset and previous is not None:
+                # One store was rewritten: start over with all of them
+                return self.new_records(None)
+            records.append(store_records)
+        return positions, itertools.chain.from_iterable(records), not since
+
+    def fingerprint(self):
+        return "|".join(store.fingerprint() for store in self._stores())
+
+    def day_version(self, date):
+        return tuple(store.day_version(date) for store in self._stores())
+
+    def domain_ms(self, date):
+        totals = {}
+        for store in self._stores():
+            for domain, ms in store.domain_ms(date).items():
+                totals[domain] = totals.get(domain, 0) + ms
+        return totals
+
+    def day_hours(self, dates, domain=None):
+        totals = [[0] * 24 for _ in dates]
+        for store in self._stores():
+            for day_totals, hours in zip(totals, store.day_hours(dates, domain)):
+                for hour, ms in enumerate(hours):
+                    day_totals[hour] += ms
+        return totals
+
+    def domain_hours(self, date):
+        totals = {}
+        for store in self._stores():
+            for domain, hours in store.domain_hours(date).items():
+                current = totals.setdefault(domain, [0] * 24)
+                for hour, ms in enumerate(hours):
+                    current[hour] += ms
+        return totals
+
+
+_lock = threading.Lock()
+_usage_stores = {}
+_chrome_stores = {}
+
+
+def _app_partition_dirs(device):
+    device_dir = os.path.join(Config.DEVICE_DATA_DIR, device)
+    if not os.path.isdir(device_dir):
+        return []
+    return [
+        os.path.join(device_dir, name) for name in sorted(os.listdir(device_dir))
+        if name.startswith("app_usage")
+    ]
+
+
+def get_device_usage_store(device):
+    """Usage store for one device, or CombinedUsageStore of this machine and every device for "all\""""
+    with _lock:
+        store = _usage_stores.get(device)
+        if store is None:
+            if device == ALL_DEVICES:
+                from models.usage_store import get_local_usage_store
+                stores = lambda: [get_local_usage_store()] + [get_device_usage_store(d) for d in list_devices()]
+            else:
+                stores = lambda: [
+                    get_partitioned_store(path, Config.PARTITION_CACHE_DAYS)
+                    for path in _app_partition_dirs(device)
+                ]
+            store = _usage_stores[device] = CombinedUsageStore(stores)
+        return store
+
+
+def get_device_chrome_store(device, profile=None):
+    """Chrome store for one device (reads every profile), or the writer for one profile.
+
+    "all" gives a CombinedChromeStore of this machine and every device.
+    """
+    from models.chrome_store import ChromeSegmentStore, get_local_chrome_store
+
+    key = (device, profile)
+    with _lock:
+        store = _chrome_stores.get(key)
+        if store is None:
+            if device == ALL_DEVICES:
+                store = CombinedChromeStore(
+                    lambda: [get_local_chrome_store()] + [get_device_chrome_store(d) for d in list_devices()]
+                )
+            else:
+                tag = f"-{_profile_tag(profile)}{Config.CHROME_WRITER_TAG}" if profile is not None else ""
+                store = ChromeSegmentStore(
+                    os.path.join(Config.DEVICE_DATA_DIR, device, "chrome"),
+                    max_segment_bytes=Config.CHROME_SEGMENT_MAX_BYTES,
+                    writer_tag=tag,
+                )
+            _chrome_stores[key] = store
+        return store
+
+
+def append_device_chrome_records(device, records):
+    """Append a device's Chrome records, one segment series per chrome_profile"""
+    by_profile = {}
+    for record in records:
+        profile = record.get("chrome_profile") if isinstance(record, dict) else None
+        by_profile.setdefault(profile or "default", []).append(record)
+    added = 0
+    for profile, profile_records in by_profile.items():
+        added += get_device_chrome_store(device, profile).append(profile_records)
+    return added
+
+
+def append_new_device_chrome_records(device, records):
+    """append_device_chrome_records for a batch that may replay stored records;
+    returns a flag per record, True if it was written"""
+    by_profile = {}
+    for i, record in enumerate(records):
+        by_profile.setdefault(record.get("chrome_profile") or "default", []).append(i)
+    flags = [False] * len(records)
+    for profile, indexes in by_profile.items():
+        written = get_device_chrome_store(device, profile).append_new([records[i] for i in indexes])
+        for i, new in zip(indexes, written):
+            flags[i] = new
+    return flags
+
+
+class SessionIngestQueue:
+    """Bounded queue of pushed app sessions drained by one writer thread.
+
+    `submit` never waits for the disk: it raises queue.Full when
+    Config.INGEST_QUEUE_SIZE batches are already waiting, and the route
+    answers 503 so the tracker retries later. The writer groups everything
+    queued since its last pass by device and date, so a burst of batches
+    costs one partition write per day. With Config.RETENTION_DAYS set, the
+    first write for a device each day also downsamples its old days.
+
+    A day that fails to write does not take the rest of the pass with it:
+    its sessions are appended to <device>/failed_sessions.ndjson, and the
+    writer carries on with the other days and devices.
+    """
+
+    def __init__(self, maxsize):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._writers = {}
+        self._retained_on = {}
+
+    def submit(self, device, entries):
+        self._ensure_writer()
+        self._queue.put_nowait((device, entries))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def join(self):
+        """Wait until everything submitted so far is written"""
+        self._queue.join()
+
+    def _ensure_writer(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="session-ingest-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batches = [self._queue.get()]
+            while True:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batches)
+            except Exception as e:
+                print(f"Error writing pushed sessions: {e}")
+            for _ in batches:
+                self._queue.task_done()
+
+    @timed("SessionIngestQueue.write")
+    def _write(self, batches):
+        grouped = {}
+        for device, entries in batches:
+            for entry in entries:
+                grouped.setdefault((device, entry["date"]), []).append(
+                    {key: value for key, value in entry.items() if key != "date"}
+                )
+        for (device, date), entries in sorted(grouped.items()):
+            try:
+                self._writer(device).append(date, entries)
+            except Exception as e:
+                print(f"Error writing pushed sessions of {device} for {date}: {e}")
+                self._set_aside(device, date, entries)
+
+        policy = retention_policy()
+        if policy is not None:
+            today = date_cls.today().isoformat()
+            for device in sorted({device for device, _ in grouped}):
+                if self._retained_on.get(device) != today:
+                    self._retained_on[device] = today
+                    try:
+                        self._writer(device).downsample_cold_days(policy, today, os.path.join(device, "app_usage"))
+                    except Exception as e:
+                        print(f"Error downsampling old days of {device}: {e}")
+
+    def _writer(self, device):
+        writer = self._writers.get(device)
+        if writer is None:
+            path = os.path.join(Config.DEVICE_DATA_DIR, device, f"app_usage{Config.CHROME_WRITER_TAG}")
+            writer = self._writers[device] = PartitionWriter(path)
+        return writer
+
+    def _set_aside(self, device, date, entries):
+        path = os.path.join(Config.DEVICE_DATA_DIR, device, "failed_sessions.ndjson")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(dict(entry, date=date)) + "\n")
+            print(f"Saved {len(entries)} sessions of {device} for {date} to {path}")
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Could not save failed sessions of {device} for {date}: {e}")
+
+
+ingest_queue = SessionIngestQueue(Config.INGEST_QUEUE_SIZE)
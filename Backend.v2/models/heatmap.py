@@ -0,0 +1,178 @@
+# models/heatmap.py
+import calendar
+from datetime import timedelta
+from models import metrics
+from models.chrome_store import get_chrome_store
+from models.metrics import timed
+from models.usage_store import day_epoch, previous_date
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def hour_buckets(starts, ends, base):
+    """Seconds of the intervals [starts[i], ends[i]) (epoch seconds) in each hour of the day at `base`.
+
+    Each interval adds its partial first and last hours directly and its
+    whole hours in between as +3600/-3600 steps in a difference array, so
+    the cost is one step per interval plus one 24-bucket prefix sum.
+    """
+    partial = [0] * 24
+    steps = [0] * 25
+    for start, end in zip(starts, ends):
+        start = max(start - base, 0)
+        end = min(end - base, 86400)
+        if end <= start:
+            continue
+        first, last = start // 3600, (end - 1) // 3600
+        if first == last:
+            partial[first] += end - start
+            continue
+        partial[first] += (first + 1) * 3600 - start
+        partial[last] += end - last * 3600
+        steps[first + 1] += 3600
+        steps[last] -= 3600
+    buckets = []
+    running = 0
+    for hour in range(24):
+        running += steps[hour]
+        buckets.append(partial[hour] + running)
+    return buckets
+
+
+def _month_last(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def _empty_matrix():
+    return [[0] * 24 for _ in WEEKDAYS]
+
+
+def _add_day(matrix, day, buckets):
+    row = matrix[day.weekday()]
+    for hour, value in enumerate(buckets):
+        row[hour] += value
+
+
+def _minutes(matrix, per_minute):
+    return [[round(value / per_minute, 2) for value in row] for row in matrix]
+
+
+class HeatmapIndex:
+    """Weekday x hour-of-day totals of app sessions over a LogAnalyzer.
+
+    A day is cached as one 24-bucket vector of seconds, rebuilt only when its
+    columns change. Whole months are cached as a weekday x hour matrix with
+    the store's period version, like the RollupIndex's month nodes, so a
+    year is answered from twelve matrices and the edge days.
+
+    Only totals of every app, or of an app the analyzer has seen, are
+    cached: ?app= is free text, and caching whatever is asked for would
+    grow the caches without bound.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self._days = {}
+        self._months = {}
+        # Lower-cased analyzer.app_names, rebuilt when it grows
+        self._known_apps = set()
+        self._known_count = 0
+
+    def _cacheable(self, app):
+        if app is None:
+            return True
+        names = self.analyzer.app_names
+        if len(names) != self._known_count:
+            self._known_count = len(names)
+            self._known_apps = {name.lower() for name in names[:self._known_count]}
+        return app in self._known_apps
+
+    def day(self, day, app=None):
+        """Seconds per hour of the day's app sessions (one app if given, lower-cased)"""
+        date = day.isoformat()
+        version = self.analyzer.day_version(date)
+        cached = self._days.get((date, app))
+        hit = cached is not None and cached[0] == version
+        metrics.cache_lookup("heatmap_days", hit)
+        if hit:
+            return cached[1]
+
+        columns = self.analyzer.day_columns(date)
+        if app is None:
+            starts, ends = columns.starts, columns.ends
+        else:
+            names = self.analyzer.app_names
+            rows = [
+                (start, end) for start, end, app_id in zip(columns.starts, columns.ends, columns.app_ids)
+                if names[app_id].lower() == app
+            ]
+            starts, ends = [r[0] for r in rows], [r[1] for r in rows]
+        buckets = hour_buckets(starts, ends, day_epoch(date))
+        if self._cacheable(app):
+            self._days[(date, app)] = (version, buckets)
+        return buckets
+
+    def month(self, first, app=None):
+        store = self.analyzer.store
+        last = _month_last(first)
+        # The 1st also holds the tail of the previous month's last session
+        version = (
+            store.period_version("month", first.strftime("%Y-%m")),
+            store.day_version(previous_date(first.isoformat())),
+        )
+        if version == (0, 0):
+            return _empty_matrix()
+        cached = self._months.get((first, app))
+        hit = cached is not None and cached[0] == version
+        metrics.cache_lookup("heatmap_months", hit)
+        if hit:
+            return cached[1]
+        matrix = _empty_matrix()
+        day = first
+        while day <= last:
+            _add_day(matrix, day, self.day(day, app))
+            day += timedelta(days=1)
+        if self._cacheable(app):
+            self._months[(first, app)] = (version, matrix)
+        return matrix
+
+    def range_matrix(self, start, end, app=None):
+        """Weekday x hour seconds of every app session in [start, end]"""
+        matrix = _empty_matrix()
+        day = start
+        while day <= end:
+            month_last = _month_last(day)
+            if day.day == 1 and month_last <= end:
+                for row, month_row in zip(matrix, self.month(day, app)):
+                    for hour, value in enumerate(month_row):
+                        row[hour] += value
+                day = month_last + timedelta(days=1)
+            else:
+                _add_day(matrix, day, self.day(day, app))
+                day += timedelta(days=1)
+        return matrix
+
+
+def chrome_matrix(start, end, domain=None):
+    """Weekday x hour milliseconds of Chrome domain sessions in [start, end]"""
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    matrix = _empty_matrix()
+    for day, buckets in zip(days, get_chrome_store().day_hours([d.isoformat() for d in days], domain)):
+        _add_day(matrix, day, buckets)
+    return matrix
+
+
+@timed("heatmap")
+def get_heatmap(index, start, end, app=None, domain=None):
+    """Minutes per hour-of-day for each weekday (rows Monday..Sunday) of app and Chrome time"""
+    app = app.strip().lower() if app else None
+    domain = domain.strip().lower() if domain else None
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "app": app,
+        "domain": domain,
+        "weekdays": list(WEEKDAYS),
+        "apps": _minutes(index.range_matrix(start, end, app), 60),
+        "domains": _minutes(chrome_matrix(start, end, domain), 60000),
+    }
@@ -0,0 +1,226 @@
+# models/live_feed.py
+import itertools
+import json
+import queue
+import threading
+from datetime import datetime
+from config import Config
+from models.chrome_records import format_date, parse_timestamp
+from models.chrome_store import get_local_chrome_store
+from models.metrics import timed
+from models.screen_time import get_total_minutes
+from models.top_applications import get_top_applications
+from models.top_domains import get_top_domains
+from models.usage_store import format_clock, get_local_usage_store
+
+
+class Subscription:
+    """One client's bounded queue of (id, event, data) tuples.
+
+    The watcher never waits on a client: when the queue is full the backlog
+    is dropped and replaced by a single "resync" event, which tells the
+    dashboard to refetch the day instead of replaying what it missed.
+    """
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put_nowait((item[0], "resync", {"reason": "client too slow"}))
+
+    def get(self, timeout):
+        """Next item, or None after `timeout` seconds without one"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def _session_dict(date, s):
+    return {"date": date, "start": format_clock(s.start), "end": format_clock(s.end), "app": s.app,
+            "title": s.title, "duration": s.duration, "end_reason": s.end_reason}
+
+
+def _block_start(block):
+    return block.split(" - ", 1)[0]
+
+
+def block_deltas(before, after):
+    """(app, block, replaced block or None) for each sunburst block in `after` that is
+    not in `before`; a block that grew keeps its start, so it replaces the old one"""
+    deltas = []
+    for app, blocks in after.items():
+        old = set(before.get(app, ()))
+        by_start = {_block_start(b): b for b in old}
+        for block in blocks:
+            if block not in old:
+                replaced = by_start.get(_block_start(block))
+                deltas.append((app, block, replaced))
+    return deltas
+
+
+class LiveFeed:
+    """Watches the app usage store and the Chrome store and fans changes out to subscribers.
+
+    A single thread polls every Config.STREAM_POLL_INTERVAL seconds (or as
+    soon as `notify` is called by the Chrome ingest route) and works out the
+    deltas once for all open streams:
+
+        session  a new app session                 {"date", "start", "end", "app", ...}
+        block    a new or extended sunburst block  {"date", "app", "block", "replaces"}
+        totals   the day's new totals              {"date", "total_minutes", "top_applications"}
+        chrome   new Chrome records                {"records", "top_domains"}
+        resync   refetch instead of patching       {"reason"}
+
+    Store refreshes only read what was appended, so N dashboards cost one
+    incremental parse, not N. The thread starts with the first subscriber.
+    Only this machine's data is watched, not devices that push to it.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._wake = threading.Event()
+        self._thread = None
+        self._ids = itertools.count(1)
+        self._version = None
+        self._day_versions = {}
+        self._day_sessions = {}
+        self._day_blocks = {}
+        self._chrome_fingerprint = None
+        self._chrome_position = None
+
+    def subscribe(self):
+        """A new Subscription, or None if Config.STREAM_MAX_CLIENTS streams are already open"""
+        with self._lock:
+            if len(self._subscribers) >= Config.STREAM_MAX_CLIENTS:
+                return None
+            subscription = Subscription(Config.STREAM_QUEUE_SIZE)
+            self._subscribers.add(subscription)
+            if self._thread is None:
+                self._baseline()
+                self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def notify(self):
+        """Poll now instead of at the next interval (called after Chrome ingest)"""
+        self._wake.set()
+
+    def _publish(self, event, data):
+        item = (next(self._ids), event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(item)
+
+    def _baseline(self):
+        """Remember the current state so the first poll only reports what changes after it"""
+        store = get_local_usage_store()
+        self._version = store.version
+        dates = list(store.dates())
+        self._day_versions = {date: store.day_version(date) for date in dates}
+        self._day_sessions = {date: store.rollup(date).session_count for date in dates}
+        # Only the latest day's blocks are kept; blocks of an older day that
+        # changes are all sent as new
+        self._day_blocks = {}
+        if dates:
+            latest = max(dates)
+            self._day_blocks[latest] = self.analyzer.get_merged_sessions(date_filter=latest)
+
+        chrome = get_local_chrome_store()
+        self._chrome_fingerprint = chrome.fingerprint()
+        self._chrome_position, _, _ = chrome.new_records()
+
+    def _run(self):
+        while True:
+            self._wake.wait(Config.STREAM_POLL_INTERVAL)
+            self._wake.clear()
+            with self._lock:
+                if not self._subscribers:
+                    continue
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Error in live feed: {e}")
+
+    @timed("LiveFeed.poll")
+    def poll(self):
+        self._poll_usage()
+        self._poll_chrome()
+
+    def _poll_usage(self):
+        store = get_local_usage_store()
+        version = store.version
+        if version == self._version:
+            return
+        self._version = version
+
+        changed = []
+        for date in store.dates():
+            day_version = store.day_version(date)
+            if self._day_versions.get(date) != day_version:
+                self._day_versions[date] = day_version
+                changed.append(date)
+
+        for date in sorted(changed):
+            sessions = store.get_day(date)
+            for s in sessions[self._day_sessions.get(date, 0):]:
+                self._publish("session", _session_dict(date, s))
+            self._day_sessions[date] = len(sessions)
+
+            blocks = self.analyzer.get_merged_sessions(date_filter=date)
+            for app, block, replaced in block_deltas(self._day_blocks.get(date, {}), blocks):
+                self._publish("block", {"date": date, "app": app, "block": block, "replaces": replaced})
+            self._day_blocks[date] = blocks
+
+            totals = get_total_minutes(date)
+            self._publish("totals", {
+                "date": date,
+                "total_minutes": totals["total_minutes"],
+                "top_applications": get_top_applications(date),
+            })
+
+    def _poll_chrome(self):
+        chrome = get_local_chrome_store()
+        fingerprint = chrome.fingerprint()
+        if fingerprint == self._chrome_fingerprint:
+            return
+        self._chrome_fingerprint = fingerprint
+
+        # In arrival order, so a record is sent however old its start time is
+        self._chrome_position, records, reset = chrome.new_records(self._chrome_position)
+        if reset:
+            # Rewritten (retention, migration): what clients hold may be gone
+            self._publish("resync", {"reason": "chrome records rewritten"})
+            return
+        records = list(records)
+        if not records:
+            return
+        today = format_date(parse_timestamp(datetime.now().isoformat(" ")))
+        for i in range(0, len(records), Config.STREAM_CHROME_BATCH):
+            self._publish("chrome", {
+                "records": records[i:i + Config.STREAM_CHROME_BATCH],
+                "top_domains": get_top_domains(today),
+            })
+
+
+def format_event(item):
+    """One queued (id, event, data) tuple as an SSE message"""
+    event_id, event, data = item
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,193 @@
+# models/metrics.py
+import os
+import sys
+import threading
+import time
+from functools import wraps
+from config import Config
+
+# Read once at import: with metrics off, `timed` hands back the undecorated
+# function and the helpers below return before touching the registry.
+enabled = Config.METRICS_ENABLED
+
+# Histogram bucket bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "activity_request_duration_seconds": ("histogram", "HTTP request latency by route"),
+    "activity_hot_path_seconds": ("histogram", "Time spent in instrumented loading, parsing and merging functions"),
+    "activity_bytes_read_total": ("counter", "Bytes read from data files"),
+    "activity_bytes_written_total": ("counter", "Bytes written to data files"),
+    "activity_cache_requests_total": ("counter", "Cache lookups by cache and result"),
+    "activity_cache_hit_ratio": ("gauge", "Share of cache lookups that were hits"),
+}
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Registry:
+    """Counters and histograms keyed by (metric name, sorted label pairs)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {key: (list(h.counts), h.total, h.count) for key, h in self.histograms.items()}
+
+        # Hit ratio per cache, derived from the lookup counter
+        lookups = {}
+        for (name, labels), value in counters.items():
+            if name == "activity_cache_requests_total":
+                labels = dict(labels)
+                hits, total = lookups.get(labels["cache"], (0, 0))
+                lookups[labels["cache"]] = (hits + (value if labels["result"] == "hit" else 0), total + value)
+        gauges = {("activity_cache_hit_ratio", (("cache", c),)): h / t for c, (h, t) in lookups.items() if t}
+
+        lines = []
+        for name, (kind, text) in HELP.items():
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (n, labels), (counts, total, count) in sorted(histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, c in zip(BUCKETS, counts):
+                        cumulative += c
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', repr(bound))])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {total!r}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+            else:
+                values = counters if kind == "counter" else gauges
+                for (n, labels), value in sorted(values.items()):
+                    if n == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def inc(name, value=1, **labels):
+    if enabled:
+        registry.inc(name, value, **labels)
+
+
+def observe(name, seconds, **labels):
+    if enabled:
+        registry.observe(name, seconds, **labels)
+
+
+def bytes_read(source, count):
+    if enabled:
+        registry.inc("activity_bytes_read_total", count, source=source)
+
+
+def bytes_written(target, count):
+    if enabled:
+        registry.inc("activity_bytes_written_total", count, target=target)
+
+
+def cache_lookup(cache, hit):
+    if enabled:
+        registry.inc("activity_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def timed(name):
+    """Decorator: record each call's duration under activity_hot_path_seconds{function=name}"""
+    def decorator(fn):
+        if not enabled:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                registry.observe("activity_hot_path_seconds", time.perf_counter() - start, function=name)
+        return wrapper
+    return decorator
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every `interval` seconds.
+
+    The result is in the folded-stack format ("outer;inner;leaf count")
+    that flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.samples.items(), key=lambda kv: -kv[1]))
@@ -0,0 +1,470 @@
+# models/partitions.py
+import gzip
+import json
+import lzma
+import os
+import threading
+from collections import OrderedDict
+from models import metrics
+from models.metrics import timed
+from models.rollups import EMPTY_ROLLUP, merge_rollups, period_keys, rollup_entry, rollup_from_entry, rollup_sessions
+from models.usage_store import _file_identity, iter_dates, session_from_entry
+
+# Day-partitioned app usage, written by the tracker's PartitionedDataManager:
+#
+#   <dir>/manifest.json
+#       {"format": "partitions-v2", "revision": 57,
+#        "months": {"2025-09": {"file": "2025-09.index.json", "revision": 57}}}
+#   <dir>/2025-09.index.json
+#       {"month": "2025-09", "revision": 57,
+#        "days": {"2025-09-16": {"file": "2025-09-16.json", "revision": 57, "sessions": 140,
+#                                "total_seconds": 31234, "apps": [["chrome.exe", 20110], ...]}}}
+#   <dir>/2025-09-16.json        [{"start": "01:01:13", "end": ..., "app": ..., ...}, ...]
+#   <dir>/2025-09-01.json.gz     older days, gzip or lzma (.json.xz) compressed
+#
+# Every write bumps the manifest revision and stamps it on the day and the
+# month it touched, so revisions double as data versions that every process
+# agrees on. A write replaces the day's file, then its month's index, then
+# the manifest, so it does not grow with the history. partitions-v1
+# manifests kept every day's totals themselves ("days" instead of "months");
+# readers still accept them and writers convert them when they open one.
+
+FORMAT = "partitions-v2"
+MANIFEST = "manifest.json"
+COMPRESSORS = {"gzip": (".gz", gzip.open), "lzma": (".xz", lzma.open)}
+
+
+def index_name(month):
+    return f"{month}.index.json"
+
+
+def _open_partition(path):
+    for suffix, opener in COMPRESSORS.values():
+        if path.endswith(suffix):
+            return opener(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _write_json(path, data, compression=None):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as raw:
+        if compression:
+            with COMPRESSORS[compression][1](raw, "wt", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+        else:
+            raw.write(json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+
+
+def day_rollup_entry(entries):
+    """Index totals for one day's session dicts (the same numbers as its DayRollup)"""
+    return rollup_entry(rollup_sessions(session_from_entry(e) for e in entries))
+
+
+def months_from_days(days):
+    """A partitions-v1 "days" mapping as {month: month index}"""
+    months = {}
+    for date, entry in days.items():
+        months.setdefault(date[:7], {})[date] = entry
+    return {
+        month: {"month": month, "revision": max(e["revision"] for e in days.values()), "days": days}
+        for month, days in sorted(months.items())
+    }
+
+
+def write_partitions(data, partition_dir, compress_before=None, compression="gzip"):
+    """Write a dict-by-date of session dicts as partitions plus their indexes and manifest.
+
+    Days before `compress_before` ('YYYY-MM-DD') are compressed.
+    """
+    index = ManifestWriter(partition_dir)
+    for date in sorted(data):
+        entries = [e for e in data[date] if isinstance(e, dict)]
+        name = f"{date}.json"
+        method = compression if compress_before and date < compress_before else None
+        if method:
+            name += COMPRESSORS[method][0]
+        _write_json(os.path.join(partition_dir, name), entries, method)
+        index.put(date, dict(file=name, revision=index.bump(), **day_rollup_entry(entries)))
+    index.write()
+    return len(data)
+
+
+class MonthIndex:
+    """One month's per-day totals and versions; immutable once built"""
+
+    def __init__(self, raw):
+        self.revision = raw.get("revision", 0)
+        self.days = raw.get("days", {})
+        self.rollups = {date: rollup_from_entry(e) for date, e in self.days.items()}
+        self.total = merge_rollups(self.rollups.values())
+        self.period_versions = {}
+        for date, entry in self.days.items():
+            for key in period_keys(date):
+                self.period_versions[key] = max(self.period_versions.get(key, 0), entry["revision"])
+
+
+class Manifest:
+    """A loaded manifest with its month indexes; immutable once built"""
+
+    def __init__(self, revision=0, months=None):
+        self.revision = revision
+        self.months = months or {}
+        self.days = {}
+        self.rollups = {}
+        self.period_versions = {}
+        for index in self.months.values():
+            self.days.update(index.days)
+            self.rollups.update(index.rollups)
+            # A week can span two months
+            for key, version in index.period_versions.items():
+                self.period_versions[key] = max(self.period_versions.get(key, 0), version)
+        self.all_time = merge_rollups(index.total for index in self.months.values())
+
+
+class PartitionedUsageStore:
+    """Usage store over a partition directory: the manifest answers totals and
+    versions, and a day's sessions come from that day's file alone.
+
+    Recently read days are kept in an LRU of `cache_days` entries, keyed by
+    the day's revision so a rewritten day is read again.
+    """
+
+    def __init__(self, partition_dir, cache_days=32):
+        self.partition_dir = partition_dir
+        self.manifest_file = os.path.join(partition_dir, MANIFEST)
+        self.cache_days = cache_days
+        self._lock = threading.RLock()
+        self._identity = None
+        self._manifest = Manifest()
+        self._cache = OrderedDict()
+        self._all_days = None
+
+    def exists(self):
+        return os.path.exists(self.manifest_file)
+
+    def refresh(self):
+        identity = _file_identity(self.manifest_file)
+        if identity != self._identity:
+            with self._lock:
+                self._load_manifest(identity)
+        return self._manifest.revision
+
+    def _load_manifest(self, identity):
+        raw = {}
+        try:
+            if identity is not None:
+                with open(self.manifest_file, "r", encoding="utf-8") as f:
+                    content = f.read()
+                metrics.bytes_read("partition_manifest", len(content))
+                raw = json.loads(content)
+            months = self._load_months(raw)
+        except (OSError, json.JSONDecodeError, KeyError, TypeError) as e:
+            print(f"Error reading partition manifest: {e}")
+            return
+        self._manifest = Manifest(raw.get("revision", 0), months)
+        self._identity = identity
+
+    def _load_months(self, raw):
+        """{month: MonthIndex}; only the indexes whose revision changed are read again"""
+        if "days" in raw:
+            return {month: MonthIndex(index) for month, index in months_from_days(raw["days"]).items()}
+        previous = self._manifest.months
+        months = {}
+        for month, entry in sorted(raw.get("months", {}).items()):
+            index = previous.get(month)
+            if index is None or index.revision != entry["revision"]:
+                with open(os.path.join(self.partition_dir, entry["file"]), "r", encoding="utf-8") as f:
+                    content = f.read()
+                metrics.bytes_read("partition_index", len(content))
+                index = MonthIndex(json.loads(content))
+            months[month] = index
+        return months
+
+    @property
+    def version(self):
+        return self.refresh()
+
+    def fingerprint(self):
+        self.refresh()
+        return f"{self._identity}|{self._manifest.revision}"
+
+    def day_fingerprint(self, date):
+        # The manifest alone answers this; the partition is not opened
+        self.refresh()
+        entry = self._manifest.days.get(date)
+        if entry is None:
+            return "empty"
+        return f"{entry['revision']}:{entry['sessions']}:{entry['total_seconds']}"
+
+    def dates(self):
+        self.refresh()
+        return self._manifest.days.keys()
+
+    @timed("PartitionedUsageStore.get_day")
+    def get_day(self, date):
+        self.refresh()
+        manifest = self._manifest
+        entry = manifest.days.get(date)
+        if entry is None:
+            return ()
+        with self._lock:
+            cached = self._cache.get(date)
+            hit = cached is not None and cached[0] == entry["revision"]
+            metrics.cache_lookup("partitions", hit)
+            if hit:
+                self._cache.move_to_end(date)
+                return cached[1]
+
+        entry, sessions = self._read_day(date, entry)
+
+        with self._lock:
+            self._cache[date] = (entry["revision"], sessions)
+            self._cache.move_to_end(date)
+            while len(self._cache) > self.cache_days:
+                self._cache.popitem(last=False)
+        return sessions
+
+    def _read_day(self, date, entry):
+        try:
+            return entry, self._read_partition(entry["file"])
+        except FileNotFoundError:
+            # Compressed by the tracker after the manifest was read
+            with self._lock:
+                self._load_manifest(_file_identity(self.manifest_file))
+            entry = self._manifest.days.get(date, entry)
+            return entry, self._read_partition(entry["file"])
+
+    def _read_partition(self, name):
+        path = os.path.join(self.partition_dir, name)
+        with _open_partition(path) as f:
+            content = f.read()
+        metrics.bytes_read("partitions", len(content))
+        try:
+            entries = json.loads(content)
+        except json.JSONDecodeError as e:
+            print(f"Error reading partition {name}: {e}")
+            return ()
+        return tuple(session_from_entry(e) for e in entries if isinstance(e, dict))
+
+    def days(self):
+        """Every day's sessions.
+
+        Reads every partition the first time; after that only days whose
+        revision changed are read again. Only the snapshot publisher and
+        whole-history queries call this.
+        """
+        self.refresh()
+        with self._lock:
+            previous = self._all_days or {}
+            all_days = {}
+            for date, entry in list(self._manifest.days.items()):
+                cached = previous.get(date) or self._cache.get(date)
+                if cached is None or cached[0] != entry["revision"]:
+                    entry, sessions = self._read_day(date, entry)
+                    cached = (entry["revision"], sessions)
+                all_days[date] = cached
+            self._all_days = all_days
+            return {date: sessions for date, (_, sessions) in all_days.items()}
+
+    def rollup(self, date):
+        self.refresh()
+        return self._manifest.rollups.get(date, EMPTY_ROLLUP)
+
+    def days_rollups(self, first, last):
+        self.refresh()
+        rollups = self._manifest.rollups
+        return [rollups[d] for d in iter_dates(first, last) if d in rollups]
+
+    def all_time_rollup(self):
+        self.refresh()
+        return self._manifest.all_time
+
+    def day_version(self, date):
+        self.refresh()
+        entry = self._manifest.days.get(date)
+        return entry["revision"] if entry else 0
+
+    def period_version(self, kind, key):
+        self.refresh()
+        return self._manifest.period_versions.get((kind, key), 0)
+
+    def export_state(self):
+        with self._lock:
+            self.refresh()
+            manifest = self._manifest
+            return {
+                "fingerprint": self.fingerprint(),
+                "exists": self.exists(),
+                "version": manifest.revision,
+                "days": self.days(),
+                "day_versions": {date: e["revision"] for date, e in manifest.days.items()},
+                "period_versions": dict(manifest.period_versions),
+                "rollups": manifest.rollups,
+                "all_time": manifest.all_time,
+            }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_partitioned_store(partition_dir, cache_days=32):
+    with _stores_lock:
+        store = _stores.get(partition_dir)
+        if store is None:
+            store = _stores[partition_dir] = PartitionedUsageStore(partition_dir, cache_days)
+        return store
+
+
+class ManifestWriter:
+    """The manifest and month indexes of a partition directory, as its one writer keeps them.
+
+    put() records a day's entry (stamped with a revision from bump());
+    write() then replaces the indexes of the months that changed and the
+    manifest. A partitions-v1 manifest is converted when it is opened.
+    """
+
+    def __init__(self, partition_dir):
+        self.partition_dir = partition_dir
+        self.manifest_file = os.path.join(partition_dir, MANIFEST)
+        os.makedirs(partition_dir, exist_ok=True)
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            raw = {}
+        self.revision = raw.get("revision", 0)
+        self.months = {}
+        self._month_revisions = {}
+        self._changed = set()
+        if "days" in raw:
+            for month, index in months_from_days(raw["days"]).items():
+                self.months[month] = index["days"]
+                self._changed.add(month)
+            self.write()
+        for month, entry in raw.get("months", {}).items():
+            with open(os.path.join(partition_dir, entry["file"]), "r", encoding="utf-8") as f:
+                self.months[month] = json.load(f)["days"]
+            self._month_revisions[month] = entry["revision"]
+
+    def get(self, date):
+        return self.months.get(date[:7], {}).get(date)
+
+    def items(self):
+        """(date, entry) of every day in date order"""
+        for month in sorted(self.months):
+            yield from self.months[month].items()
+
+    def bump(self):
+        self.revision += 1
+        return self.revision
+
+    def put(self, date, entry):
+        month = date[:7]
+        days = self.months.setdefault(month, {})
+        added = date not in days
+        days[date] = entry
+        if added and any(d > date for d in days):
+            self.months[month] = dict(sorted(days.items()))
+        self._changed.add(month)
+
+    def write(self):
+        for month in sorted(self._changed):
+            _write_json(
+                os.path.join(self.partition_dir, index_name(month)),
+                {"month": month, "revision": self.revision, "days": self.months[month]},
+            )
+            self._month_revisions[month] = self.revision
+        self._changed.clear()
+        months = {
+            month: {"file": index_name(month), "revision": self._month_revisions[month]}
+            for month in sorted(self.months)
+        }
+        _write_json(self.manifest_file, {"format": FORMAT, "revision": self.revision, "months": months})
+
+
+def session_key(entry):
+    """Identity of a pushed session dict, for dropping ones sent twice"""
+    if entry.get("session_id"):
+        return entry["session_id"]
+    return tuple(entry.get(key) for key in ("start", "end", "app", "title", "duration", "end_reason"))
+
+
+class PartitionWriter:
+    """Appends sessions to a partition directory in the tracker's layout.
+
+    Keeps the month indexes in memory, so there must be only one writer per
+    directory (see models/devices.py). Days are written uncompressed; a
+    compressed day that gets new sessions is rewritten as plain JSON.
+    Downsampled days are marked "downsampled": true in their index, like
+    the tracker's PartitionedDataManager does.
+    """
+
+    def __init__(self, partition_dir):
+        self.partition_dir = partition_dir
+        self.index = ManifestWriter(partition_dir)
+
+    @timed("PartitionWriter.append")
+    def append(self, date, entries):
+        """Add sessions to a day; returns how many were new.
+
+        A session already stored, or sent earlier in the batch, is dropped,
+        so a tracker that retries a push after a lost response does not count
+        the same time twice. Sessions are matched by the "session_id" the
+        tracker gives each one; sessions from trackers that send none are
+        matched on all their fields.
+        """
+        day = self.index.get(date)
+        existing = []
+        if day:
+            with _open_partition(os.path.join(self.partition_dir, day["file"])) as f:
+                existing = json.load(f)
+        seen = {session_key(entry) for entry in existing}
+        new = []
+        for entry in entries:
+            key = session_key(entry)
+            if key not in seen:
+                seen.add(key)
+                new.append(entry)
+        if not new:
+            return 0
+        entries = existing + new
+
+        name = f"{date}.json"
+        _write_json(os.path.join(self.partition_dir, name), entries)
+        self.index.put(date, dict(file=name, revision=self.index.bump(), **day_rollup_entry(entries)))
+        self.index.write()
+        metrics.bytes_written("partitions", os.path.getsize(os.path.join(self.partition_dir, name)))
+
+        if day and day["file"] != name:
+            try:
+                os.remove(os.path.join(self.partition_dir, day["file"]))
+            except OSError as e:
+                print(f"Could not remove old partition {day['file']}: {e}")
+        return len(new)
+
+    @timed("PartitionWriter.downsample")
+    def downsample_cold_days(self, policy, today, archive_name):
+        """Replace the sessions of days before the retention cutoff with their buckets
+        (models/retention.py); returns the dates changed"""
+        cutoff = policy.cutoff(today)
+        changed = [date for date, day in self.index.items() if date < cutoff and not day.get("downsampled")]
+        for date in changed:
+            day = self.index.get(date)
+            path = os.path.join(self.partition_dir, day["file"])
+            with _open_partition(path) as f:
+                data = {date: json.load(f)}
+            policy.apply(data, today, archive_name)
+            compression = next(
+                (method for method, (suffix, _) in COMPRESSORS.items() if day["file"].endswith(suffix)), None
+            )
+            _write_json(path, data[date], compression)
+            self.index.put(
+                date, dict(day, revision=self.index.bump(), downsampled=True, **day_rollup_entry(data[date]))
+            )
+        if changed:
+            self.index.write()
+        return changed
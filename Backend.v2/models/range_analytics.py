@@ -0,0 +1,166 @@
+# models/range_analytics.py
+import calendar
+from datetime import date as date_cls, timedelta
+from config import Config
+from models import metrics
+from models.rollups import EMPTY_ROLLUP, merge_rollups
+from models.top_applications import format_top_applications
+from models.usage_store import get_usage_store
+
+GRANULARITIES = ("day", "week", "month")
+
+
+def parse_range(date_from, date_to, max_days=None):
+    """Validate 'YYYY-MM-DD' bounds spanning at most `max_days` days (Config.RANGE_MAX_DAYS
+    by default); raises ValueError with a user-facing message"""
+    if not date_from or not date_to:
+        raise ValueError("Both 'from' and 'to' are required (format: YYYY-MM-DD)")
+    try:
+        start = date_cls.fromisoformat(date_from)
+        end = date_cls.fromisoformat(date_to)
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+    if start > end:
+        raise ValueError("'from' must not be after 'to'")
+    max_days = max_days or Config.RANGE_MAX_DAYS
+    if (end - start).days + 1 > max_days:
+        raise ValueError(f"The range must not span more than {max_days} days")
+    return start, end
+
+
+def _week_bounds(day):
+    monday = day - timedelta(days=day.weekday())
+    return monday, monday + timedelta(days=6)
+
+
+def _month_bounds(day):
+    first = day.replace(day=1)
+    return first, day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def iter_periods(start, end, granularity):
+    """Yield (label, period_start, period_end) clipped to [start, end]"""
+    day = start
+    while day <= end:
+        if granularity == "month":
+            _, period_end = _month_bounds(day)
+            label = day.strftime("%Y-%m")
+        elif granularity == "week":
+            _, period_end = _week_bounds(day)
+            year, week, _ = day.isocalendar()
+            label = f"{year}-W{week:02d}"
+        else:
+            period_end = day
+            label = day.isoformat()
+        period_end = min(period_end, end)
+        yield label, day, period_end
+        day = period_end + timedelta(days=1)
+
+
+class RollupIndex:
+    """Day -> week -> month hierarchy of rollups over a UsageStore.
+
+    Week and month nodes are merged from day rollups on first use and cached
+    with the store's period version, so they are rebuilt only after a date
+    inside them changes. A range is answered with as many whole month and
+    week nodes as fit; partial edge periods fall back to day rollups. A week
+    that runs into a month the range covers whole is skipped for day rollups,
+    so the range switches to month nodes as soon as that month starts.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or get_usage_store()
+        self._nodes = {}
+
+    def day(self, day):
+        return self.store.rollup(day.isoformat())
+
+    def week(self, monday):
+        year, week, _ = monday.isocalendar()
+        return self._node("week", f"{year}-W{week:02d}", monday, monday + timedelta(days=6))
+
+    def month(self, first):
+        _, last = _month_bounds(first)
+        return self._node("month", first.strftime("%Y-%m"), first, last)
+
+    def _node(self, kind, key, first, last):
+        version = self.store.period_version(kind, key)
+        if version == 0:
+            return EMPTY_ROLLUP
+        cached = self._nodes.get((kind, key))
+        hit = cached is not None and cached[0] == version
+        metrics.cache_lookup("rollup_index", hit)
+        if hit:
+            return cached[1]
+        rollups = self.store.days_rollups(first.isoformat(), last.isoformat())
+        node = merge_rollups(rollups)
+        self._nodes[(kind, key)] = (version, node)
+        return node
+
+    def range_rollup(self, start, end):
+        """Rollup of every session dated in [start, end]"""
+        parts = []
+        day = start
+        while day <= end:
+            month_first, month_last = _month_bounds(day)
+            week_first, week_last = _week_bounds(day)
+            if day == month_first and month_last <= end:
+                parts.append(self.month(day))
+                day = month_last + timedelta(days=1)
+            elif day == week_first and week_last <= end and not (
+                month_last < week_last and _month_bounds(week_last)[1] <= end
+            ):
+                parts.append(self.week(day))
+                day = week_last + timedelta(days=1)
+            else:
+                parts.append(self.day(day))
+                day += timedelta(days=1)
+        return merge_rollups(parts)
+
+
+def range_total_screen_time(index, start, end, granularity=None):
+    result = {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "total_minutes": round(index.range_rollup(start, end).total_seconds / 60, 2),
+    }
+    if granularity:
+        result["periods"] = [
+            {
+                "period": label,
+                "from": first.isoformat(),
+                "to": last.isoformat(),
+                "total_minutes": round(index.range_rollup(first, last).total_seconds / 60, 2),
+            }
+            for label, first, last in iter_periods(start, end, granularity)
+        ]
+    return result
+
+
+def range_top_applications(index, start, end, granularity=None):
+    result = {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "applications": format_top_applications(index.range_rollup(start, end).app_seconds),
+    }
+    if granularity:
+        result["periods"] = [
+            {
+                "period": label,
+                "from": first.isoformat(),
+                "to": last.isoformat(),
+                "applications": format_top_applications(index.range_rollup(first, last).app_seconds),
+            }
+            for label, first, last in iter_periods(start, end, granularity)
+        ]
+    return result
+
+
+def range_merged_sessions(analyzer, start, end, granularity=None):
+    """Merged sessions for the whole range, or {period label: merged sessions}"""
+    if not granularity:
+        return analyzer.get_merged_range(start.isoformat(), end.isoformat())
+    return {
+        label: analyzer.get_merged_range(first.isoformat(), last.isoformat())
+        for label, first, last in iter_periods(start, end, granularity)
+    }
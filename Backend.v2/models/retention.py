@@ -0,0 +1,276 @@
+# models/retention.py
+"""Downsampling of old app sessions and Chrome records.
+
+App sessions use the same algorithm as the tracker's retention.py: days
+older than the retention window keep one entry per app per minute or hour
+bucket, with end_reason "downsampled" and the title that had the most time
+in the bucket. Chrome records become one record per domain (and Chrome
+profile) per bucket:
+
+    {"domain": "youtube.com", "url": "", "start_ms": ..., "end_ms": ...,
+     "duration_ms": ..., "downsampled": <number of records that started in it>}
+
+Durations are split at bucket boundaries, so per-app, per-domain, per-day
+and per-hour totals stay exact; back-to-back buckets of one app or domain
+are merged into one entry. The buckets are ordinary sessions and records,
+so every store and analytics model reads them unchanged.
+
+The tracker downsamples the app usage storage it writes. The backend does
+the same for what it writes itself: the Chrome stores and the sessions
+pushed by other devices. Chrome segments are picked by the start times of
+their records, so a record synced days late is downsampled too, once the
+day it arrived on is over.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import date as date_cls, timedelta
+from config import Config
+from models.chrome_records import format_date, record_domain, record_end, record_start
+from models.usage_store import day_epoch, format_clock, parse_clock
+
+DOWNSAMPLED = "downsampled"
+BUCKET_SECONDS = {"minute": 60, "hour": 3600}
+
+
+def downsample_sessions(entries, bucket_seconds):
+    """One day's session dicts as one entry per app per bucket, in time order.
+
+    Sessions are cut at midnight. A session that ran past it ends the last
+    bucket and keeps the time after midnight, so its entry ends before it
+    starts like the tracker's own entries for such sessions.
+    """
+    last_bucket = 86400 - bucket_seconds
+    buckets = {}  # (bucket start, app) -> [seconds, {title: seconds}]
+    crossed = {}  # app -> [seconds after midnight, {title: seconds}]
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            remaining = int(entry.get("duration", 0))
+        except (ValueError, TypeError):
+            continue
+        app = str(entry.get("app", ""))
+        title = str(entry.get("title", ""))
+        t = parse_clock(entry.get("start"))
+        while remaining > 0 and t < 86400:
+            bucket = t - t % bucket_seconds
+            part = min(remaining, bucket + bucket_seconds - t)
+            totals = buckets.get((bucket, app))
+            if totals is None:
+                totals = buckets[(bucket, app)] = [0, {}]
+            totals[0] += part
+            totals[1][title] = totals[1].get(title, 0) + part
+            t += part
+            remaining -= part
+        if remaining > 0:
+            past = crossed.setdefault(app, [0, {}])
+            past[0] += remaining
+            past[1][title] = past[1].get(title, 0) + remaining
+
+    def order(item):
+        (bucket, app), _ = item
+        # In the last bucket the apps that ran past midnight go last, up to it
+        return bucket, bucket == last_bucket and app in crossed
+
+    runs = []  # [start, seconds, app, {title: seconds}]
+    cursor = 0
+    # Dicts keep insertion order, so apps within a bucket stay in first-seen order
+    for (bucket, app), (seconds, titles) in sorted(buckets.items(), key=order):
+        if bucket == last_bucket and app in crossed:
+            start = 86400 - seconds
+        else:
+            # Overlapping sessions can fill a bucket past its end; never pack past midnight
+            start = min(max(bucket, cursor), 86400 - seconds)
+        cursor = start + seconds
+        run = runs[-1] if runs else None
+        if run is not None and run[2] == app and run[0] + run[1] == start:
+            # A session that runs across buckets stays one entry
+            run[1] += seconds
+            for title, title_seconds in titles.items():
+                run[3][title] = run[3].get(title, 0) + title_seconds
+        else:
+            runs.append([start, seconds, app, titles])
+
+    for run in runs:
+        if run[0] + run[1] == 86400 and run[2] in crossed:
+            seconds, titles = crossed.pop(run[2])
+            run[1] += seconds
+            for title, title_seconds in titles.items():
+                run[3][title] = run[3].get(title, 0) + title_seconds
+    return [
+        {
+            "start": format_clock(start % 86400),
+            "end": format_clock((start + seconds) % 86400),
+            "app": app,
+            "title": max(titles, key=titles.get),
+            "duration": seconds,
+            "end_reason": DOWNSAMPLED,
+        }
+        for start, seconds, app, titles in runs
+    ]
+
+
+def downsample_records(records, bucket_ms):
+    """Chrome records as one record per domain and profile per bucket, in start order"""
+    buckets = {}  # (bucket start, domain, profile) -> [ms, records]
+    for record in records:
+        start, end = record_start(record), record_end(record)
+        key_parts = (record_domain(record).lower(), record.get("chrome_profile") if isinstance(record, dict) else None)
+        t = start
+        while t < end:
+            bucket = t - t % bucket_ms
+            part = min(end, bucket + bucket_ms) - t
+            totals = buckets.get((bucket,) + key_parts)
+            if totals is None:
+                totals = buckets[(bucket,) + key_parts] = [0, 0]
+            totals[0] += part
+            if t == start:
+                totals[1] += 1
+            t += part
+
+    downsampled = []
+    open_runs = {}  # (domain, profile) -> its latest record
+    for (bucket, domain, profile), (ms, count) in sorted(buckets.items(), key=lambda item: item[0][0]):
+        run = open_runs.get((domain, profile))
+        if run is not None and run["end_ms"] == bucket:
+            # A record that runs across buckets stays one record
+            run["end_ms"] += ms
+            run["duration_ms"] += ms
+            run[DOWNSAMPLED] += count
+            continue
+        record = {
+            "domain": domain,
+            "url": "",
+            "start_ms": bucket,
+            "end_ms": bucket + ms,
+            "duration_ms": ms,
+            DOWNSAMPLED: count,
+        }
+        if profile is not None:
+            record["chrome_profile"] = profile
+        downsampled.append(record)
+        open_runs[(domain, profile)] = record
+    return downsampled
+
+
+def is_downsampled(record):
+    return isinstance(record, dict) and DOWNSAMPLED in record
+
+
+class RetentionPolicy:
+    """Keep raw data for `keep_days` days, downsample older days into
+    `bucket` ("minute" or "hour") buckets and, with an `archive_dir`, append
+    the raw data to "<archive_dir>/<name>-<YYYY-MM>.ndjson.gz" first.
+    """
+
+    def __init__(self, keep_days, bucket="hour", archive_dir=None):
+        if keep_days < 1:
+            raise ValueError("keep_days must be at least 1")
+        if bucket not in BUCKET_SECONDS:
+            raise ValueError(f"bucket must be one of {', '.join(BUCKET_SECONDS)}")
+        self.keep_days = keep_days
+        self.bucket_seconds = BUCKET_SECONDS[bucket]
+        self.archive_dir = archive_dir
+
+    def cutoff(self, today):
+        """The oldest date that keeps its raw data"""
+        return (date_cls.fromisoformat(today) - timedelta(days=self.keep_days)).isoformat()
+
+    def cutoff_ms(self, today):
+        return day_epoch(self.cutoff(today)) * 1000
+
+    def archive(self, name, month, records):
+        """Append records as NDJSON lines to the month's gzip archive and fsync it"""
+        if not self.archive_dir or not records:
+            return
+        path = os.path.join(self.archive_dir, f"{name}-{month}.ndjson.gz")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        # Every call adds a gzip member; gzip readers read them back as one stream
+        with open(path, "ab") as f:
+            f.write(gzip.compress(payload))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def apply(self, data, today, name):
+        """Downsample the days of a dict-by-date before the cutoff in place; returns the dates changed"""
+        cutoff = self.cutoff(today)
+        changed = []
+        for date in sorted(d for d in data if d < cutoff):
+            entries = [e for e in data[date] if isinstance(e, dict)]
+            raw = [e for e in entries if e.get("end_reason") != DOWNSAMPLED]
+            if not raw:
+                continue
+            self.archive(name, date[:7], [dict({"date": date}, **e) for e in raw])
+            data[date] = downsample_sessions(entries, self.bucket_seconds)
+            changed.append(date)
+        return changed
+
+    def downsample_records(self, records, today, name):
+        """(raw records of `records` that started before the cutoff, their buckets).
+
+        The raw records are archived before this returns; the caller swaps
+        them for the buckets.
+        """
+        cutoff_ms = self.cutoff_ms(today)
+        old = [r for r in records if record_start(r) < cutoff_ms and not is_downsampled(r)]
+        by_month = {}
+        for record in old:
+            by_month.setdefault(format_date(record_start(record))[:7], []).append(record)
+        for month, month_records in sorted(by_month.items()):
+            self.archive(name, month, month_records)
+        return old, downsample_records(old, self.bucket_seconds * 1000)
+
+
+def retention_policy():
+    """The policy of Config.RETENTION_DAYS / RETENTION_BUCKET / RETENTION_ARCHIVE_DIR, or None when off"""
+    if not Config.RETENTION_DAYS:
+        return None
+    return RetentionPolicy(Config.RETENTION_DAYS, Config.RETENTION_BUCKET, Config.RETENTION_ARCHIVE_DIR)
+
+
+def downsample_chrome(policy, today=None):
+    """Downsample this machine's and every device's Chrome records; returns the number of records replaced"""
+    from models.chrome_store import get_local_chrome_store
+    from models.devices import get_device_chrome_store, list_devices
+
+    today = today or date_cls.today().isoformat()
+    replaced = get_local_chrome_store().downsample(policy, today, "chrome")
+    for device in list_devices():
+        replaced += get_device_chrome_store(device).downsample(policy, today, os.path.join(device, "chrome"))
+    return replaced
+
+
+_job = None
+_job_lock = threading.Lock()
+
+
+def start_retention_job(check_interval=3600):
+    """Run downsample_chrome once a day in a background thread (when retention is configured)"""
+    global _job
+    policy = retention_policy()
+    if policy is None:
+        return None
+    with _job_lock:
+        if _job is None or not _job.is_alive():
+            _job = threading.Thread(target=_run_job, args=(policy, check_interval), name="retention", daemon=True)
+            _job.start()
+        return _job
+
+
+def _run_job(policy, check_interval):
+    last_run = None
+    while True:
+        today = date_cls.today().isoformat()
+        if today != last_run:
+            try:
+                replaced = downsample_chrome(policy, today)
+                if replaced:
+                    print(f"Downsampled {replaced} chrome records older than {policy.cutoff(today)}")
+            except Exception as e:
+                print(f"Error downsampling chrome records: {e}")
+            last_run = today
+        time.sleep(check_interval)
@@ -0,0 +1,97 @@
+# models/rollups.py
+from datetime import date as date_cls
+
+
+class DayRollup:
+    """Totals for a set of sessions: seconds, session count and seconds per app.
+
+    App names are normalized to lower case, the same key get_top_applications
+    has always grouped by. Rollups are treated as immutable once published;
+    `with_sessions` returns a new rollup.
+    """
+
+    __slots__ = ("total_seconds", "session_count", "app_seconds")
+
+    def __init__(self, total_seconds=0, session_count=0, app_seconds=None):
+        self.total_seconds = total_seconds
+        self.session_count = session_count
+        self.app_seconds = app_seconds or {}
+
+    def with_sessions(self, sessions):
+        app_seconds = dict(self.app_seconds)
+        total = self.total_seconds
+        count = self.session_count
+        for s in sessions:
+            key = s.app.lower()
+            app_seconds[key] = app_seconds.get(key, 0) + s.duration
+            total += s.duration
+            count += 1
+        return DayRollup(total, count, app_seconds)
+
+    def to_dict(self):
+        return {
+            "total_seconds": self.total_seconds,
+            "session_count": self.session_count,
+            "app_seconds": dict(self.app_seconds),
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, DayRollup):
+            return NotImplemented
+        return (
+            self.total_seconds == other.total_seconds
+            and self.session_count == other.session_count
+            and self.app_seconds == other.app_seconds
+        )
+
+    def __repr__(self):
+        return f"DayRollup(total_seconds={self.total_seconds}, session_count={self.session_count}, apps={len(self.app_seconds)})"
+
+
+EMPTY_ROLLUP = DayRollup()
+
+
+def rollup_sessions(sessions):
+    return EMPTY_ROLLUP.with_sessions(sessions)
+
+
+def merge_rollups(rollups):
+    """Combine several rollups into one"""
+    app_seconds = {}
+    total = 0
+    count = 0
+    for r in rollups:
+        total += r.total_seconds
+        count += r.session_count
+        for app, seconds in r.app_seconds.items():
+            app_seconds[app] = app_seconds.get(app, 0) + seconds
+    return DayRollup(total, count, app_seconds)
+
+
+def rollup_entry(rollup):
+    """The totals of a DayRollup as partition indexes and rollup files store them"""
+    return {
+        "sessions": rollup.session_count,
+        "total_seconds": rollup.total_seconds,
+        "apps": list(rollup.app_seconds.items()),
+    }
+
+
+def rollup_from_entry(entry):
+    if not entry["sessions"]:
+        return EMPTY_ROLLUP
+    return DayRollup(entry["total_seconds"], entry["sessions"], dict(entry["apps"]))
+
+
+def compare_rollups(stored, fresh):
+    """Dates whose stored rollup differs from the freshly folded one, or is missing from either side"""
+    return sorted(
+        date for date in set(stored) | set(fresh)
+        if stored.get(date, EMPTY_ROLLUP) != fresh.get(date, EMPTY_ROLLUP)
+    )
+
+
+def period_keys(date):
+    """The week and month rollup nodes a 'YYYY-MM-DD' date belongs to"""
+    year, week, _ = date_cls.fromisoformat(date).isocalendar()
+    return (("week", f"{year}-W{week:02d}"), ("month", date[:7]))
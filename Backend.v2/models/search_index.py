@@ -0,0 +1,312 @@
+# models/search_index.py
+import re
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import date as date_cls
+from urllib.parse import urlsplit
+from models.chrome_records import format_date, int_ms, record_domain, record_end, record_start
+from models.metrics import timed
+from models.usage_store import day_epoch, format_clock
+
+TOKEN = re.compile(r"\w+")
+_EMPTY = array("l")
+
+
+def tokenize(text):
+    """Lower-cased word tokens of `text`, interned so postings share the key strings"""
+    return {sys.intern(token) for token in TOKEN.findall(str(text or "").lower())}
+
+
+def record_tokens(record):
+    """Tokens of a Chrome record's domain and URL path"""
+    url = str(record.get("url") or "") if isinstance(record, dict) else ""
+    try:
+        path = urlsplit(url).path
+    except ValueError:
+        path = ""
+    return tokenize(record_domain(record)) | tokenize(path)
+
+
+class PostingIndex:
+    """Inverted index from token to the ids of the documents that contain it.
+
+    Ids are handed out in increasing order, so each posting list is an
+    array("l") that stays sorted by simply appending. A query walks the
+    shortest list of its tokens and binary-searches the others, so it costs
+    time in proportion to the rarest token's matches, not the corpus.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.count = 0
+
+    def add(self, tokens):
+        doc = self.count
+        self.count += 1
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = array("l")
+            posting.append(doc)
+        return doc
+
+    def match(self, tokens):
+        """Ids of the documents containing every token, ascending"""
+        lists = sorted((self.postings.get(token, _EMPTY) for token in tokens), key=len)
+        if not lists:
+            return []
+        shortest, others = lists[0], lists[1:]
+        return [doc for doc in shortest if all(_contains(posting, doc) for posting in others)]
+
+
+def _contains(posting, doc):
+    i = bisect_left(posting, doc)
+    return i < len(posting) and posting[i] == doc
+
+
+class UsageSearchIndex:
+    """Token index over the app sessions of a usage store (titles and app names).
+
+    Each session is a document whose id indexes parallel arrays of its date,
+    position in the day, start (epoch seconds), duration and app. `refresh`
+    compares each date's version with the one it indexed: sessions appended
+    to a day are added, and a day that was rewritten has its old ids marked
+    dead and is indexed again. Once half the ids are dead everything is
+    rebuilt.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.index = PostingIndex()
+        self.day_ordinals = array("l")
+        self.positions = array("l")
+        self.starts = array("q")
+        self.durations = array("q")
+        self.app_ids = array("l")
+        self.app_names = []
+        self._app_ids = {}
+        self.dead = set()
+        self._days = {}  # date -> (day version, [doc ids])
+        self._version = None
+
+    def _app_id(self, app):
+        app_id = self._app_ids.get(app)
+        if app_id is None:
+            self.app_names.append(app)
+            app_id = self._app_ids[app] = len(self.app_names) - 1
+        return app_id
+
+    def _add_sessions(self, date, sessions, first):
+        ordinal = date_cls.fromisoformat(date).toordinal()
+        base = day_epoch(date)
+        ids = []
+        for position, s in enumerate(sessions[first:], first):
+            ids.append(self.index.add(tokenize(s.title) | tokenize(s.app)))
+            self.day_ordinals.append(ordinal)
+            self.positions.append(position)
+            self.starts.append(base + s.start)
+            self.durations.append(s.duration)
+            self.app_ids.append(self._app_id(s.app))
+        return ids
+
+    @timed("UsageSearchIndex.refresh")
+    def refresh(self):
+        with self._lock:
+            self.store.refresh()
+            version = self.store.version
+            if version == self._version:
+                return
+            if self.dead and len(self.dead) * 2 >= self.index.count:
+                self._reset()
+            dates = set(self.store.dates())
+            for date in list(self._days):
+                if date not in dates:
+                    self.dead.update(self._days.pop(date)[1])
+            for date in sorted(dates):
+                day_version = self.store.day_version(date)
+                known = self._days.get(date)
+                if known is not None and known[0] == day_version:
+                    continue
+                sessions = self.store.get_day(date)
+                ids = known[1] if known is not None else []
+                # Days only grow at the end unless they were rewritten (e.g. by retention)
+                if ids and (len(sessions) < len(ids) or not self._same(ids[-1], sessions[len(ids) - 1])):
+                    self.dead.update(ids)
+                    ids = []
+                self._days[date] = (day_version, ids + self._add_sessions(date, sessions, len(ids)))
+            self._version = version
+
+    def _same(self, doc, session):
+        return self.starts[doc] % 86400 == session.start and self.app_names[self.app_ids[doc]] == session.app
+
+    def search(self, tokens, start=None, end=None):
+        """(start, date, position, app, duration) of each live session matching every
+        token and starting in [start, end] epoch seconds"""
+        self.refresh()
+        with self._lock:
+            return [
+                (
+                    self.starts[doc],
+                    date_cls.fromordinal(self.day_ordinals[doc]).isoformat(),
+                    self.positions[doc],
+                    self.app_names[self.app_ids[doc]],
+                    self.durations[doc],
+                )
+                for doc in self.index.match(tokens)
+                if doc not in self.dead
+                and (start is None or self.starts[doc] >= start)
+                and (end is None or self.starts[doc] <= end)
+            ]
+
+
+class ChromeSearchIndex:
+    """Token index over a Chrome store's records (domains and URL paths).
+
+    Fed from the store's `new_records`, so a refresh only tokenizes records
+    that arrived since the last one; a rewritten store is indexed again.
+    Only each record's start, end and domain are kept in memory; the
+    records shown as matches are looked up in the store by their start.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.index = PostingIndex()
+        self.starts = array("q")
+        self.ends = array("q")
+        self.domain_ids = array("l")
+        self.domain_names = []
+        self._domain_ids = {}
+        self._since = None
+
+    def _domain_id(self, domain):
+        domain_id = self._domain_ids.get(domain)
+        if domain_id is None:
+            self.domain_names.append(domain)
+            domain_id = self._domain_ids[domain] = len(self.domain_names) - 1
+        return domain_id
+
+    @timed("ChromeSearchIndex.refresh")
+    def refresh(self):
+        with self._lock:
+            since, records, reset = self.store.new_records(self._since)
+            if reset:
+                self._reset()
+            for record in records:
+                self.index.add(record_tokens(record))
+                self.starts.append(int_ms(record_start(record)))
+                self.ends.append(int_ms(record_end(record)))
+                self.domain_ids.append(self._domain_id(record_domain(record).lower()))
+            self._since = since
+
+    def search(self, tokens, start_ms=None, end_ms=None):
+        """(start_ms, end_ms, domain) of each record matching every token and starting in [start_ms, end_ms]"""
+        self.refresh()
+        with self._lock:
+            return [
+                (self.starts[doc], self.ends[doc], self.domain_names[self.domain_ids[doc]])
+                for doc in self.index.match(tokens)
+                if (start_ms is None or self.starts[doc] >= start_ms)
+                and (end_ms is None or self.starts[doc] <= end_ms)
+            ]
+
+    def records_at(self, tokens, starts):
+        """The stored records matching `tokens` that start at each of `starts` (one per entry)"""
+        wanted = {}
+        for start in starts:
+            wanted[start] = wanted.get(start, 0) + 1
+        records = []
+        for start, count in wanted.items():
+            found = [r for _, r in self.store.query(start, start) if tokens <= record_tokens(r)]
+            records.extend(found[:count])
+        return records
+
+
+def _ranked(totals, counts, key):
+    return [
+        {key: name, "minutes": round(seconds / 60, 2), "sessions": counts[name]}
+        for name, seconds in sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+    ]
+
+
+def _minutes_by_date(totals):
+    return {date: round(seconds / 60, 2) for date, seconds in sorted(totals.items())}
+
+
+def _app_results(index, tokens, start, end, limit):
+    start_s = day_epoch(start.isoformat()) if start else None
+    end_s = day_epoch(end.isoformat()) + 86399 if end else None
+    found = index.search(tokens, start_s, end_s)
+    by_app, counts, by_date = {}, {}, {}
+    total = 0
+    for _, date, _, app, duration in found:
+        by_app[app] = by_app.get(app, 0) + duration
+        counts[app] = counts.get(app, 0) + 1
+        by_date[date] = by_date.get(date, 0) + duration
+        total += duration
+
+    matches = []
+    for _, date, position, _, _ in sorted(found, reverse=True)[:limit]:
+        sessions = index.store.get_day(date)
+        if position >= len(sessions):
+            continue  # the day was rewritten after the search
+        s = sessions[position]
+        matches.append({"date": date, "start": format_clock(s.start), "end": format_clock(s.end), "app": s.app,
+                        "title": s.title, "duration": s.duration, "end_reason": s.end_reason})
+    return {
+        "sessions": len(found),
+        "total_minutes": round(total / 60, 2),
+        "by_app": _ranked(by_app, counts, "app"),
+        "by_date": _minutes_by_date(by_date),
+        "matches": matches,
+    }
+
+
+def _chrome_results(index, tokens, start, end, limit):
+    start_ms = day_epoch(start.isoformat()) * 1000 if start else None
+    end_ms = (day_epoch(end.isoformat()) + 86400) * 1000 - 1 if end else None
+    found = index.search(tokens, start_ms, end_ms)
+    by_domain, counts, by_date = {}, {}, {}
+    total = 0
+    for start, end, domain in found:
+        seconds = max(0, end - start) / 1000
+        date = format_date(start)
+        by_domain[domain] = by_domain.get(domain, 0) + seconds
+        counts[domain] = counts.get(domain, 0) + 1
+        by_date[date] = by_date.get(date, 0) + seconds
+        total += seconds
+    newest = sorted((start for start, _, _ in found), reverse=True)[:limit]
+    return {
+        "records": len(found),
+        "total_minutes": round(total / 60, 2),
+        "by_domain": _ranked(by_domain, counts, "domain"),
+        "by_date": _minutes_by_date(by_date),
+        "matches": sorted(index.records_at(tokens, newest), key=record_start, reverse=True),
+    }
+
+
+@timed("search")
+def search(usage_index, chrome_index, query, start=None, end=None, limit=50):
+    """Sessions and Chrome records containing every word of `query`, with their totals.
+
+    App sessions match on window title and app name, Chrome records on
+    domain and URL path. `start`/`end` are dates; the newest `limit`
+    matches of each kind are returned in full.
+    """
+    tokens = tokenize(query)
+    return {
+        "query": query,
+        "from": start.isoformat() if start else None,
+        "to": end.isoformat() if end else None,
+        "apps": _app_results(usage_index, tokens, start, end, limit),
+        "chrome": _chrome_results(chrome_index, tokens, start, end, limit),
+    }
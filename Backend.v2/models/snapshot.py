@@ -0,0 +1,357 @@
+# models/snapshot.py
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from models.rollups import EMPTY_ROLLUP, DayRollup
+from models.usage_store import Session, day_fingerprint, iter_dates
+
+MAGIC = b"ATSNAP01"
+HEADER_LENGTH = struct.Struct("<Q")
+# start, end, duration, app id, title id, end reason id
+SESSION = struct.Struct("<iiiIIH")
+CURRENT = "CURRENT"
+
+
+def _rollup_pairs(rollup):
+    # A list of pairs keeps the apps' first-seen order (ties in top applications depend on it)
+    return [rollup.total_seconds, rollup.session_count, list(rollup.app_seconds.items())]
+
+
+def _rollup_from_pairs(value):
+    total, count, pairs = value
+    return DayRollup(total, count, dict(pairs)) if count else EMPTY_ROLLUP
+
+
+def write_snapshot(state, path, dates=None, removed=(), period_versions=None):
+    """Write UsageStore.export_state() to `path` (via a temp file and a rename).
+
+    Layout: MAGIC | uint64 header length | JSON header | packed SESSION records.
+    The header holds the string table, [date, first record, count, version]
+    per day in store order, the rollups and the version counters.
+
+    With `dates` only those days (and their rollups) are written: a delta
+    that is read on top of the files before it (see SnapshotChain), listing
+    the `removed` dates and the changed `period_versions`.
+    """
+    strings, string_ids = [], {}
+
+    def string_id(value):
+        sid = string_ids.get(value)
+        if sid is None:
+            sid = string_ids[value] = len(strings)
+            strings.append(value)
+        return sid
+
+    period_versions = state["period_versions"] if period_versions is None else period_versions
+    body = bytearray()
+    days = []
+    record = 0
+    for date in state["days"] if dates is None else dates:
+        sessions = state["days"][date]
+        for s in sessions:
+            body += SESSION.pack(s.start, s.end, s.duration, string_id(s.app), string_id(s.title), string_id(s.end_reason))
+        days.append([date, record, len(sessions), state["day_versions"].get(date, 0)])
+        record += len(sessions)
+
+    header = json.dumps({
+        "fingerprint": state["fingerprint"],
+        "exists": state["exists"],
+        "version": state["version"],
+        "strings": strings,
+        "days": days,
+        "rollups": {date: _rollup_pairs(state["rollups"][date]) for date, _, _, _ in days if date in state["rollups"]},
+        "all_time": _rollup_pairs(state["all_time"]),
+        "period_versions": [[kind, key, v] for (kind, key), v in period_versions.items()],
+        "removed": list(removed),
+    }, ensure_ascii=False).encode("utf-8")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+    """One mapped snapshot file. Immutable; days are decoded on first use."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a usage snapshot")
+        start = len(MAGIC) + HEADER_LENGTH.size
+        (length,) = HEADER_LENGTH.unpack_from(self._map, len(MAGIC))
+        header = json.loads(self._map[start:start + length].decode("utf-8"))
+        self._body = start + length
+
+        self.fingerprint = header["fingerprint"]
+        self.exists = header["exists"]
+        self.version = header["version"]
+        self.strings = [sys.intern(s) for s in header["strings"]]
+        self.day_index = {date: (first, count) for date, first, count, _ in header["days"]}
+        self.day_versions = {date: version for date, _, _, version in header["days"]}
+        self.rollups = {date: _rollup_from_pairs(v) for date, v in header["rollups"].items()}
+        self.all_time = _rollup_from_pairs(header["all_time"])
+        self.period_versions = {(kind, key): v for kind, key, v in header["period_versions"]}
+        self.removed = header.get("removed", [])
+        self.size = len(self._map)
+        self._decoded = {}
+        self._fingerprints = {}
+
+    def day_fingerprint(self, date):
+        fingerprint = self._fingerprints.get(date)
+        if fingerprint is None:
+            fingerprint = day_fingerprint(self.get_day(date))
+            if date in self.day_index:
+                self._fingerprints[date] = fingerprint
+        return fingerprint
+
+    def get_day(self, date):
+        sessions = self._decoded.get(date)
+        if sessions is None:
+            first, count = self.day_index.get(date, (0, 0))
+            offset = self._body + first * SESSION.size
+            strings = self.strings
+            sessions = tuple(
+                Session(start, end, duration, strings[app], strings[title], strings[reason])
+                for start, end, duration, app, title, reason in SESSION.iter_unpack(
+                    self._map[offset:offset + count * SESSION.size]
+                )
+            )
+            self._decoded[date] = sessions
+        return sessions
+
+
+class SnapshotChain:
+    """A full snapshot followed by the deltas published after it, read as one
+    snapshot: each day comes from the newest file that has it."""
+
+    def __init__(self, snapshots):
+        newest = snapshots[-1]
+        self.fingerprint = newest.fingerprint
+        self.exists = newest.exists
+        self.version = newest.version
+        self.all_time = newest.all_time
+        self.day_index = {}
+        self.day_versions = {}
+        self.rollups = {}
+        self.period_versions = {}
+        for snapshot in snapshots:
+            for date in snapshot.removed:
+                self.day_index.pop(date, None)
+                self.day_versions.pop(date, None)
+                self.rollups.pop(date, None)
+            self.day_index.update(dict.fromkeys(snapshot.day_index, snapshot))
+            self.day_versions.update(snapshot.day_versions)
+            self.rollups.update(snapshot.rollups)
+            self.period_versions.update(snapshot.period_versions)
+
+    def get_day(self, date):
+        snapshot = self.day_index.get(date)
+        return snapshot.get_day(date) if snapshot is not None else ()
+
+    def day_fingerprint(self, date):
+        snapshot = self.day_index.get(date)
+        return snapshot.day_fingerprint(date) if snapshot is not None else "empty"
+
+
+class MappedUsageStore:
+    """Read-only UsageStore over the snapshot a SnapshotPublisher maintains.
+
+    Used by serve.py worker processes: every worker maps the same file, so
+    the logs are parsed once by the supervisor and the pages are shared by
+    the OS. A refresh re-reads the CURRENT pointer (the full snapshot and its
+    deltas, one file name per line), maps only files it has not mapped yet
+    and swaps in the new SnapshotChain with a single assignment.
+    """
+
+    def __init__(self, snapshot_dir):
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+        self._current_identity = None
+        self._files = {}
+        self._snapshot = None
+
+    def refresh(self):
+        pointer = os.path.join(self.snapshot_dir, CURRENT)
+        try:
+            st = os.stat(pointer)
+        except OSError:
+            return self._snapshot.version if self._snapshot else 0
+        identity = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if identity != self._current_identity:
+            with self._lock:
+                if identity != self._current_identity:
+                    with open(pointer, "r", encoding="utf-8") as f:
+                        names = f.read().split()
+                    files = {
+                        name: self._files.get(name) or Snapshot(os.path.join(self.snapshot_dir, name))
+                        for name in names
+                    }
+                    self._snapshot = SnapshotChain(list(files.values()))
+                    self._files = files
+                    self._current_identity = identity
+        return self._snapshot.version
+
+    def _current(self):
+        self.refresh()
+        if self._snapshot is None:
+            raise RuntimeError(f"No usage snapshot published in {self.snapshot_dir}")
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self.refresh()
+
+    def exists(self):
+        self.refresh()
+        return self._snapshot is not None and self._snapshot.exists
+
+    def fingerprint(self):
+        return self._current().fingerprint
+
+    def day_fingerprint(self, date):
+        return self._current().day_fingerprint(date)
+
+    def days(self):
+        snapshot = self._current()
+        return {date: snapshot.get_day(date) for date in snapshot.day_index}
+
+    def get_day(self, date):
+        return self._current().get_day(date)
+
+    def dates(self):
+        return self._current().day_index.keys()
+
+    def rollup(self, date):
+        return self._current().rollups.get(date, EMPTY_ROLLUP)
+
+    def days_rollups(self, first, last):
+        rollups = self._current().rollups
+        return [rollups[d] for d in iter_dates(first, last) if d in rollups]
+
+    def all_time_rollup(self):
+        return self._current().all_time
+
+    def day_version(self, date):
+        return self._current().day_versions.get(date, 0)
+
+    def period_version(self, kind, key):
+        return self._current().period_versions.get((kind, key), 0)
+
+
+class SnapshotPublisher:
+    """Keeps a snapshot of `store` in `snapshot_dir` up to date (runs in the serve.py supervisor).
+
+    Each change is written to a new "usage-<pid>-<n>.snap" file and CURRENT
+    is then atomically replaced with the list of files to read, so a worker
+    never maps a file that is still being written. The first publish writes
+    every day; later ones write only the days whose version changed, as a
+    delta on top of the files before it. Once there are `max_deltas` deltas,
+    or they are bigger than the full file, the next publish writes every day
+    again. Files no longer listed in CURRENT or the previous CURRENT are
+    removed; on Windows a file that a worker still maps cannot be removed
+    yet and is retried on the next publish.
+    """
+
+    def __init__(self, store, snapshot_dir, interval=1.0, max_deltas=64):
+        self.store = store
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval
+        self.max_deltas = max_deltas
+        self._generation = 0
+        self._fingerprint = None
+        # Names in the CURRENT list (full file first) and their sizes
+        self._chain = []
+        self._sizes = []
+        # Day and period versions as of the last publish
+        self._day_versions = {}
+        self._period_versions = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish(self):
+        """Write a new snapshot if the store changed; returns True if it did"""
+        if self.store.fingerprint() == self._fingerprint:
+            return False
+        state = self.store.export_state()
+        if state["fingerprint"] == self._fingerprint:
+            return False
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        self._generation += 1
+        name = f"usage-{os.getpid()}-{self._generation:06d}.snap"
+        path = os.path.join(self.snapshot_dir, name)
+        day_versions = {date: state["day_versions"].get(date, 0) for date in state["days"]}
+        deltas = self._sizes[1:]
+        if not self._chain or len(deltas) >= self.max_deltas or sum(deltas) > self._sizes[0]:
+            write_snapshot(state, path)
+            chain, sizes = [name], []
+        else:
+            periods = state["period_versions"]
+            changed_periods = {key: 0 for key in self._period_versions if key not in periods}
+            changed_periods.update((key, v) for key, v in periods.items() if self._period_versions.get(key) != v)
+            write_snapshot(
+                state,
+                path,
+                dates=[d for d, v in day_versions.items() if self._day_versions.get(d) != v],
+                removed=[d for d in self._day_versions if d not in day_versions],
+                period_versions=changed_periods,
+            )
+            chain, sizes = self._chain + [name], self._sizes
+        pointer = os.path.join(self.snapshot_dir, CURRENT)
+        with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+            f.write("\n".join(chain))
+        os.replace(f"{pointer}.tmp", pointer)
+        self._fingerprint = state["fingerprint"]
+        self._day_versions = day_versions
+        self._period_versions = dict(state["period_versions"])
+        self._remove_old(set(chain) | set(self._chain))
+        self._chain = chain
+        self._sizes = sizes + [os.path.getsize(path)]
+        return True
+
+    def _remove_old(self, keep):
+        # The previous file is kept for a worker that read CURRENT just before it changed
+        for name in os.listdir(self.snapshot_dir):
+            if name.endswith(".snap") and name not in keep:
+                try:
+                    os.remove(os.path.join(self.snapshot_dir, name))
+                except OSError:
+                    pass
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="snapshot-publisher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"Error publishing usage snapshot: {e}")
+
+
+_mapped_stores = {}
+_mapped_lock = threading.Lock()
+
+
+def get_mapped_store(snapshot_dir):
+    with _mapped_lock:
+        store = _mapped_stores.get(snapshot_dir)
+        if store is None:
+            store = _mapped_stores[snapshot_dir] = MappedUsageStore(snapshot_dir)
+        return store
@@ -0,0 +1,493 @@
+# models/sqlite_store.py
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import date as date_cls, timedelta
+from config import Config
+from models.chrome_records import (
+    DedupeIndex,
+    DomainIndex,
+    format_timestamp,
+    needs_normalizing,
+    normalize_record,
+    record_domain,
+    record_end,
+    record_start,
+    split_new,
+)
+from models.metrics import timed
+from models.rollups import EMPTY_ROLLUP, DayRollup
+from models.usage_store import Session, parse_clock
+
+# The tracker's SQLiteDataManager writes app_sessions; the backend runs its
+# own copy of the tracker's schema file and adds the Chrome tables below
+APP_SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app_sessions.sql")
+
+CHROME_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chrome_sessions (
+    id INTEGER PRIMARY KEY,
+    domain TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chrome_sessions_domain_start ON chrome_sessions (domain, start_time);
+CREATE INDEX IF NOT EXISTS idx_chrome_sessions_start ON chrome_sessions (start_time);
+
+INSERT OR IGNORE INTO meta (key, value) VALUES ('chrome_deletes', 0);
+CREATE TRIGGER IF NOT EXISTS chrome_sessions_delete AFTER DELETE ON chrome_sessions
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'chrome_deletes'; END;
+"""
+
+INSERT_APP_SESSION = (
+    "INSERT INTO app_sessions (date, start_sec, end_sec, duration, app, app_key, title, end_reason) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+class SQLiteDatabase:
+    """One SQLite file in WAL mode with a connection per thread"""
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.db_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    with open(APP_SCHEMA_FILE, "r", encoding="utf-8") as f:
+                        conn.executescript(f.read())
+                    conn.executescript(CHROME_SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+
+class SQLiteUsageStore:
+    """App sessions in SQLite, answering the same queries as UsageStore.
+
+    Totals and per-app sums run as SQL aggregates over the (date, app_key)
+    index, so nothing is loaded into memory beyond the requested rows.
+    Versions come from a trigger-maintained counter (global) and from
+    COUNT/MAX(id) over the date index (per day and per period).
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def version(self):
+        return self.refresh()
+
+    def exists(self):
+        return os.path.exists(self.db.db_file)
+
+    def refresh(self):
+        row = self.db.connection().execute("SELECT value FROM meta WHERE key = 'app_version'").fetchone()
+        return row[0] if row else 0
+
+    def dates(self):
+        rows = self.db.connection().execute("SELECT DISTINCT date FROM app_sessions")
+        return {r[0] for r in rows}
+
+    def get_day(self, date):
+        rows = self.db.connection().execute(
+            "SELECT start_sec, end_sec, duration, app, title, end_reason FROM app_sessions "
+            "WHERE date = ? ORDER BY id",
+            (date,),
+        )
+        return tuple(
+            Session(start, end, duration, sys.intern(app), sys.intern(title), sys.intern(reason))
+            for start, end, duration, app, title, reason in rows
+        )
+
+    def days(self):
+        days = {}
+        rows = self.db.connection().execute(
+            "SELECT date, start_sec, end_sec, duration, app, title, end_reason FROM app_sessions ORDER BY id"
+        )
+        for date, start, end, duration, app, title, reason in rows:
+            days.setdefault(date, []).append(
+                Session(start, end, duration, sys.intern(app), sys.intern(title), sys.intern(reason))
+            )
+        return {date: tuple(sessions) for date, sessions in days.items()}
+
+    def _rollup(self, where, params):
+        app_seconds = {}
+        total = 0
+        count = 0
+        rows = self.db.connection().execute(
+            # First-seen order, so ties in top applications sort like the JSON store
+            f"SELECT app_key, SUM(duration), COUNT(*) FROM app_sessions {where} "
+            "GROUP BY app_key ORDER BY MIN(id)",
+            params,
+        )
+        for app_key, seconds, n in rows:
+            app_seconds[app_key] = seconds
+            total += seconds
+            count += n
+        return DayRollup(total, count, app_seconds) if count else EMPTY_ROLLUP
+
+    def rollup(self, date):
+        return self._rollup("WHERE date = ?", (date,))
+
+    def days_rollups(self, first, last):
+        return [self._rollup("WHERE date BETWEEN ? AND ?", (first, last))]
+
+    def all_time_rollup(self):
+        return self._rollup("", ())
+
+    def _range_version(self, first, last):
+        count, max_id = self.db.connection().execute(
+            "SELECT COUNT(*), MAX(id) FROM app_sessions WHERE date BETWEEN ? AND ?", (first, last)
+        ).fetchone()
+        return f"{count}:{max_id}" if count else 0
+
+    def day_version(self, date):
+        return self._range_version(date, date)
+
+    def fingerprint(self):
+        return str(self.refresh())
+
+    def day_fingerprint(self, date):
+        return str(self._range_version(date, date))
+
+    def period_version(self, kind, key):
+        if kind == "week":
+            year, week = key.split("-W")
+            first = date_cls.fromisocalendar(int(year), int(week), 1)
+            last = first + timedelta(days=6)
+        else:
+            first = date_cls.fromisoformat(f"{key}-01")
+            last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return self._range_version(first.isoformat(), last.isoformat())
+
+    def insert_sessions(self, rows):
+        """Insert (date, entry dict) pairs in one transaction"""
+        conn = self.db.connection()
+        with conn:
+            conn.executemany(
+                INSERT_APP_SESSION,
+                (_app_row(date, entry) for date, entry in rows),
+            )
+
+    def count(self):
+        return self.db.connection().execute("SELECT COUNT(*) FROM app_sessions").fetchone()[0]
+
+
+def _app_row(date, entry):
+    try:
+        duration = int(entry.get("duration", 0))
+    except (ValueError, TypeError):
+        duration = 0
+    app = str(entry.get("app", ""))
+    return (
+        date,
+        parse_clock(entry.get("start")),
+        parse_clock(entry.get("end")),
+        duration,
+        app,
+        app.lower(),
+        str(entry.get("title", "")),
+        str(entry.get("end_reason", "unknown")),
+    )
+
+
+def _chrome_row(record):
+    record = normalize_record(record)
+    start = record_start(record)
+    end = record_end(record)
+    return (
+        record_domain(record).lower(),
+        format_timestamp(start) if start else "",
+        format_timestamp(end) if end else "",
+        json.dumps(record, ensure_ascii=False),
+    )
+
+
+class SQLiteChromeStore:
+    """Chrome activity records in SQLite, with the same interface as ChromeSegmentStore.
+
+    Records are normalized at ingest and stored as JSON next to indexed
+    domain/start/end columns. The per-day DomainIndex and the DedupeIndex
+    are fed incrementally from rows with an id above the last one they have
+    seen, and rebuilt when the trigger-maintained delete counter moves.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._ingest_lock = threading.Lock()
+        self._domains = DomainIndex()
+        self._dedupe = DedupeIndex(Config.CHROME_DEDUPE_RECENT_DAYS, Config.CHROME_DEDUPE_BLOOM_CAPACITY)
+        self._last_id = 0
+        self._deletes = 0
+        self._generation = 0
+        self._migration = None
+
+    @timed("SQLiteChromeStore.append")
+    def append(self, records):
+        if not records:
+            return 0
+        conn = self.db.connection()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO chrome_sessions (domain, start_time, end_time, record) VALUES (?, ?, ?, ?)",
+                    (_chrome_row(r) for r in records),
+                )
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Failed to write chrome records: {e}")
+        return len(records)
+
+    def append_new(self, records):
+        """Same contract as ChromeSegmentStore.append_new; one transaction per batch"""
+        with self._ingest_lock:
+            self._refresh_domains()
+            records, flags = split_new(
+                records, self._dedupe, lambda ms: [r for _, r in self.query(ms, ms)]
+            )
+            self.append([record for record, new in zip(records, flags) if new])
+        return flags
+
+    def migrate_in_background(self):
+        """Start normalizing rows stored before ingest-time normalization existed"""
+        if self._migration is None or not self._migration.is_alive():
+            self._migration = threading.Thread(target=self._migrate, name="chrome-normalize", daemon=True)
+            self._migration.start()
+        return self._migration
+
+    def _migrate(self, batch_size=500):
+        conn = self.db.connection()
+        last_id = 0
+        try:
+            while True:
+                rows = conn.execute(
+                    "SELECT id, record FROM chrome_sessions WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+                if not rows:
+                    break
+                updates = []
+                for row_id, raw in rows:
+                    record = json.loads(raw)
+                    if needs_normalizing(record):
+                        updates.append(_chrome_row(record) + (row_id,))
+                if updates:
+                    with conn:
+                        conn.executemany(
+                            "UPDATE chrome_sessions SET domain = ?, start_time = ?, end_time = ?, record = ? WHERE id = ?",
+                            updates,
+                        )
+                last_id = rows[-1][0]
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error migrating chrome records: {e}")
+
+    def _delete_count(self):
+        row = self.db.connection().execute("SELECT value FROM meta WHERE key = 'chrome_deletes'").fetchone()
+        return row[0] if row else 0
+
+    @timed("SQLiteChromeStore.refresh_domains")
+    def _refresh_domains(self):
+        with self._lock:
+            deletes = self._delete_count()
+            if deletes != self._deletes:
+                # Rows were removed (by retention), so start over
+                self._domains = DomainIndex()
+                self._dedupe = DedupeIndex(Config.CHROME_DEDUPE_RECENT_DAYS, Config.CHROME_DEDUPE_BLOOM_CAPACITY)
+                self._last_id = 0
+                self._deletes = deletes
+                self._generation += 1
+            rows = self.db.connection().execute(
+                "SELECT id, record FROM chrome_sessions WHERE id > ? ORDER BY id", (self._last_id,)
+            )
+            for row_id, record in rows:
+                record = json.loads(record)
+                self._domains.add(record)
+                self._dedupe.add(record)
+                self._last_id = row_id
+
+    def fingerprint(self):
+        count, max_id = self.db.connection().execute("SELECT COUNT(*), MAX(id) FROM chrome_sessions").fetchone()
+        return f"{count}:{max_id}"
+
+    def domain_ms(self, date):
+        self._refresh_domains()
+        with self._lock:
+            return self._domains.domain_ms(date)
+
+    def domain_hours(self, date):
+        self._refresh_domains()
+        with self._lock:
+            return self._domains.domain_hours(date)
+
+    def day_version(self, date):
+        self._refresh_domains()
+        with self._lock:
+            return (self._generation, self._domains.day_version(date))
+
+    def day_hours(self, dates, domain=None):
+        self._refresh_domains()
+        with self._lock:
+            return [self._domains.day_hours(date, domain) for date in dates]
+
+    def new_records(self, since=None):
+        """Same contract as ChromeSegmentStore.new_records; the position is
+        (delete counter, last row id), so any delete resets it"""
+        deletes = self._delete_count()
+        previous_deletes, last_id = since if since is not None else (None, 0)
+        reset = previous_deletes != deletes
+        if reset:
+            last_id = 0
+        conn = self.db.connection()
+        newest = conn.execute("SELECT MAX(id) FROM chrome_sessions").fetchone()[0] or last_id
+        rows = conn.execute(
+            "SELECT record FROM chrome_sessions WHERE id > ? AND id <= ? ORDER BY id", (last_id, newest)
+        )
+        return (deletes, newest), (json.loads(record) for record, in rows), reset
+
+    @timed("SQLiteChromeStore.downsample")
+    def downsample(self, policy, today, archive_name):
+        """Same contract as ChromeSegmentStore.downsample; one transaction per month of records"""
+        cutoff = policy.cutoff(today)
+        conn = self.db.connection()
+        first = conn.execute("SELECT MIN(start_time) FROM chrome_sessions WHERE start_time != ''").fetchone()[0]
+        replaced = 0
+        # Rows without a start time sort first and go with the first month
+        low = ""
+        month = date_cls.fromisoformat(first[:7] + "-01") if first else None
+        while month is not None and low < cutoff:
+            month = (month + timedelta(days=32)).replace(day=1)
+            high = min(month.isoformat(), cutoff)
+            rows = conn.execute(
+                "SELECT id, record FROM chrome_sessions WHERE start_time >= ? AND start_time < ? ORDER BY start_time, id",
+                (low, high),
+            ).fetchall()
+            records = [json.loads(record) for _, record in rows]
+            old, buckets = policy.downsample_records(records, today, archive_name)
+            if old:
+                old_ids = {id(r) for r in old}
+                with conn:
+                    conn.executemany(
+                        "DELETE FROM chrome_sessions WHERE id = ?",
+                        [(row_id,) for (row_id, _), r in zip(rows, records) if id(r) in old_ids],
+                    )
+                    conn.executemany(
+                        "INSERT INTO chrome_sessions (domain, start_time, end_time, record) VALUES (?, ?, ?, ?)",
+                        (_chrome_row(r) for r in buckets),
+                    )
+                replaced += len(old)
+            low = high
+        return replaced
+
+    def iter_records(self):
+        for (record,) in self.db.connection().execute("SELECT record FROM chrome_sessions ORDER BY id"):
+            yield json.loads(record)
+
+    @timed("SQLiteChromeStore.load_all")
+    def load_all(self):
+        return list(self.iter_records())
+
+    def query(self, start_ms=None, end_ms=None, domain=None, limit=None, cursor=None):
+        """Same contract as ChromeSegmentStore.query; the cursor is the row id"""
+        where, params = [], []
+        if start_ms is not None:
+            where.append("start_time >= ?")
+            params.append(format_timestamp(start_ms))
+        if end_ms is not None:
+            where.append("start_time <= ?")
+            params.append(format_timestamp(end_ms))
+        if domain:
+            where.append("domain = ?")
+            params.append(domain)
+        if cursor is not None:
+            try:
+                row_id = int(cursor)
+            except ValueError:
+                raise ValueError("Invalid cursor")
+            where.append("(start_time, id) > ((SELECT start_time FROM chrome_sessions WHERE id = ?), ?)")
+            params.extend([row_id, row_id])
+        sql = "SELECT id, record FROM chrome_sessions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY start_time, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        rows = self.db.connection().execute(sql, params)
+        return ((str(row_id), json.loads(record)) for row_id, record in rows)
+
+    def count(self):
+        return self.db.connection().execute("SELECT COUNT(*) FROM chrome_sessions").fetchone()[0]
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(db_file):
+    with _databases_lock:
+        db = _databases.get(db_file)
+        if db is None:
+            db = _databases[db_file] = SQLiteDatabase(db_file)
+        return db
+
+
+_chrome_stores = {}
+
+
+def get_sqlite_chrome_store(db_file):
+    """Shared SQLiteChromeStore for `db_file` (it keeps an in-memory domain index)"""
+    db = get_database(db_file)
+    with _databases_lock:
+        store = _chrome_stores.get(db_file)
+        if store is None:
+            store = _chrome_stores[db_file] = SQLiteChromeStore(db)
+        return store
+
+
+def migrate_from_json(db_file, usage_store, chrome_store):
+    """One-shot copy of the JSON app usage data and Chrome records into SQLite.
+
+    `usage_store` is a UsageStore (dict-by-date or legacy list file plus
+    journal) and `chrome_store` a ChromeSegmentStore. Both are copied in one
+    transaction, so a failed run leaves the database empty and can simply be
+    run again. Returns the number of (app sessions, chrome records) copied;
+    refuses to run into a non-empty database so it can't duplicate data.
+    """
+    db = get_database(db_file)
+    app_store = SQLiteUsageStore(db)
+    sqlite_chrome = SQLiteChromeStore(db)
+    if app_store.count() or sqlite_chrome.count():
+        raise RuntimeError(f"{db_file} already contains data; migrate into an empty database")
+
+    conn = db.connection()
+    try:
+        with conn:
+            conn.executemany(
+                INSERT_APP_SESSION,
+                (
+                    (date, s.start, s.end, s.duration, s.app, s.app.lower(), s.title, s.end_reason)
+                    for date in sorted(usage_store.dates())
+                    for s in usage_store.get_day(date)
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO chrome_sessions (domain, start_time, end_time, record) VALUES (?, ?, ?, ?)",
+                (_chrome_row(r) for r in chrome_store.iter_records()),
+            )
+    except sqlite3.Error as e:
+        raise RuntimeError(f"Migration into {db_file} failed and was rolled back: {e}")
+    return app_store.count(), sqlite_chrome.count()
@@ -1,118 +1,205 @@
 # models/sunBurst_Chart.py
-import os
-import json
-from datetime import datetime
+import threading
+from array import array
+from collections import OrderedDict
 from config import Config
+from models import metrics
+from models.metrics import timed
+from models.usage_store import day_epoch, format_epoch, get_usage_store, iter_dates, next_date, previous_date
+
+
+class DayColumns:
+    """Sessions of one or more days as parallel columns, sorted by start.
+
+    starts/ends are epoch seconds and app_ids index into the owning
+    LogAnalyzer's interned app table, so a session costs three machine words
+    instead of a dict.
+    """
+
+    __slots__ = ("starts", "ends", "app_ids")
+
+    def __init__(self, starts=None, ends=None, app_ids=None):
+        self.starts = starts if starts is not None else array("q")
+        self.ends = ends if ends is not None else array("q")
+        self.app_ids = app_ids if app_ids is not None else array("l")
+
+    def __len__(self):
+        return len(self.starts)
+
+    def is_sorted(self):
+        starts = self.starts
+        return all(starts[i] <= starts[i + 1] for i in range(len(starts) - 1))
+
+    def sorted(self):
+        """Columns reordered by start time (stable, like list.sort)"""
+        if self.is_sorted():
+            return self
+        order = sorted(range(len(self.starts)), key=self.starts.__getitem__)
+        return DayColumns(
+            array("q", [self.starts[i] for i in order]),
+            array("q", [self.ends[i] for i in order]),
+            array("l", [self.app_ids[i] for i in order]),
+        )
 
-class LogAnalyzer:
-    def __init__(self, json_file=None):
-        self.json_file = json_file or Config.JSON_FILE
-        self.parsed_data = {}
-        self.last_modified = None
+    @classmethod
+    def concat(cls, parts):
+        out = cls()
+        for part in parts:
+            out.starts.extend(part.starts)
+            out.ends.extend(part.ends)
+            out.app_ids.extend(part.app_ids)
+        return out
 
-    def is_file_updated(self):
-        if not os.path.exists(self.json_file):
-            return False
-        current_modified = os.path.getmtime(self.json_file)
-        if self.last_modified != current_modified:
-            self.last_modified = current_modified
-            return True
-        return False
 
+class LogAnalyzer:
+    def __init__(self, json_file=None):
+        self.store = get_usage_store(json_file)
+        self.app_names = []
+        self._app_ids = {}
+        self._columns = {}
+        self._merged = {}
+        # (date_from, date_to) -> (version, grouped), least recently used first
+        self._merged_ranges = OrderedDict()
+        self._ranges_lock = threading.Lock()
+        # Request threads share one analyzer. Cache entries are immutable
+        # (version, value) pairs replaced by a single assignment; only the
+        # app id table needs a lock so two threads never give one app two ids.
+        self._intern_lock = threading.Lock()
+
+    @timed("LogAnalyzer.parse_log_file")
     def parse_log_file(self):
-        """Parse the JSON log file grouped by date"""
-        if not os.path.exists(self.json_file):
+        """Sync with the shared usage store (dates are converted to columns lazily)"""
+        if not self.store.exists():
             return False
-
-        if not self.is_file_updated() and self.parsed_data:
-            return True
-
-        try:
-            with open(self.json_file, "r", encoding="utf-8") as f:
-                raw_data = json.load(f)
-
-            self.parsed_data = {}
-            for date, sessions in raw_data.items():
-                self.parsed_data[date] = []
-                for entry in sessions:
-                    converted_entry = {
-                        "original_date": date,
-                        "start_time": entry["start"],
-                        "end_time": entry["end"],
-                        "app_name": entry["app"],
-                        "window_title": entry.get("title", ""),
-                        "duration": entry.get("duration", 0),
-                        "session_end_reason": entry.get("end_reason", "unknown"),
-                    }
-                    self.parsed_data[date].append(converted_entry)
-
-        except (json.JSONDecodeError, KeyError) as e:
-            print(f"Error parsing JSON file: {e}")
-            self.parsed_data = {}
-            return False
-
+        self.store.refresh()
         return True
 
+    def _intern_app(self, app_name):
+        app_id = self._app_ids.get(app_name)
+        if app_id is None:
+            with self._intern_lock:
+                app_id = self._app_ids.get(app_name)
+                if app_id is None:
+                    self.app_names.append(app_name)
+                    app_id = self._app_ids[app_name] = len(self.app_names) - 1
+        return app_id
+
+    def day_version(self, date):
+        """Version of one date's columns; they also hold the tail of the previous day's last session"""
+        return (self.store.day_version(date), self.store.day_version(previous_date(date)))
+
+    def day_columns(self, date):
+        """Columns for one date, rebuilt only when that date or the one before it changed.
+
+        A session that runs past midnight (its end clock is before its start)
+        is cut at midnight; the part after it is added to the next date.
+        """
+        version = self.day_version(date)
+        cached = self._columns.get(date)
+        hit = cached is not None and cached[0] == version
+        metrics.cache_lookup("day_columns", hit)
+        if hit:
+            return cached[1]
+
+        sessions = self.store.get_day(date)
+        carried = [s for s in self.store.get_day(previous_date(date)) if s.end < s.start]
+        base = day_epoch(date)
+        midnight = base + 86400
+        columns = DayColumns(
+            array("q", [base + s.start for s in sessions] + [base] * len(carried)),
+            array("q", [base + s.end if s.end >= s.start else midnight for s in sessions]
+                  + [base + s.end for s in carried]),
+            array("l", [self._intern_app(s.app) for s in list(sessions) + carried]),
+        ).sorted()
+        self._columns[date] = (version, columns)
+        return columns
+
+    def _column_dates(self, dates):
+        """Dates with sessions plus the day after each, which may hold a carried-over tail"""
+        return set(dates).union(next_date(d) for d in dates)
+
+    @timed("LogAnalyzer.get_merged_sessions")
     def get_merged_sessions(self, days=None, date_filter=None):
         """Return merged sessions grouped by app for a given date"""
         if not self.parse_log_file():
             return {}
 
         if date_filter:
-            sessions = self.parsed_data.get(date_filter, [])
+            version = self.day_version(date_filter)
+        else:
+            version = self.store.version
+        cached = self._merged.get(date_filter)
+        hit = cached is not None and cached[0] == version
+        metrics.cache_lookup("merged_sessions", hit)
+        if hit:
+            return cached[1]
+
+        if date_filter:
+            columns = self.day_columns(date_filter)
         else:
             # Flatten all dates if no filter
-            sessions = [s for d in self.parsed_data.values() for s in d]
+            columns = DayColumns.concat(
+                self.day_columns(d) for d in sorted(self._column_dates(self.store.dates()))
+            ).sorted()
 
-        if not sessions:
+        grouped = self._merge_columns(columns)
+        self._merged[date_filter] = (version, grouped)
+        return grouped
+
+    @timed("LogAnalyzer.get_merged_range")
+    def get_merged_range(self, date_from, date_to):
+        """Merged sessions grouped by app across every date in [date_from, date_to]"""
+        if not self.parse_log_file():
             return {}
 
-        # Parse datetime for sorting and merging
-        for entry in sessions:
-            entry["start_dt"] = datetime.strptime(
-                f'{entry["original_date"]} {entry["start_time"]}', "%Y-%m-%d %H:%M:%S"
-            )
-            entry["end_dt"] = datetime.strptime(
-                f'{entry["original_date"]} {entry["end_time"]}', "%Y-%m-%d %H:%M:%S"
-            )
-
-        sessions.sort(key=lambda x: x["start_dt"])
-
-        # Merge logic
-        merged = []
-        current_app = sessions[0]["app_name"]
-        start_time = sessions[0]["start_dt"]
-        end_time = sessions[0]["end_dt"]
-
-        for i in range(1, len(sessions)):
-            entry = sessions[i]
-            if entry["app_name"] == current_app and entry["start_dt"] <= end_time:
-                end_time = max(end_time, entry["end_dt"])
-            else:
-                merged.append(
-                    {
-                        "app_name": current_app.lower(),
-                        "start": start_time.strftime("%Y-%m-%d %H:%M:%S"),
-                        "end": end_time.strftime("%Y-%m-%d %H:%M:%S"),
-                    }
-                )
-                current_app = entry["app_name"]
-                start_time = entry["start_dt"]
-                end_time = entry["end_dt"]
-
-        merged.append(
-            {
-                "app_name": current_app.lower(),
-                "start": start_time.strftime("%Y-%m-%d %H:%M:%S"),
-                "end": end_time.strftime("%Y-%m-%d %H:%M:%S"),
-            }
-        )
+        key = (date_from, date_to)
+        version = self.store.version
+        with self._ranges_lock:
+            cached = self._merged_ranges.get(key)
+            if cached is not None:
+                self._merged_ranges.move_to_end(key)
+        hit = cached is not None and cached[0] == version
+        metrics.cache_lookup("merged_sessions", hit)
+        if hit:
+            return cached[1]
+
+        dates = self._column_dates(self.store.dates())
+        columns = DayColumns.concat(
+            self.day_columns(d) for d in iter_dates(date_from, date_to) if d in dates
+        ).sorted()
+        grouped = self._merge_columns(columns)
+        with self._ranges_lock:
+            self._merged_ranges[key] = (version, grouped)
+            self._merged_ranges.move_to_end(key)
+            while len(self._merged_ranges) > Config.RANGE_CACHE_SIZE:
+                self._merged_ranges.popitem(last=False)
+        return grouped
 
-        # Group by app
+    def _merge_columns(self, columns):
+        """Merge adjacent overlapping sessions of the same app in one pass over the columns"""
+        if not len(columns):
+            return {}
+
+        starts, ends, app_ids = columns.starts, columns.ends, columns.app_ids
         grouped = {}
-        for session in merged:
-            app = session["app_name"]
-            line = f'{session["start"]} - {session["end"]}'
-            grouped.setdefault(app, []).append(line)
+
+        current_app = app_ids[0]
+        start_time = starts[0]
+        end_time = ends[0]
+        for i in range(1, len(starts)):
+            app_id = app_ids[i]
+            if app_id == current_app and starts[i] <= end_time:
+                if ends[i] > end_time:
+                    end_time = ends[i]
+            else:
+                self._add_block(grouped, current_app, start_time, end_time)
+                current_app = app_id
+                start_time = starts[i]
+                end_time = ends[i]
+        self._add_block(grouped, current_app, start_time, end_time)
 
         return grouped
+
+    def _add_block(self, grouped, app_id, start, end):
+        app = self.app_names[app_id].lower()
+        grouped.setdefault(app, []).append(f"{format_epoch(start)} - {format_epoch(end)}")
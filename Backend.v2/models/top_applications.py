@@ -1,39 +1,18 @@
 # models/analyzer.py
-import json
-from collections import defaultdict
-from pathlib import Path
-from config import Config
-
-LOG_FILE = Path(Config.JSON_FILE)  
-
-def load_logs():
-    if not LOG_FILE.exists():
-        return {}
-    with open(LOG_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+from models.usage_store import get_usage_store
 
 
 def get_top_applications(date: str = None):
-    logs = load_logs()
-    app_durations = defaultdict(int)
-
+    store = get_usage_store()
     if date:  # filter by specific date
-        sessions = logs.get(date, [])
-        logs_to_process = {date: sessions}
+        rollup = store.rollup(date)
     else:  # use all dates
-        logs_to_process = logs
+        rollup = store.all_time_rollup()
+    return format_top_applications(rollup.app_seconds)
 
-    # sum durations
-    for sessions in logs_to_process.values():
-        for entry in sessions:
-            app = str(entry.get("app", "")).lower()
-            duration = entry.get("duration", 0)
-            try:
-                duration = int(duration)
-            except (ValueError, TypeError):
-                duration = 0
-            app_durations[app] += duration
 
+def format_top_applications(app_durations):
+    """{normalized app: seconds} -> list sorted by time with minutes + percentage"""
     total = sum(app_durations.values())
     if total == 0:
         return []
@@ -50,5 +29,3 @@ def get_top_applications(date: str = None):
             "percentage": percent
         })
     return result
-
-
@@ -0,0 +1,50 @@
+# models/top_domains.py
+from models.chrome_store import get_chrome_store
+
+
+def get_top_domains(date: str):
+    """Browser time per domain for one date, shaped like get_top_applications"""
+    domain_ms = get_chrome_store().domain_ms(date)
+    total = sum(domain_ms.values())
+    if total == 0:
+        return []
+
+    result = []
+    for domain, ms in sorted(domain_ms.items(), key=lambda x: x[1], reverse=True):
+        result.append({
+            "name": domain or "Unknown",
+            "time": round(ms / 60000, 1),
+            "percentage": round((ms / total) * 100)
+        })
+    return result
+
+
+def get_domains_by_hour(date: str):
+    """{domain: [minutes in hour 0..23]} for one date, busiest domain first"""
+    domain_hours = get_chrome_store().domain_hours(date)
+    ordered = sorted(domain_hours.items(), key=lambda x: sum(x[1]), reverse=True)
+    return {
+        domain or "Unknown": [round(ms / 60000, 1) for ms in hours]
+        for domain, hours in ordered
+    }
+
+
+def get_browser_domains(attribution, date: str):
+    """Foreground browser app time per domain for one date (see models/chrome_attribution.py).
+
+    Shaped like get_top_domains; browser time no domain session covers is
+    reported as "(no domain)".
+    """
+    domain_ms = attribution.domain_ms(date)
+    total = sum(domain_ms.values())
+    if total == 0:
+        return []
+
+    result = []
+    for domain, ms in sorted(domain_ms.items(), key=lambda x: x[1], reverse=True):
+        result.append({
+            "name": domain or "(no domain)",
+            "time": round(ms / 60000, 1),
+            "percentage": round((ms / total) * 100)
+        })
+    return result
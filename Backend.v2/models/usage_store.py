@@ -0,0 +1,493 @@
+# models/usage_store.py
+import hashlib
+import json
+import os
+import sys
+import threading
+from datetime import date as date_cls
+from typing import NamedTuple
+from config import Config
+from models import metrics
+from models.compact_format import is_compact, iter_session_rows
+from models.metrics import timed
+from models.rollups import EMPTY_ROLLUP, merge_rollups, period_keys, rollup_entry, rollup_from_entry, rollup_sessions
+
+
+class Session(NamedTuple):
+    """One tracker session. start/end are seconds since midnight of its date."""
+    start: int
+    end: int
+    duration: int
+    app: str
+    title: str
+    end_reason: str
+
+
+def parse_clock(value):
+    """'HH:MM:SS' -> seconds since midnight (0 if the value is malformed)"""
+    try:
+        h, m, s = str(value).split(":")
+        return int(h) * 3600 + int(m) * 60 + int(float(s))
+    except (ValueError, TypeError):
+        return 0
+
+
+def format_clock(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+_EPOCH_ORDINAL = date_cls(1970, 1, 1).toordinal()
+
+
+def day_epoch(date):
+    """'YYYY-MM-DD' -> epoch seconds of its midnight (wall clock, no time zone)"""
+    return (date_cls.fromisoformat(date).toordinal() - _EPOCH_ORDINAL) * 86400
+
+
+def format_epoch(seconds):
+    """Epoch seconds -> 'YYYY-MM-DD HH:MM:SS'"""
+    days, rest = divmod(int(seconds), 86400)
+    return f"{date_cls.fromordinal(_EPOCH_ORDINAL + days).isoformat()} {format_clock(rest)}"
+
+
+def iter_dates(first, last):
+    """Yield every 'YYYY-MM-DD' from first to last inclusive"""
+    ordinal = date_cls.fromisoformat(first).toordinal()
+    end = date_cls.fromisoformat(last).toordinal()
+    while ordinal <= end:
+        yield date_cls.fromordinal(ordinal).isoformat()
+        ordinal += 1
+
+
+def previous_date(date):
+    return date_cls.fromordinal(date_cls.fromisoformat(date).toordinal() - 1).isoformat()
+
+
+def next_date(date):
+    return date_cls.fromordinal(date_cls.fromisoformat(date).toordinal() + 1).isoformat()
+
+
+def session_from_entry(entry):
+    """Build a Session from a dict entry as written by the tracker's DataManager"""
+    try:
+        duration = int(entry.get("duration", 0))
+    except (ValueError, TypeError):
+        duration = 0
+    return Session(
+        parse_clock(entry.get("start")),
+        parse_clock(entry.get("end")),
+        duration,
+        sys.intern(str(entry.get("app", ""))),
+        sys.intern(str(entry.get("title", ""))),
+        sys.intern(str(entry.get("end_reason", "unknown"))),
+    )
+
+
+def convert_legacy_list(items):
+    """Group the tracker's legacy list-of-sessions format by date (same mapping as DataManager)"""
+    grouped = {}
+    for item in items:
+        if not isinstance(item, dict) or not item.get("date"):
+            continue
+        t = item.get("time", {})
+        try:
+            duration = int(round(item.get("duration", 0)))
+        except (ValueError, TypeError):
+            duration = 0
+        grouped.setdefault(item["date"], []).append({
+            "start": t.get("start", ""),
+            "end": t.get("end", ""),
+            "app": item.get("app_name", ""),
+            "title": item.get("window_title", ""),
+            "duration": duration,
+            "end_reason": item.get("session_end_reason", ""),
+        })
+    return grouped
+
+
+def day_fingerprint(sessions):
+    """ETag input for one day: a digest of all its sessions, so it changes when any of
+    them is added, removed or rewritten (late device pushes, retention downsampling)"""
+    if not sessions:
+        return "empty"
+    return hashlib.blake2b(repr(tuple(sessions)).encode("utf-8"), digest_size=12).hexdigest()
+
+
+ROLLUPS_FORMAT = "rollups-v1"
+
+
+def read_saved_rollups(path):
+    """{date: (day_fingerprint, DayRollup)} from a rollup file ({} if it is missing or unreadable):
+
+        {"format": "rollups-v1",
+         "days": {"2025-09-16": {"digest": "9c1f...", "sessions": 140, "total_seconds": 31234,
+                                 "apps": [["chrome.exe", 20110], ...]}}}
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error reading rollups {path}: {e}")
+        return {}
+    if not isinstance(raw, dict) or raw.get("format") != ROLLUPS_FORMAT:
+        print(f"Ignoring rollups {path}: not in {ROLLUPS_FORMAT} format")
+        return {}
+    try:
+        return {date: (entry["digest"], rollup_from_entry(entry)) for date, entry in raw["days"].items()}
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        print(f"Error decoding rollups {path}: {e!r}")
+        return {}
+
+
+def save_rollups(path, digests, rollups):
+    """Replace a rollup file with the rollups of `digests` (date -> day_fingerprint)"""
+    days = {date: dict(digest=digest, **rollup_entry(rollups[date])) for date, digest in sorted(digests.items())}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"format": ROLLUPS_FORMAT, "days": days}, f, separators=(",", ":"), ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _file_identity(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class UsageStore:
+    """Process-wide, incrementally refreshed view of the tracker's app usage data.
+
+    Reads the dict-by-date JSON file plus the tracker's append-only journal
+    ("<json_file>.journal" and, during compaction, ".journal.compacting").
+    When only the journal has grown, just the new tail is parsed; the JSON
+    document itself is reparsed only when its identity (inode, size, mtime)
+    changes.
+
+    `days()` returns a mapping that is never mutated after it is published:
+    refreshes build a new dict and swap it in under the lock, so readers on
+    other threads always see a consistent snapshot.
+
+    Per-day rollups (see models/rollups.py) and an all-time rollup are kept
+    alongside the sessions and updated with just the newly ingested sessions.
+    The rollups of the JSON document's days are saved to "<json_file>.rollups"
+    with each day's fingerprint: a reload takes a day's rollup from there
+    while its fingerprint still matches and folds only the days that changed.
+    `python manage.py rebuild-rollups` checks that file against the raw sessions.
+    """
+
+    def __init__(self, json_file, save_rollups=True):
+        self.json_file = json_file
+        self.journal_file = f"{json_file}.journal"
+        self.compacting_file = f"{self.journal_file}.compacting"
+        self.rollup_file = f"{json_file}.rollups"
+        self.save_rollups = save_rollups
+
+        self._lock = threading.RLock()
+        self._days = {}
+        self._day_versions = {}
+        self._period_versions = {}
+        self._rollups = {}
+        self._all_time = EMPTY_ROLLUP
+        self._version = 0
+        # date -> (day version, day_fingerprint) of the days asked for
+        self._day_fingerprints = {}
+
+        self._base_identity = None
+        self._journal_inode = None
+        self._journal_offset = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def exists(self):
+        return os.path.exists(self.json_file) or os.path.exists(self.journal_file)
+
+    def refresh(self):
+        """Pick up changes on disk; returns the current data version"""
+        with self._lock:
+            base_identity = (_file_identity(self.json_file), _file_identity(self.compacting_file))
+            journal_identity = _file_identity(self.journal_file)
+            journal_inode = journal_identity[0] if journal_identity else None
+
+            if (
+                base_identity != self._base_identity
+                or (self._journal_inode is not None and journal_inode != self._journal_inode)
+                or (journal_identity and journal_identity[1] < self._journal_offset)
+            ):
+                self._reload(base_identity)
+            elif journal_identity and journal_identity[1] > self._journal_offset:
+                # A journal that just appeared is read from the start
+                self._journal_inode = journal_inode
+                self._ingest_journal_tail()
+            return self._version
+
+    def fingerprint(self):
+        """Token that changes whenever the data changes and is the same in every process"""
+        with self._lock:
+            self.refresh()
+            return f"{self._base_identity}|{self._journal_inode}|{self._journal_offset}"
+
+    def day_fingerprint(self, date):
+        """Like fingerprint() but only for one date's sessions; recomputed when its day version moves"""
+        with self._lock:
+            sessions = self.get_day(date)
+            version = self._day_versions.get(date, 0)
+            cached = self._day_fingerprints.get(date)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            fingerprint = day_fingerprint(sessions)
+            if sessions:
+                self._day_fingerprints[date] = (version, fingerprint)
+            return fingerprint
+
+    def export_state(self):
+        """Everything models/snapshot.py writes, taken from one refresh under the lock"""
+        with self._lock:
+            return {
+                "fingerprint": self.fingerprint(),
+                "exists": self.exists(),
+                "version": self._version,
+                "days": self._days,
+                "day_versions": dict(self._day_versions),
+                "period_versions": dict(self._period_versions),
+                "rollups": self._rollups,
+                "all_time": self._all_time,
+            }
+
+    def days(self):
+        """Snapshot of {date: tuple(Session, ...)}"""
+        self.refresh()
+        return self._days
+
+    def get_day(self, date):
+        return self.days().get(date, ())
+
+    def dates(self):
+        """Dates that have sessions"""
+        return self.days().keys()
+
+    def rollup(self, date):
+        """DayRollup for one date"""
+        self.refresh()
+        return self._rollups.get(date, EMPTY_ROLLUP)
+
+    def days_rollups(self, first, last):
+        """Rollups of the dates in ['YYYY-MM-DD', 'YYYY-MM-DD'] that have data"""
+        self.refresh()
+        rollups = self._rollups
+        return [rollups[d] for d in iter_dates(first, last) if d in rollups]
+
+    def all_time_rollup(self):
+        self.refresh()
+        return self._all_time
+
+    def day_version(self, date):
+        """Version at which `date` last changed (0 if it has no data)"""
+        self.refresh()
+        return self._day_versions.get(date, 0)
+
+    def period_version(self, kind, key):
+        """Version at which any date in a ("week", "2025-W37") / ("month", "2025-09") period last changed"""
+        self.refresh()
+        return self._period_versions.get((kind, key), 0)
+
+    def _touch_periods(self, dates):
+        for date in dates:
+            try:
+                keys = period_keys(date)
+            except ValueError:
+                continue
+            for key in keys:
+                self._period_versions[key] = self._version
+
+    # ---- loading ----
+
+    def base_days(self):
+        """{date: sessions} of the JSON document and a journal being compacted,
+        read from disk; these are the days the rollup file covers"""
+        days = self._read_base()
+        if os.path.exists(self.compacting_file):
+            with open(self.compacting_file, "rb") as f:
+                self._merge_lines(days, f.read())
+        return days
+
+    @timed("UsageStore.reload")
+    def _reload(self, base_identity):
+        days = self.base_days()
+        digests = {date: day_fingerprint(sessions) for date, sessions in days.items()}
+        rollups = self._load_rollups(days, digests)
+
+        self._journal_inode = None
+        self._journal_offset = 0
+        self._base_identity = base_identity
+        self._version += 1
+        # Days whose sessions did not change keep their version so per-day caches stay valid
+        day_versions = {
+            date: self._day_versions[date] if self._days.get(date) == sessions else self._version
+            for date, sessions in days.items()
+        }
+        self._touch_periods(
+            [d for d, v in day_versions.items() if v == self._version]
+            + [d for d in self._days if d not in days]
+        )
+        self._day_versions = day_versions
+        self._day_fingerprints = {date: (day_versions[date], digest) for date, digest in digests.items() if days[date]}
+        self._days = days
+        self._rollups = rollups
+        self._all_time = merge_rollups(rollups.values())
+
+        journal_identity = _file_identity(self.journal_file)
+        if journal_identity:
+            self._journal_inode = journal_identity[0]
+            self._ingest_journal_tail()
+
+    @timed("UsageStore.load_rollups")
+    def _load_rollups(self, days, digests):
+        """Rollups of `days`: saved ones whose fingerprint still matches, the rest folded"""
+        saved = read_saved_rollups(self.rollup_file) if os.path.exists(self.json_file) else {}
+        rollups = {}
+        folded = 0
+        for date, sessions in days.items():
+            entry = saved.get(date)
+            if entry is not None and entry[0] == digests[date]:
+                rollups[date] = entry[1]
+            else:
+                rollups[date] = rollup_sessions(sessions)
+                folded += 1
+        metrics.cache_lookup("saved_rollups", not folded)
+        if self.save_rollups and (folded or len(saved) != len(days)):
+            try:
+                save_rollups(self.rollup_file, digests, rollups)
+            except OSError as e:
+                print(f"Could not save rollups to {self.rollup_file}: {e}")
+        return rollups
+
+    @timed("UsageStore.read_base")
+    def _read_base(self):
+        """{date: tuple(Session, ...)} from the JSON file in any of its formats"""
+        if not os.path.exists(self.json_file):
+            return {}
+        try:
+            with open(self.json_file, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            metrics.bytes_read("app_usage", len(content))
+            raw = json.loads(content) if content else {}
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error parsing JSON file: {e}")
+            return {}
+        if is_compact(raw):
+            try:
+                return {date: tuple(map(Session._make, rows)) for date, rows in iter_session_rows(raw)}
+            except (KeyError, IndexError, TypeError, AttributeError) as e:
+                # A table or row that does not match the compact-v1 layout
+                print(f"Error decoding compact file {self.json_file}: {e!r}")
+                return {}
+        if isinstance(raw, list):
+            raw = convert_legacy_list(raw)
+        if not isinstance(raw, dict):
+            print(f"Unsupported log format in {self.json_file}: expected sessions grouped by date")
+            return {}
+        return {
+            date: tuple(session_from_entry(e) for e in entries if isinstance(e, dict))
+            for date, entries in raw.items()
+        }
+
+    def _ingest_journal_tail(self):
+        try:
+            with open(self.journal_file, "rb") as f:
+                f.seek(self._journal_offset)
+                chunk = f.read()
+        except OSError:
+            return
+        metrics.bytes_read("app_journal", len(chunk))
+        # Only consume complete lines; a partially written line waits for the next refresh
+        end = chunk.rfind(b"\n") + 1
+        if end == 0:
+            return
+
+        days = dict(self._days)
+        added = self._merge_lines(days, chunk[:end])
+        self._journal_offset += end
+        if added:
+            rollups = dict(self._rollups)
+            all_time = self._all_time
+            self._version += 1
+            for date, sessions in added.items():
+                rollups[date] = rollups.get(date, EMPTY_ROLLUP).with_sessions(sessions)
+                all_time = all_time.with_sessions(sessions)
+                self._day_versions[date] = self._version
+            self._touch_periods(added)
+            self._days = days
+            self._rollups = rollups
+            self._all_time = all_time
+
+    @staticmethod
+    def _merge_lines(days, data):
+        """Append journal lines to `days` (replacing the touched tuples); returns {date: new sessions}"""
+        added = {}
+        for line in data.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            date = record.get("date") if isinstance(record, dict) else None
+            if date:
+                added.setdefault(date, []).append(session_from_entry(record))
+        for date, sessions in added.items():
+            days[date] = days.get(date, ()) + tuple(sessions)
+        return added
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_usage_store(json_file=None):
+    """Return the shared store for `json_file`.
+
+    Without a file this is the store of the device the current request asked
+    for (see models/devices.py), which defaults to this machine's configured
+    store (get_local_usage_store).
+    """
+    if json_file is None:
+        from models.devices import LOCAL_DEVICE, current_device, get_device_usage_store
+        device = current_device.get()
+        if device is not None and device != LOCAL_DEVICE:
+            return get_device_usage_store(device)
+        return get_local_usage_store()
+
+    with _stores_lock:
+        store = _stores.get(json_file)
+        if store is None:
+            store = _stores[json_file] = UsageStore(json_file)
+        return store
+
+
+def get_local_usage_store():
+    """This machine's configured store: the UsageStore over Config.JSON_FILE,
+    the SQLite store when Config.STORAGE_BACKEND is "sqlite", the
+    day-partitioned store when it is "partitioned", or the shared snapshot in
+    a serve.py worker process.
+    """
+    if Config.STORAGE_BACKEND == "sqlite":
+        from models.sqlite_store import SQLiteUsageStore, get_database
+        return SQLiteUsageStore(get_database(Config.SQLITE_FILE))
+    if Config.USAGE_SNAPSHOT_DIR:
+        # serve.py worker: read the snapshot the supervisor publishes
+        from models.snapshot import get_mapped_store
+        return get_mapped_store(Config.USAGE_SNAPSHOT_DIR)
+    if Config.STORAGE_BACKEND == "partitioned":
+        from models.partitions import get_partitioned_store
+        return get_partitioned_store(Config.PARTITION_DIR, Config.PARTITION_CACHE_DAYS)
+    return get_usage_store(Config.JSON_FILE)
@@ -1,33 +1,229 @@
 # routes/analytics.py
 from flask import Blueprint, jsonify, request
+from config import Config
 from models.top_applications import get_top_applications
 from models.screen_time import get_total_minutes
+from models.top_domains import get_browser_domains, get_domains_by_hour, get_top_domains
 from models.sunBurst_Chart import LogAnalyzer
-from datetime import datetime
+from models.chrome_attribution import ChromeAttribution
+from models.heatmap import HeatmapIndex, get_heatmap
+from models.search_index import ChromeSearchIndex, UsageSearchIndex, search, tokenize
+from models.usage_store import get_usage_store, previous_date
+from models.chrome_store import get_chrome_store
+from models.range_analytics import (
+    GRANULARITIES,
+    RollupIndex,
+    parse_range,
+    range_merged_sessions,
+    range_top_applications,
+    range_total_screen_time,
+)
+from models.devices import LOCAL_DEVICE, current_device
+from routes.http_cache import conditional
+from datetime import date as date_cls, datetime
+import threading
 
 analytics_bp = Blueprint("analytics", __name__)
-analyzer = LogAnalyzer()
+
+
+class DeviceViews:
+    """The cached analyzers over one device's store (built inside a request for that device)"""
+
+    def __init__(self):
+        self.analyzer = LogAnalyzer()
+        self.rollup_index = RollupIndex()
+        self.chrome_attribution = ChromeAttribution(self.analyzer)
+        self.heatmap_index = HeatmapIndex(self.analyzer)
+        self.usage_search = UsageSearchIndex(self.analyzer.store)
+        self.chrome_search = ChromeSearchIndex(get_chrome_store())
+
+
+_views = {None: DeviceViews()}
+_views_lock = threading.Lock()
+# This machine's analyzer (also used by the live stream)
+analyzer = _views[None].analyzer
+
+def _device_views():
+    device = current_device.get()
+    if device == LOCAL_DEVICE:
+        device = None
+    with _views_lock:
+        views = _views.get(device)
+        if views is None:
+            views = _views[device] = DeviceViews()
+        return views
+
+# ETag inputs: re-validating an unchanged day costs a rollup lookup, not a rebuild
+def _day_fingerprint(date):
+    return get_usage_store().day_fingerprint(date)
+
+def _chrome_fingerprint(date=None):
+    return get_chrome_store().fingerprint()
+
+def _columns_fingerprint(date):
+    # The previous day's last session may run past midnight into this one
+    store = get_usage_store()
+    try:
+        previous = previous_date(date)
+    except ValueError:
+        return store.day_fingerprint(date)  # the view answers 400
+    return f"{store.day_fingerprint(date)}|{store.day_fingerprint(previous)}"
+
+def _sunburst_fingerprint(date):
+    if request.args.get("split") == "domains":
+        return _browser_domains_fingerprint(date)
+    return _columns_fingerprint(date)
+
+def _browser_domains_fingerprint(date):
+    return f"{_columns_fingerprint(date)}|{get_chrome_store().day_version(date)}"
+
+def _usage_fingerprint():
+    return get_usage_store().fingerprint()
+
+def _usage_and_chrome_fingerprint():
+    return f"{_usage_fingerprint()}|{_chrome_fingerprint()}"
+
+def _date_arg(date):
+    return date
+
+def _to_arg():
+    return request.args.get("to")
 
 # Top applications by date
 @analytics_bp.route("/<date>/top-applications", methods=["GET"])
+@conditional(_day_fingerprint, last_day=_date_arg)
 def top_applications_by_date(date):
     return jsonify(get_top_applications(date))
 
 # Total screen time by date
 @analytics_bp.route("/<date>/total-screen-time", methods=["GET"])
+@conditional(_day_fingerprint, last_day=_date_arg)
 def total_screen_time(date):
     return jsonify(get_total_minutes(date))
 
+# Browser time by domain for a date
+@analytics_bp.route("/<date>/top-domains", methods=["GET"])
+@conditional(_chrome_fingerprint, last_day=_date_arg)
+def top_domains_by_date(date):
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    return jsonify(get_top_domains(date))
+
+# Browser minutes per domain for each hour of a date
+@analytics_bp.route("/<date>/domains-by-hour", methods=["GET"])
+@conditional(_chrome_fingerprint, last_day=_date_arg)
+def domains_by_hour(date):
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    return jsonify(get_domains_by_hour(date))
+
+# Browser app time split by the domain in the foreground tab
+@analytics_bp.route("/<date>/browser-domains", methods=["GET"])
+@conditional(_browser_domains_fingerprint, last_day=_date_arg)
+def browser_domains_by_date(date):
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    return jsonify(get_browser_domains(_device_views().chrome_attribution, date))
+
 @analytics_bp.route('/<date>/sunBurst-Chart', methods=['GET'])
+@conditional(_sunburst_fingerprint, last_day=_date_arg)
 def get_merged_sessions_by_date(date):
-    """Return merged sessions for a specific date (format: YYYY-MM-DD)"""
+    """Return merged sessions for a specific date (format: YYYY-MM-DD).
+
+    With ?split=domains the browser app's blocks are split into
+    "<app>/<domain>" entries.
+    """
     try:
         datetime.strptime(date, "%Y-%m-%d")  # Validate date format
     except ValueError:
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
 
-    if not analyzer.parse_log_file():
+    views = _device_views()
+    if not views.analyzer.parse_log_file():
         return jsonify({'error': 'Log file not found or invalid'}), 404
 
-    merged_data = analyzer.get_merged_sessions(date_filter=date)
-    return jsonify(merged_data)
\ No newline at end of file
+    merged_data = views.analyzer.get_merged_sessions(date_filter=date)
+    if request.args.get("split") == "domains":
+        merged_data = views.chrome_attribution.split_sessions(date, merged_data)
+    return jsonify(merged_data)
+
+
+def _range_args():
+    """(start, end, granularity) from ?from=&to=&granularity= query parameters"""
+    granularity = request.args.get("granularity")
+    if granularity and granularity not in GRANULARITIES:
+        raise ValueError(f"Invalid granularity. Use one of: {', '.join(GRANULARITIES)}")
+    # One entry per day in the response: keep those ranges shorter
+    max_days = Config.RANGE_MAX_DAYS_DAILY if granularity == "day" else None
+    start, end = parse_range(request.args.get("from"), request.args.get("to"), max_days)
+    return start, end, granularity
+
+# Range versions: /api/range/<endpoint>?from=YYYY-MM-DD&to=YYYY-MM-DD[&granularity=day|week|month]
+@analytics_bp.route("/range/total-screen-time", methods=["GET"])
+@conditional(_usage_fingerprint, last_day=_to_arg)
+def range_total_screen_time_route():
+    try:
+        start, end, granularity = _range_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(range_total_screen_time(_device_views().rollup_index, start, end, granularity))
+
+@analytics_bp.route("/range/top-applications", methods=["GET"])
+@conditional(_usage_fingerprint, last_day=_to_arg)
+def range_top_applications_route():
+    try:
+        start, end, granularity = _range_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(range_top_applications(_device_views().rollup_index, start, end, granularity))
+
+@analytics_bp.route("/range/sunBurst-Chart", methods=["GET"])
+@conditional(_usage_fingerprint, last_day=_to_arg)
+def range_merged_sessions_route():
+    try:
+        start, end, granularity = _range_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    views = _device_views()
+    if not views.analyzer.parse_log_file():
+        return jsonify({'error': 'Log file not found or invalid'}), 404
+
+    return jsonify(range_merged_sessions(views.analyzer, start, end, granularity))
+
+# Minutes per hour of day for each weekday: /api/heatmap?from=YYYY-MM-DD&to=YYYY-MM-DD[&app=][&domain=]
+@analytics_bp.route("/heatmap", methods=["GET"])
+@conditional(_usage_and_chrome_fingerprint, last_day=_to_arg)
+def heatmap_route():
+    try:
+        start, end = parse_range(request.args.get("from"), request.args.get("to"))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(get_heatmap(
+        _device_views().heatmap_index, start, end, request.args.get("app"), request.args.get("domain")
+    ))
+
+# Sessions whose title/app (or Chrome domain/URL path) contain every word of ?q=,
+# with total durations: /api/search?q=...[&from=YYYY-MM-DD][&to=YYYY-MM-DD][&limit=50]
+@analytics_bp.route("/search", methods=["GET"])
+@conditional(_usage_and_chrome_fingerprint, last_day=_to_arg)
+def search_route():
+    query = request.args.get("q", "")
+    if not tokenize(query):
+        return jsonify({'error': "'q' must contain at least one word"}), 400
+    try:
+        start = date_cls.fromisoformat(request.args["from"]) if request.args.get("from") else None
+        end = date_cls.fromisoformat(request.args["to"]) if request.args.get("to") else None
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return jsonify({'error': 'Invalid date (use YYYY-MM-DD) or limit'}), 400
+    if not 0 <= limit <= 1000:
+        return jsonify({'error': 'limit must be between 0 and 1000'}), 400
+    views = _device_views()
+    return jsonify(search(views.usage_search, views.chrome_search, query, start, end, limit))
@@ -1,21 +1,45 @@
 # routes/chrome_activity.py
-from flask import Blueprint, request, jsonify
 import json
-import os
+from flask import Blueprint, Response, request, jsonify
 from config import Config
+from models.chrome_records import idempotency_key, normalize_record, parse_timestamp, raw_record, record_start
+from models.chrome_store import get_chrome_store
+from models.devices import (
+    ALL_DEVICES,
+    LOCAL_DEVICE,
+    append_device_chrome_records,
+    append_new_device_chrome_records,
+    current_device,
+)
+from routes.http_cache import conditional
+from routes.stream import live_feed
 
 chrome_activity_bp = Blueprint("chrome_activity", __name__)
-DATA_FILE = Config.CHROME_JSON_FILE
 
 def load_data():
-    if not os.path.exists(DATA_FILE):
-        return []
-    with open(DATA_FILE, "r") as f:
-        return json.load(f)
+    return get_chrome_store().load_all()
 
-def save_data(data):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+def _query_args():
+    """Filters from ?from=&to=&domain=&limit=&cursor= (ValueError on bad input)"""
+    args = request.args
+    start_ms = parse_timestamp(args["from"]) if args.get("from") else None
+    end_ms = parse_timestamp(args["to"], end_of_day=True) if args.get("to") else None
+    domain = args.get("domain", "").strip().lower() or None
+    limit = int(args["limit"]) if args.get("limit") else None
+    if limit is not None and limit <= 0:
+        raise ValueError("limit must be positive")
+    return dict(start_ms=start_ms, end_ms=end_ms, domain=domain, limit=limit, cursor=args.get("cursor") or None)
+
+def _shape():
+    """The record renderer for ?shape=: the extension's own fields (default) or the stored compact ones"""
+    shape = request.args.get("shape", "raw")
+    if shape not in ("raw", "normalized"):
+        raise ValueError("shape must be raw or normalized")
+    return raw_record if shape == "raw" else (lambda record: record)
+
+def _ndjson_lines(rows, render):
+    for cursor, record in rows:
+        yield json.dumps(render(record), ensure_ascii=False) + "\n"
 
 @chrome_activity_bp.route("/chrome-activity", methods=["GET", "POST"])
 def chrome_activity():
@@ -23,11 +47,98 @@ def chrome_activity():
         entry = request.json
         if not entry:
             return jsonify({"error": "No JSON provided"}), 400
-        data = load_data()
-        data.append(entry)
-        save_data(data)
-        return jsonify({"message": "Saved"}), 201
+        # Accept a single record or a list of records in one request
+        records = entry if isinstance(entry, list) else [entry]
+        device = current_device.get()
+        if device == ALL_DEVICES:
+            return jsonify({"error": "Records must be sent for one device"}), 400
+        try:
+            if device is not None and device != LOCAL_DEVICE:
+                added = append_device_chrome_records(device, records)
+            else:
+                added = get_chrome_store().append(records)
+        except RuntimeError as e:
+            return jsonify({"error": str(e)}), 500
+        # Open /api/stream clients get the records without waiting for the next poll
+        live_feed.notify()
+        return jsonify({"message": "Saved", "added_records": added}), 201
+
+    # HEAD is a liveness probe; don't touch the data at all
+    if request.method == "HEAD":
+        return Response(status=200)
 
     if request.method == "GET":
-        data = load_data()
-        return jsonify(data)
+        return _get_chrome_activity()
+
+@chrome_activity_bp.route("/chrome-activity/batch", methods=["POST"])
+def chrome_activity_batch():
+    """Store a JSON array of extension sessions, skipping ones already stored.
+
+    A session may carry an "idempotency_key" label; otherwise its key is
+    "<chrome_profile>|<windowId>|<start_ms>|<url>". The response lists the keys
+    that were written ("accepted"), were already stored ("duplicates") or
+    can never be stored ("rejected"), so the client can drop exactly those
+    from its queue and resend the rest.
+    """
+    records = request.get_json(silent=True)
+    if not isinstance(records, list):
+        return jsonify({"error": "Expected a JSON array of sessions"}), 400
+    if len(records) > Config.CHROME_BATCH_MAX:
+        return jsonify({"error": f"At most {Config.CHROME_BATCH_MAX} sessions per batch"}), 413
+    device = current_device.get()
+    if device == ALL_DEVICES:
+        return jsonify({"error": "Records must be sent for one device"}), 400
+
+    sessions, keys, rejected = [], [], []
+    for record in records:
+        if not isinstance(record, dict):
+            rejected.append({"key": None, "error": "Not a JSON object"})
+            continue
+        record = dict(record)
+        label = record.pop("idempotency_key", None)
+        record = normalize_record(record)
+        key = label if label is not None else idempotency_key(record)
+        if not record_start(record):
+            rejected.append({"key": key, "error": "Missing or invalid start time"})
+            continue
+        sessions.append(record)
+        keys.append(key)
+
+    try:
+        if device is not None and device != LOCAL_DEVICE:
+            written = append_new_device_chrome_records(device, sessions)
+        else:
+            written = get_chrome_store().append_new(sessions)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+    accepted = [key for key, new in zip(keys, written) if new]
+    if accepted:
+        live_feed.notify()
+    return jsonify({
+        "accepted": accepted,
+        "duplicates": [key for key, new in zip(keys, written) if not new],
+        "rejected": rejected,
+    })
+
+@conditional(lambda: get_chrome_store().fingerprint(), last_day=lambda: request.args.get("to"))
+def _get_chrome_activity():
+    try:
+        render = _shape()
+        # No filters: the whole history, in arrival order, as before
+        if not request.args.keys() - {"shape"}:
+            return jsonify([render(record) for record in load_data()])
+        query = _query_args()
+        rows = get_chrome_store().query(**query)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Stream one record per line without building the whole list
+    if request.args.get("format") == "ndjson":
+        return Response(_ndjson_lines(rows, render), mimetype="application/x-ndjson")
+
+    page = list(rows)
+    response = jsonify([render(record) for _, record in page])
+    # A full page may have more after it; the client passes this back as ?cursor=
+    if query["limit"] is not None and len(page) == query["limit"] and page[-1][0] is not None:
+        response.headers["X-Next-Cursor"] = page[-1][0]
+    return response
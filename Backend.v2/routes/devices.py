@@ -0,0 +1,101 @@
+# routes/devices.py
+import queue
+import re
+from datetime import date
+from flask import Blueprint, g, jsonify, request
+from models.devices import (
+    ALL_DEVICES,
+    LOCAL_DEVICE,
+    current_device,
+    get_device_usage_store,
+    ingest_queue,
+    list_devices,
+    valid_device_id,
+)
+
+devices_bp = Blueprint("devices", __name__)
+
+# Session fields a pushed entry must have, as written by the tracker's DataManager
+_SESSION_KEYS = ("date", "start", "end", "app", "duration")
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_CLOCK = re.compile(r"([01]\d|2[0-3]):[0-5]\d:[0-5]\d")
+
+
+@devices_bp.before_app_request
+def _select_device():
+    """?device=<id>|local|all (or an X-Device-Id header) picks whose data a request reads"""
+    device = request.args.get("device") or request.headers.get("X-Device-Id")
+    if not device:
+        return None
+    if device not in (LOCAL_DEVICE, ALL_DEVICES) and not valid_device_id(device):
+        return jsonify({"error": "Invalid device id"}), 400
+    g.device_token = current_device.set(device)
+    return None
+
+
+@devices_bp.teardown_app_request
+def _reset_device(exc):
+    token = g.pop("device_token", None)
+    if token is not None:
+        current_device.reset(token)
+
+
+def _valid_session(entry):
+    if not isinstance(entry, dict) or any(key not in entry for key in _SESSION_KEYS):
+        return False
+    # Dates and times are file names and sort keys, so they must be exactly
+    # YYYY-MM-DD and HH:MM:SS ("2025-9-16" would be a separate partition)
+    if not all(isinstance(entry[key], str) for key in ("date", "start", "end")):
+        return False
+    if not _DATE.fullmatch(entry["date"]) or not all(_CLOCK.fullmatch(entry[key]) for key in ("start", "end")):
+        return False
+    # Optional; the tracker sends one per session so retried pushes are stored once
+    session_id = entry.get("session_id")
+    if session_id is not None and not (isinstance(session_id, str) and 0 < len(session_id) <= 64):
+        return False
+    try:
+        date.fromisoformat(entry["date"])
+        int(entry["duration"])
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+@devices_bp.route("/devices", methods=["GET"])
+def devices():
+    """Devices that have pushed data, with their session count and last date"""
+    result = []
+    for device in list_devices():
+        store = get_device_usage_store(device)
+        dates = store.dates()
+        result.append({
+            "device": device,
+            "sessions": store.all_time_rollup().session_count,
+            "last_date": dates[-1] if dates else None,
+        })
+    return jsonify(result)
+
+
+@devices_bp.route("/devices/<device>/sessions", methods=["POST"])
+def push_sessions(device):
+    """Queue a batch of app sessions from a remote tracker:
+    [{"date": "2025-09-16", "start": "10:00:00", "end": ..., "app": ..., "title": ..., "duration": 42,
+      "end_reason": ..., "session_id": "9f0c..."}]
+    """
+    if not valid_device_id(device):
+        return jsonify({"error": "Invalid device id"}), 400
+    entries = request.get_json(silent=True)
+    if isinstance(entries, dict):
+        entries = entries.get("sessions")
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "Expected a list of sessions"}), 400
+    if not all(_valid_session(e) for e in entries):
+        return jsonify({"error": f"Every session needs {', '.join(_SESSION_KEYS)}"}), 400
+
+    try:
+        ingest_queue.submit(device, entries)
+    except queue.Full:
+        response = jsonify({"error": "Ingest queue is full, retry later"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+    return jsonify({"message": "Queued", "queued_sessions": len(entries)}), 202
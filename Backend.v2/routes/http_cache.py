@@ -0,0 +1,91 @@
+# routes/http_cache.py
+import gzip
+import hashlib
+from datetime import date as date_cls, datetime
+from functools import wraps
+from flask import Response, make_response, request
+from config import Config
+from models import metrics
+
+try:
+    import brotli  # optional; gzip is used when it is not installed
+except ImportError:
+    brotli = None
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _cache_control(last_day):
+    """Days before today change rarely and can be cached for a while
+    (Config.HTTP_PAST_DAY_MAX_AGE); anything that includes today must be
+    revalidated with the ETag."""
+    if last_day is not None and last_day < date_cls.today():
+        return f"public, max-age={Config.HTTP_PAST_DAY_MAX_AGE}"
+    return "no-cache"
+
+
+def conditional(fingerprint, last_day=None):
+    """Decorator for GET views whose body depends only on the URL and the data.
+
+    `fingerprint(**view_args)` must be cheap and return a string that changes
+    whenever the data behind the response changes. The weak ETag is a hash of
+    the URL and that string; a matching If-None-Match gets a 304 without
+    calling the view. `last_day(**view_args)` returns the last 'YYYY-MM-DD'
+    the response covers, and decides the Cache-Control header.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            token = f"{request.full_path}|{fingerprint(**kwargs)}"
+            etag = hashlib.sha1(token.encode("utf-8")).hexdigest()
+
+            not_modified = request.if_none_match.contains_weak(etag)
+            metrics.cache_lookup("http_etag", not_modified)
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            day = _parse_day(last_day(**kwargs)) if last_day else None
+            response.headers["Cache-Control"] = _cache_control(day)
+            return response
+        return wrapper
+    return decorator
+
+
+def compress_response(response):
+    """after_request hook: brotli- or gzip-encode large bodies the client accepts.
+
+    Streamed responses (e.g. ?format=ndjson) are left alone so they still
+    start sending straight away.
+    """
+    if (
+        request.method == "HEAD"
+        or response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < Config.HTTP_COMPRESS_MIN_BYTES:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        response.set_data(brotli.compress(body))
+        response.headers["Content-Encoding"] = "br"
+    elif accepted["gzip"]:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
@@ -0,0 +1,42 @@
+# routes/metrics.py
+import threading
+import time
+from flask import Blueprint, Response, g, jsonify, request
+from config import Config
+from models import metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    if not metrics.enabled:
+        return jsonify({"error": "Metrics are disabled (Config.METRICS_ENABLED)"}), 404
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+# Hooks are only installed when metrics are on, so a disabled build pays nothing per request
+if metrics.enabled:
+    @metrics_bp.before_app_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        # One request can ask for a stack profile instead of its body: send "X-Profile: 1"
+        if Config.PROFILE_REQUESTS and request.headers.get("X-Profile") == "1":
+            g.profiler = metrics.SamplingProfiler(threading.get_ident()).start()
+
+    @metrics_bp.after_app_request
+    def _record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            metrics.observe(
+                "activity_request_duration_seconds",
+                time.perf_counter() - start,
+                route=route,
+                method=request.method,
+                status=response.status_code,
+            )
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            return Response(profiler.stop().folded(), mimetype="text/plain")
+        return response
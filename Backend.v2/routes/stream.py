@@ -0,0 +1,35 @@
+# routes/stream.py
+from flask import Blueprint, Response, jsonify, stream_with_context
+from config import Config
+from models.live_feed import LiveFeed, format_event
+from routes.analytics import analyzer
+
+stream_bp = Blueprint("stream", __name__)
+live_feed = LiveFeed(analyzer)
+
+
+@stream_bp.route("/stream", methods=["GET"])
+def stream():
+    """Server-Sent Events with new sessions, sunburst blocks, totals and Chrome records"""
+    subscription = live_feed.subscribe()
+    if subscription is None:
+        return jsonify({"error": "Too many open streams"}), 503
+
+    def events():
+        try:
+            # Reconnect after this many ms if the connection drops
+            yield f"retry: {Config.STREAM_RETRY_MS}\n\n"
+            while True:
+                item = subscription.get(Config.STREAM_KEEPALIVE)
+                if item is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield format_event(item)
+        finally:
+            live_feed.unsubscribe(subscription)
+
+    response = Response(stream_with_context(events()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Keep reverse proxies from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,133 @@
+# serve.py
+"""Production entry point for the backend.
+
+    python serve.py                      # one process, Config.SERVE_THREADS threads
+    python serve.py --workers 4          # four worker processes on one port
+
+Requests are served by waitress when it is installed and by werkzeug's
+threaded server otherwise. With several workers this process is only a
+supervisor: it binds the socket, runs the one-off Chrome migration and the
+daily retention job, parses the app usage data once and keeps a
+memory-mapped snapshot of it up to date (models/snapshot.py) that every
+worker reads.
+"""
+import argparse
+import multiprocessing
+import socket
+import sys
+import time
+from config import Config
+
+
+def _listen(host, port):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    return sock
+
+
+def _serve(app, sock, threads):
+    try:
+        import waitress
+    except ImportError:
+        waitress = None
+
+    if waitress is not None:
+        waitress.serve(app, sockets=[sock], threads=threads)
+        return
+
+    from werkzeug.serving import make_server
+    host, port = sock.getsockname()[:2]
+    # werkzeug starts a thread per request; `threads` only applies to waitress
+    make_server(host, port, app, threaded=True, fd=sock.fileno()).serve_forever()
+
+
+def _worker(sock, worker_id, threads, snapshot_dir):
+    # Must be set before main is imported: the routes build their stores at import
+    if snapshot_dir:
+        Config.USAGE_SNAPSHOT_DIR = snapshot_dir
+    Config.CHROME_WRITER_TAG = f"-w{worker_id}"
+    from main import create_app
+    _serve(create_app(background_jobs=False), sock, threads)
+
+
+def _start_background_jobs():
+    """Start what create_app(background_jobs=True) would, once for every worker.
+
+    Returns the snapshot publisher and its folder (None, None with SQLite).
+    """
+    from models.chrome_store import get_chrome_store
+    from models.retention import start_retention_job
+
+    get_chrome_store().migrate_in_background().join()
+    # Downsample old Chrome records once a day (when Config.RETENTION_DAYS is set)
+    start_retention_job()
+
+    if Config.STORAGE_BACKEND == "sqlite":
+        # SQLite is shared between processes already
+        return None, None
+    # JSON data is parsed once here
+    from models.snapshot import SnapshotPublisher
+    from models.usage_store import get_usage_store
+    publisher = SnapshotPublisher(get_usage_store(), Config.SNAPSHOT_DIR)
+    publisher.publish()
+    publisher.start()
+    return publisher, Config.SNAPSHOT_DIR
+
+
+def serve(host, port, threads, workers):
+    sock = _listen(host, port)
+    print(f"Serving on http://{host}:{port} with {workers} worker(s) x {threads} thread(s)")
+
+    if workers <= 1:
+        from main import create_app
+        _serve(create_app(), sock, threads)
+        return
+
+    publisher, snapshot_dir = _start_background_jobs()
+
+    context = multiprocessing.get_context("spawn")
+    processes = {}
+
+    def start(worker_id):
+        process = context.Process(
+            target=_worker, args=(sock, worker_id, threads, snapshot_dir), name=f"worker-{worker_id}", daemon=True
+        )
+        process.start()
+        processes[worker_id] = process
+
+    for worker_id in range(1, workers + 1):
+        start(worker_id)
+    try:
+        while True:
+            time.sleep(1)
+            for worker_id, process in list(processes.items()):
+                if not process.is_alive():
+                    print(f"Worker {worker_id} exited with code {process.exitcode}; restarting")
+                    start(worker_id)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join()
+        if publisher is not None:
+            publisher.stop()
+        sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Activity Tracker backend in production mode")
+    parser.add_argument("--host", default=Config.HOST)
+    parser.add_argument("--port", type=int, default=Config.PORT)
+    parser.add_argument("--threads", type=int, default=Config.SERVE_THREADS)
+    parser.add_argument("--workers", type=int, default=Config.SERVE_WORKERS)
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.threads, args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
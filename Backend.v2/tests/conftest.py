@@ -0,0 +1,53 @@
+# tests/conftest.py
+import json
+import os
+import sys
+import pytest
+
+# The backend's modules import each other from the Backend.v2 folder (run from it)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The tracker's folder, for tests that write data with it (add it with monkeypatch.syspath_prepend)
+TRACKER_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "Activity-tracker", "pc tracker", "pc apps tracker",
+)
+
+
+@pytest.fixture
+def write_usage(tmp_path):
+    """Write {date: [session dict, ...]} as an app usage file; returns its path"""
+    def write(data, name="app_usage.json"):
+        path = tmp_path / name
+        path.write_text(json.dumps(data), encoding="utf-8")
+        return str(path)
+    return write
+
+
+def session(start, end, app="Code.exe", title="", duration=None, end_reason="app_switch"):
+    """A session dict as the tracker writes it; the duration defaults to end - start"""
+    if duration is None:
+        h1, m1, s1 = map(int, start.split(":"))
+        h2, m2, s2 = map(int, end.split(":"))
+        duration = (h2 * 3600 + m2 * 60 + s2 - h1 * 3600 - m1 * 60 - s1) % 86400
+    return {"start": start, "end": end, "app": app, "title": title, "duration": duration, "end_reason": end_reason}
+
+
+@pytest.fixture
+def chrome(tmp_path, monkeypatch):
+    """A fresh local Chrome store in tmp_path, used by the routes in place of the configured one"""
+    import models.chrome_store
+    from config import Config
+    monkeypatch.setattr(Config, "STORAGE_BACKEND", "json")
+    store = models.chrome_store.ChromeSegmentStore(
+        str(tmp_path / "chrome_segments"), legacy_file=str(tmp_path / "chrome_usage.json")
+    )
+    monkeypatch.setattr(models.chrome_store, "chrome_store", store)
+    return store
+
+
+@pytest.fixture
+def client():
+    """A test client of the app without its background jobs"""
+    from main import create_app
+    return create_app(background_jobs=False).test_client()
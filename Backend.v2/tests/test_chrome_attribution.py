@@ -0,0 +1,65 @@
+# tests/test_chrome_attribution.py
+from random import Random
+from conftest import session
+from models.chrome_attribution import UNATTRIBUTED, ChromeAttribution, foreground_segments, intersect
+from models.sunBurst_Chart import LogAnalyzer
+from models.usage_store import day_epoch
+
+
+def _brute_force(intervals, records):
+    """Domain of every time unit inside the intervals: the covering record that started last"""
+    owners = {}
+    for start, end in intervals:
+        for t in range(start, end):
+            covering = [r for r in records if r[0] <= t < r[1]]
+            owners[t] = max(covering)[2] if covering else UNATTRIBUTED
+    return owners
+
+
+def _unit_owners(pieces):
+    return {t: domain for start, end, domain in pieces for t in range(start, end)}
+
+
+def test_interval_join_matches_brute_force():
+    rng = Random(17)
+    for _ in range(200):
+        starts = sorted(rng.sample(range(0, 300), rng.randrange(0, 12)))
+        records = [(s, s + rng.randrange(1, 80), rng.choice("abc")) for s in starts]
+        intervals, t = [], 0
+        while t < 300:
+            t += rng.randrange(1, 40)
+            end = min(300, t + rng.randrange(1, 60))
+            if t < end:
+                intervals.append((t, end))
+            t = end + 1
+
+        segments = foreground_segments(records)
+        pieces = intersect(intervals, segments)
+        assert all(s < e for s, e, _ in segments) and all(a[1] <= b[0] for a, b in zip(segments, segments[1:]))
+        assert all(s < e for s, e, _ in pieces) and all(a[1] <= b[0] for a, b in zip(pieces, pieces[1:]))
+        assert _unit_owners(pieces) == _brute_force(intervals, records)
+
+
+def test_browser_time_is_split_by_domain(write_usage, chrome):
+    day_ms = day_epoch("2025-09-15") * 1000
+
+    def record(domain, start_min, end_min):
+        return {"domain": domain, "url": f"https://{domain}/", "start_ms": day_ms + start_min * 60000,
+                "end_ms": day_ms + end_min * 60000, "duration_ms": (end_min - start_min) * 60000}
+
+    chrome.append([
+        record("github.com", 9 * 60, 9 * 60 + 20),
+        record("youtube.com", 9 * 60 + 10, 9 * 60 + 15),  # a tab opened on top of github.com
+        record("example.com", 11 * 60, 11 * 60 + 30),  # while Code.exe was in the foreground
+    ])
+    analyzer = LogAnalyzer(write_usage({"2025-09-15": [
+        session("09:00:00", "09:30:00", "chrome.exe"),
+        session("11:00:00", "11:30:00", "Code.exe"),
+    ]}))
+    analyzer.parse_log_file()
+
+    assert ChromeAttribution(analyzer).domain_ms("2025-09-15") == {
+        "github.com": 15 * 60000,
+        "youtube.com": 5 * 60000,
+        UNATTRIBUTED: 10 * 60000,
+    }
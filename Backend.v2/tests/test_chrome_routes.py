@@ -0,0 +1,62 @@
+# tests/test_chrome_routes.py
+import json
+
+RAW = {
+    "domain": "youtube.com",
+    "url": "https://youtube.com/watch",
+    "start_time": "2025-09-10 12:10:14.691",
+    "end_time": "2025-09-10 12:10:28",
+    "windowId": 7,
+    "end_reason": "tab_switch",
+}
+
+
+def test_get_returns_records_as_the_extension_sent_them(chrome, client):
+    assert client.post("/api/chrome-activity", json=RAW).status_code == 201
+
+    assert client.get("/api/chrome-activity").get_json() == [RAW]
+    assert client.get("/api/chrome-activity?from=2025-09-10&to=2025-09-10").get_json() == [RAW]
+    lines = client.get("/api/chrome-activity?domain=youtube.com&format=ndjson").get_data(as_text=True)
+    assert [json.loads(line) for line in lines.splitlines()] == [RAW]
+
+
+def test_get_normalized_shape_on_request(chrome, client):
+    client.post("/api/chrome-activity", json=RAW)
+
+    [record] = client.get("/api/chrome-activity?shape=normalized").get_json()
+    assert record["start_ms"] + 13309 == record["end_ms"] == record["start_ms"] + record["duration_ms"]
+    assert "start_time" not in record
+    assert client.get("/api/chrome-activity?shape=compact").status_code == 400
+
+
+def test_legacy_records_are_returned_unchanged(chrome, client, tmp_path):
+    legacy = [{"site": "example.com", "ST": "2025-09-09 08:00:00", "ET": "2025-09-09 08:01:00"}]
+    (tmp_path / "chrome_usage.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    assert client.get("/api/chrome-activity").get_json() == legacy
+
+
+def test_domain_routes_reject_bad_dates(chrome, client):
+    for route in ("top-domains", "domains-by-hour"):
+        assert client.get(f"/api/not-a-date/{route}").status_code == 400
+        assert client.get(f"/api/2025-09-10/{route}").status_code == 200
+
+
+def test_batch_stores_each_session_once(chrome, client):
+    second = dict(RAW, start_time="2025-09-10 12:10:28", end_time="2025-09-10 12:11:00")
+    batch = [
+        dict(RAW, idempotency_key="a"),
+        dict(second, idempotency_key="b"),
+        dict(RAW, idempotency_key="a"),
+        "not a session",
+    ]
+
+    result = client.post("/api/chrome-activity/batch", json=batch).get_json()
+    assert result["accepted"] == ["a", "b"]
+    assert result["duplicates"] == ["a"]
+    assert [r["key"] for r in result["rejected"]] == [None]
+
+    # The extension resends the batch when the response was lost
+    result = client.post("/api/chrome-activity/batch", json=batch[:2]).get_json()
+    assert result == {"accepted": [], "duplicates": ["a", "b"], "rejected": []}
+    assert client.get("/api/chrome-activity").get_json() == [RAW, second]
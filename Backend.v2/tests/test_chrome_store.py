@@ -0,0 +1,152 @@
+# tests/test_chrome_store.py
+import json
+import os
+from random import Random
+from models.chrome_records import record_start
+from models.chrome_store import ChromeSegmentStore
+from models.search_index import ChromeSearchIndex, search
+from models.usage_store import UsageStore
+
+DOMAINS = ["example.com", "youtube.com", "github.com"]
+BASE_MS = 1757894400000  # 2025-09-15 00:00
+
+
+def _records(rng, count):
+    records = []
+    for i in range(count):
+        start = BASE_MS + rng.randrange(0, 86400000, 1000)
+        records.append({
+            "domain": rng.choice(DOMAINS),
+            "url": f"https://x/{i}",
+            "start_ms": start,
+            "end_ms": start + rng.randrange(1000, 600000),
+            "duration_ms": 0,
+            "n": i,
+        })
+    return records
+
+
+def _expected(records, start_ms=None, end_ms=None, domain=None):
+    # Start order; ties keep arrival order
+    return [
+        r["n"] for r in sorted(records, key=record_start)
+        if (start_ms is None or r["start_ms"] >= start_ms)
+        and (end_ms is None or r["start_ms"] <= end_ms)
+        and (domain is None or r["domain"] == domain)
+    ]
+
+
+def _numbers(rows):
+    return [record["n"] for _, record in rows]
+
+
+def test_out_of_order_appends_query_in_start_order(tmp_path):
+    rng = Random(1)
+    store = ChromeSegmentStore(str(tmp_path / "segments"))
+    stored = []
+    for _ in range(20):
+        batch = _records(rng, 50)
+        for r in batch:
+            r["n"] = len(stored)
+            stored.append(r)
+        store.append(batch)
+        assert _numbers(store.query()) == _expected(stored)
+
+    start_ms, end_ms = BASE_MS + 3600000, BASE_MS + 7200000
+    assert _numbers(store.query(start_ms, end_ms)) == _expected(stored, start_ms, end_ms)
+    assert _numbers(store.query(domain="github.com")) == _expected(stored, domain="github.com")
+    assert list(store.query(domain="nowhere.org")) == []
+
+    # Pages resumed from their cursors add up to the whole result
+    pages, cursor = [], None
+    while True:
+        page = list(store.query(domain="youtube.com", limit=37, cursor=cursor))
+        pages.extend(page)
+        if len(page) < 37:
+            break
+        cursor = page[-1][0]
+    assert _numbers(pages) == _expected(stored, domain="youtube.com")
+
+
+def test_unsorted_legacy_file_is_sorted_once_and_records_stay_on_disk(tmp_path):
+    rng = Random(2)
+    legacy = _records(rng, 500)
+    legacy_file = tmp_path / "chrome_usage.json"
+    legacy_file.write_text(json.dumps(legacy), encoding="utf-8")
+    store = ChromeSegmentStore(str(tmp_path / "segments"), legacy_file=str(legacy_file))
+    assert _numbers(store.query()) == _expected(legacy)
+
+    # After the migration every record is read back from a segment
+    store.migrate_in_background().join()
+    assert _numbers(store.query()) == _expected(legacy)
+    positions = store._index.positions
+    assert positions.legacy == [] and min(positions.file_ids) >= 0
+
+
+def test_new_records_and_segment_rewrites(tmp_path):
+    rng = Random(3)
+    store = ChromeSegmentStore(str(tmp_path / "segments"))
+    first = _records(rng, 100)
+    store.append(first)
+    position, records, reset = store.new_records()
+    assert reset and [r["n"] for r in records] == [r["n"] for r in first]
+
+    second = _records(rng, 10)
+    store.append(second)
+    position, records, reset = store.new_records(position)
+    assert not reset and [r["n"] for r in records] == [r["n"] for r in second]
+
+    # A rewritten segment (retention, normalization) rebuilds the index
+    name = store.segment_names()[0]
+    kept = first[:30]
+    store._write_segment(os.path.join(store.segment_dir, name), kept)
+    _, records, reset = store.new_records(position)
+    assert reset and [r["n"] for r in records] == [r["n"] for r in kept]
+    assert _numbers(store.query()) == _expected(kept)
+
+
+def test_search_reads_matching_records_back_from_the_store(tmp_path, write_usage):
+    rng = Random(4)
+    store = ChromeSegmentStore(str(tmp_path / "segments"))
+    records = _records(rng, 300)
+    store.append(records)
+    chrome_index = ChromeSearchIndex(store)
+
+    from models.search_index import UsageSearchIndex
+    usage_index = UsageSearchIndex(UsageStore(write_usage({})))
+    result = search(usage_index, chrome_index, "github", limit=5)["chrome"]
+    github = [r for r in records if r["domain"] == "github.com"]
+    assert result["records"] == len(github)
+    newest = sorted(github, key=record_start, reverse=True)[:5]
+    assert [r["start_ms"] for r in result["matches"]] == [r["start_ms"] for r in newest]
+    assert all(r["domain"] == "github.com" for r in result["matches"])
+
+
+def test_downsample_picks_segments_by_record_start(tmp_path):
+    from models.retention import RetentionPolicy, is_downsampled
+
+    def record(day, n):
+        start = BASE_MS + day * 86400000
+        return {"domain": "example.com", "url": f"https://x/{n}", "start_ms": start,
+                "end_ms": start + 60000, "duration_ms": 60000, "n": n}
+
+    segments = {
+        # 2025-09-15 is BASE_MS; a week of retention on 2025-09-25 keeps 09-18 on
+        "chrome-2025-09-15-0001.ndjson": [record(0, 0)],
+        # Synced late: started on 09-16, arrived on 09-24
+        "chrome-2025-09-24-0001.ndjson": [record(1, 1), record(9, 2)],
+        # Still being written today
+        "chrome-2025-09-25-0001.ndjson": [record(2, 3)],
+    }
+    os.makedirs(tmp_path / "segments")
+    for name, records in segments.items():
+        (tmp_path / "segments" / name).write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+    store = ChromeSegmentStore(str(tmp_path / "segments"))
+    policy = RetentionPolicy(7, "hour")
+
+    assert store.downsample(policy, "2025-09-25", "chrome") == 2
+    raw = sorted(r["n"] for r in store.iter_records() if not is_downsampled(r))
+    assert raw == [2, 3]
+    assert store.downsample(policy, "2025-09-25", "chrome") == 0
+    # The next day, today's segment is no longer written and its late record goes too
+    assert store.downsample(policy, "2025-09-26", "chrome") == 1
@@ -0,0 +1,40 @@
+# tests/test_compact_format.py
+import importlib
+from conftest import TRACKER_DIR, session
+
+USAGE = {
+    "2025-09-15": [
+        session("09:00:00", "09:20:00", title="a.py"),
+        session("09:20:00", "10:10:00", "chrome.exe", "docs"),
+        session("10:10:00", "10:15:30", title="a.py", duration=300),
+        session("23:40:00", "00:25:00", "chrome.exe", "video"),
+        {"start": "12:00:00", "end": "12:01:00", "app": "bad.exe", "duration": "x"},
+        {"start": "nonsense", "app": 7, "title": None},
+        "not a session",
+    ],
+    "2025-09-16": [session("00:25:00", "01:00:00", end_reason="idle")],
+    "2025-09-17": [],
+}
+
+
+def _codecs(monkeypatch):
+    backend = importlib.import_module("models.compact_format")
+    monkeypatch.syspath_prepend(TRACKER_DIR)
+    return backend, importlib.import_module("compact_format")
+
+
+def test_the_backend_and_tracker_copies_agree(monkeypatch):
+    backend, tracker = _codecs(monkeypatch)
+    doc = backend.encode(USAGE)
+    assert doc == tracker.encode(USAGE)
+    assert backend.decode(doc) == tracker.decode(doc)
+    assert backend.is_compact(doc) and tracker.is_compact(doc)
+    assert not backend.is_compact(USAGE) and not tracker.is_compact(USAGE)
+
+
+def test_a_round_trip_keeps_every_session(monkeypatch):
+    backend, _ = _codecs(monkeypatch)
+    decoded = backend.decode(backend.encode(USAGE))
+    assert decoded["2025-09-15"][:4] == USAGE["2025-09-15"][:4]
+    assert decoded["2025-09-16"] == USAGE["2025-09-16"]
+    assert decoded["2025-09-17"] == []
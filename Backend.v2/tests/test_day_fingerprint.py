@@ -0,0 +1,35 @@
+# tests/test_day_fingerprint.py
+import json
+from conftest import session
+from models.snapshot import MappedUsageStore, SnapshotPublisher
+from models.usage_store import UsageStore
+
+
+def _days(middle_app):
+    # Same session count, total and last session; only a session in the middle differs
+    return {"2025-09-15": [
+        session("09:00:00", "09:30:00", "Code.exe"),
+        session("09:30:00", "10:00:00", middle_app),
+        session("10:00:00", "10:10:00", "Code.exe"),
+    ]}
+
+
+def test_rewriting_a_past_day_changes_its_fingerprint(write_usage):
+    path = write_usage(_days("chrome.exe"))
+    store = UsageStore(path)
+    before = store.day_fingerprint("2025-09-15")
+    assert store.day_fingerprint("2025-09-15") == before
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(_days("slack.exe"), f)
+        f.write(" ")  # a different size, as a real rewrite would have
+    assert store.day_fingerprint("2025-09-15") != before
+    assert store.day_fingerprint("2025-09-16") == "empty"
+
+
+def test_snapshot_workers_agree_with_the_store(write_usage, tmp_path):
+    store = UsageStore(write_usage(_days("chrome.exe")))
+    SnapshotPublisher(store, str(tmp_path / "snapshots")).publish()
+    mapped = MappedUsageStore(str(tmp_path / "snapshots"))
+    assert mapped.day_fingerprint("2025-09-15") == store.day_fingerprint("2025-09-15")
+    assert mapped.day_fingerprint("2025-09-16") == "empty"
@@ -0,0 +1,99 @@
+# tests/test_device_push.py
+import json
+import os
+import pytest
+from conftest import session
+
+DATE = "2025-09-16"
+
+
+@pytest.fixture
+def devices_dir(tmp_path, monkeypatch):
+    """An empty DEVICE_DATA_DIR, with the ingest writer forgetting earlier tests' writers"""
+    from config import Config
+    from models.devices import ingest_queue
+    monkeypatch.setattr(Config, "DEVICE_DATA_DIR", str(tmp_path / "devices"))
+    monkeypatch.setattr(Config, "RETENTION_DAYS", None)
+    monkeypatch.setattr(ingest_queue, "_writers", {})
+    return tmp_path / "devices"
+
+
+def _push(client, device, entries):
+    from models.devices import ingest_queue
+    response = client.post(f"/api/devices/{device}/sessions", json=entries)
+    ingest_queue.join()
+    return response
+
+
+def _stored(devices_dir, device):
+    from config import Config
+    path = devices_dir / device / f"app_usage{Config.CHROME_WRITER_TAG}" / f"{DATE}.json"
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _entry(start, end, app="Code.exe", date=DATE):
+    return dict(session(start, end, app), date=date)
+
+
+@pytest.mark.parametrize("field, value", [
+    ("date", "2025-9-16"),
+    ("date", "2025-02-30"),
+    ("date", 20250916),
+    ("start", "9:00:00"),
+    ("start", "24:00:00"),
+    ("end", "10:00"),
+    ("end", "10:00:00.5"),
+    ("session_id", 7),
+    ("session_id", "x" * 65),
+])
+def test_malformed_dates_and_times_are_rejected(client, devices_dir, field, value):
+    entry = dict(_entry("09:00:00", "10:00:00"), **{field: value})
+
+    assert client.post("/api/devices/laptop/sessions", json=[entry]).status_code == 400
+    assert not devices_dir.exists()
+
+
+def test_a_retried_push_is_stored_once(client, devices_dir):
+    batch = [_entry("09:00:00", "10:00:00"), _entry("10:00:00", "10:30:00", "chrome.exe")]
+
+    assert _push(client, "laptop", batch).status_code == 202
+    assert _push(client, "laptop", batch).status_code == 202
+    assert _push(client, "laptop", batch + [_entry("11:00:00", "11:05:00")]).status_code == 202
+
+    assert [(s["start"], s["app"]) for s in _stored(devices_dir, "laptop")] == [
+        ("09:00:00", "Code.exe"), ("10:00:00", "chrome.exe"), ("11:00:00", "Code.exe"),
+    ]
+
+
+def test_sessions_starting_in_the_same_second_are_all_kept(client, devices_dir):
+    # The tracker logs one-second clocks, so a quick switch away and back can
+    # give two sessions of one app with the same start
+    with_ids = [dict(_entry("09:00:00", "09:00:00"), session_id=sid) for sid in ("a1", "b2")]
+    without_ids = [_entry("10:00:00", "10:00:01"), _entry("10:00:00", "10:00:00")]
+
+    for _ in range(2):
+        assert _push(client, "laptop", with_ids + without_ids).status_code == 202
+
+    stored = _stored(devices_dir, "laptop")
+    assert [(s["start"], s.get("session_id")) for s in stored] == [
+        ("09:00:00", "a1"), ("09:00:00", "b2"), ("10:00:00", None), ("10:00:00", None),
+    ]
+
+
+def test_one_device_failing_does_not_drop_another(client, devices_dir, capsys):
+    from config import Config
+    from models.devices import ingest_queue
+
+    # A file where the device's partition folder should be makes its writes fail
+    blocked = devices_dir / "broken" / f"app_usage{Config.CHROME_WRITER_TAG}"
+    os.makedirs(blocked.parent)
+    blocked.write_text("", encoding="utf-8")
+
+    ingest_queue.submit("broken", [_entry("08:00:00", "08:30:00")])
+    ingest_queue.submit("laptop", [_entry("09:00:00", "10:00:00")])
+    ingest_queue.join()
+
+    assert [s["start"] for s in _stored(devices_dir, "laptop")] == ["09:00:00"]
+    failed = (devices_dir / "broken" / "failed_sessions.ndjson").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["start"] for line in failed] == ["08:00:00"]
+    assert "Error writing pushed sessions of broken" in capsys.readouterr().out
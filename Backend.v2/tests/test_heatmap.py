@@ -0,0 +1,22 @@
+# tests/test_heatmap.py
+from datetime import date
+from conftest import session
+from models.heatmap import HeatmapIndex
+from models.sunBurst_Chart import LogAnalyzer
+
+
+def test_only_known_apps_are_cached(write_usage):
+    index = HeatmapIndex(LogAnalyzer(write_usage({
+        "2025-09-15": [session("09:00:00", "10:30:00"), session("10:30:00", "11:00:00", "chrome.exe")],
+    })))
+    start, end = date(2025, 9, 1), date(2025, 9, 30)
+
+    code = index.range_matrix(start, end, "code.exe")
+    assert code[0][9] == 3600 and code[0][10] == 1800
+    assert index.range_matrix(start, end)[0][10] == 3600
+    cached = (len(index._days), len(index._months))
+
+    for i in range(50):
+        assert index.range_matrix(start, end, f"no-such-app-{i}") == [[0] * 24 for _ in range(7)]
+    assert (len(index._days), len(index._months)) == cached
+    assert index.range_matrix(start, end, "code.exe") == code
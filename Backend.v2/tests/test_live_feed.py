@@ -0,0 +1,48 @@
+# tests/test_live_feed.py
+import json
+from config import Config
+from conftest import session
+from models.live_feed import LiveFeed, Subscription
+from models.sunBurst_Chart import LogAnalyzer
+from models.usage_store import day_epoch
+
+
+def _record(date, minute):
+    start = day_epoch(date) * 1000 + minute * 60000
+    return {"domain": "example.com", "url": f"https://example.com/{minute}",
+            "start_ms": start, "end_ms": start + 30000, "duration_ms": 30000}
+
+
+def _events(subscription):
+    events = []
+    while (item := subscription.get(0)) is not None:
+        events.append(item[1:])
+    return events
+
+
+def test_chrome_records_are_sent_in_arrival_order_and_rewrites_resync(write_usage, chrome, tmp_path, monkeypatch):
+    path = write_usage({"2025-09-15": [session("09:00:00", "09:30:00")]})
+    monkeypatch.setattr(Config, "JSON_FILE", path)
+    chrome.append([_record("2025-09-15", 600)])
+    feed = LiveFeed(LogAnalyzer(path))
+    subscription = Subscription(100)
+    feed._subscribers.add(subscription)
+    feed._baseline()
+
+    # Arrives after a record with a later start: it is still sent
+    chrome.append([_record("2025-09-15", 60)])
+    feed.poll()
+    [(event, data)] = _events(subscription)
+    assert event == "chrome"
+    assert [r["url"] for r in data["records"]] == ["https://example.com/60"]
+
+    feed.poll()
+    assert _events(subscription) == []
+
+    # The legacy file changes under the store: clients refetch
+    (tmp_path / "chrome_usage.json").write_text(json.dumps([_record("2025-09-14", 0)]), encoding="utf-8")
+    feed.poll()
+    assert _events(subscription) == [("resync", {"reason": "chrome records rewritten"})]
+    chrome.append([_record("2025-09-15", 61)])
+    feed.poll()
+    assert [r["url"] for event, data in _events(subscription) for r in data["records"]] == ["https://example.com/61"]
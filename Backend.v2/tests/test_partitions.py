@@ -0,0 +1,80 @@
+# tests/test_partitions.py
+import json
+from datetime import datetime, timedelta
+from conftest import TRACKER_DIR
+from models.partitions import PartitionedUsageStore, PartitionWriter
+from models.retention import RetentionPolicy
+
+START = datetime(2025, 7, 1, 9, 0, 0)
+
+
+def _tracker(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(TRACKER_DIR)
+    from data_manager import PartitionedDataManager
+    return PartitionedDataManager(str(tmp_path), compress_after_days=7, compression="gzip")
+
+
+def _log(manager, day, minute=0, app="Code.exe"):
+    start = START + timedelta(days=day, minutes=minute)
+    manager.log_app_change({"app_name": app, "window_title": ""}, start, start + timedelta(seconds=30), 30)
+
+
+def test_backend_reads_what_the_tracker_writes(tmp_path, monkeypatch):
+    manager = _tracker(tmp_path, monkeypatch)
+    for day in range(60):
+        _log(manager, day)
+    _log(manager, 59, minute=1, app="chrome.exe")
+
+    store = PartitionedUsageStore(str(tmp_path))
+    assert len(store.dates()) == 60
+    assert [s.app for s in store.get_day("2025-07-01")] == ["Code.exe"]  # compressed
+    assert [s.app for s in store.get_day("2025-08-29")] == ["Code.exe", "chrome.exe"]
+    assert store.rollup("2025-08-29").app_seconds == {"code.exe": 30, "chrome.exe": 30}
+    assert store.all_time_rollup().total_seconds == 61 * 30
+    assert store.day_version("2025-08-29") == store.version
+    assert store.period_version("month", "2025-08") == store.version
+    assert store.period_version("month", "2025-07") < store.version
+
+    # Only the month that changed is read again
+    july = store._manifest.months["2025-07"]
+    _log(manager, 59, minute=2)
+    store.refresh()
+    assert store._manifest.months["2025-07"] is july
+    assert store.rollup("2025-08-29").session_count == 3
+
+
+def _write_v1(path):
+    path.mkdir()
+    (path / "2025-07-01.json").write_text(json.dumps([{"start": "09:00:00", "end": "09:00:30",
+        "app": "Code.exe", "title": "", "duration": 30, "end_reason": "app_switch"}]), encoding="utf-8")
+    day = {"file": "2025-07-01.json", "revision": 1, "sessions": 1, "total_seconds": 30, "apps": [["Code.exe", 30]]}
+    (path / "manifest.json").write_text(json.dumps(
+        {"format": "partitions-v1", "revision": 1, "days": {"2025-07-01": day}}), encoding="utf-8")
+
+
+def test_partitions_v1_are_read_and_converted_by_the_writer(tmp_path):
+    _write_v1(tmp_path / "device")
+    store = PartitionedUsageStore(str(tmp_path / "device"))
+    assert store.rollup("2025-07-01").total_seconds == 30
+
+    writer = PartitionWriter(str(tmp_path / "device"))
+    writer.append("2025-07-02", [{"start": "10:00:00", "end": "10:01:00", "app": "Code.exe", "title": "",
+                                  "duration": 60, "end_reason": "app_switch"}])
+    with open(tmp_path / "device" / "manifest.json", encoding="utf-8") as f:
+        assert json.load(f)["format"] == "partitions-v2"
+    assert list(store.dates()) == ["2025-07-01", "2025-07-02"]
+    assert store.all_time_rollup().total_seconds == 90
+
+
+def test_writer_downsamples_cold_days(tmp_path):
+    writer = PartitionWriter(str(tmp_path))
+    minutes = [{"start": f"09:{m:02d}:00", "end": f"09:{m:02d}:30", "app": "Code.exe", "title": "",
+                "duration": 30, "end_reason": "app_switch"} for m in range(10)]
+    writer.append("2025-07-01", minutes)
+    writer.append("2025-07-20", minutes[:1])
+
+    assert writer.downsample_cold_days(RetentionPolicy(7), "2025-07-20", "app_usage") == ["2025-07-01"]
+    store = PartitionedUsageStore(str(tmp_path))
+    assert store.rollup("2025-07-01").total_seconds == 300
+    assert store.rollup("2025-07-01").session_count == 1
+    assert writer.downsample_cold_days(RetentionPolicy(7), "2025-07-20", "app_usage") == []
@@ -0,0 +1,41 @@
+# tests/test_range_analytics.py
+from datetime import date, timedelta
+import pytest
+from config import Config
+from models.range_analytics import RollupIndex, parse_range
+from models.rollups import merge_rollups
+from models.usage_store import UsageStore
+from conftest import session
+
+
+def test_parse_range_rejects_long_spans():
+    assert parse_range("2025-01-01", "2025-12-31") == (date(2025, 1, 1), date(2025, 12, 31))
+    with pytest.raises(ValueError):
+        parse_range("1900-01-01", "2099-12-31")
+    with pytest.raises(ValueError):
+        parse_range("2020-01-01", "2025-12-31", max_days=Config.RANGE_MAX_DAYS_DAILY)
+    with pytest.raises(ValueError):
+        parse_range("2025-02-01", "2025-01-01")
+    with pytest.raises(ValueError):
+        parse_range("2025-1-1", "2025-01-02")
+
+
+def test_range_rollup_switches_to_months_after_a_week_crosses_a_month(write_usage):
+    first = date(2025, 1, 20)
+    data = {}
+    for i in range(120):
+        day = (first + timedelta(days=i)).isoformat()
+        data[day] = [session("09:00:00", "09:10:00", "Code.exe"), session("10:00:00", "10:00:0" + str(i % 10), "chrome.exe")]
+    index = RollupIndex(UsageStore(write_usage(data)))
+
+    months = []
+    month = index.month
+    index.month = lambda day: months.append(day) or month(day)
+
+    # Monday 2025-01-27: its week runs into February, which the range covers whole
+    start, end = date(2025, 1, 27), date(2025, 4, 30)
+    rollup = index.range_rollup(start, end)
+    assert months == [date(2025, 2, 1), date(2025, 3, 1), date(2025, 4, 1)]
+
+    days = [index.day(start + timedelta(days=i)) for i in range((end - start).days + 1)]
+    assert rollup == merge_rollups(days)
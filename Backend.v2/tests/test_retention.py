@@ -0,0 +1,114 @@
+# tests/test_retention.py
+import importlib
+from random import Random
+import pytest
+from conftest import TRACKER_DIR, session
+from models.heatmap import hour_buckets
+from models.sunBurst_Chart import LogAnalyzer
+from models.usage_store import day_epoch, parse_clock
+
+DAY, NEXT = "2025-09-15", "2025-09-16"
+SESSIONS = {
+    DAY: [
+        session("09:00:00", "09:20:00", title="a.py"),
+        session("09:20:00", "10:10:00", "chrome.exe", "docs"),
+        session("10:10:00", "10:15:00", title="b.py"),
+        session("23:10:00", "23:40:00", title="a.py"),
+        session("23:40:00", "00:25:00", "chrome.exe", "video"),
+    ],
+    NEXT: [session("00:25:00", "01:00:00")],
+}
+
+
+@pytest.fixture(params=["backend", "tracker"])
+def downsample_sessions(request, monkeypatch):
+    """The backend's and the tracker's copy of downsample_sessions"""
+    if request.param == "backend":
+        return importlib.import_module("models.retention").downsample_sessions
+    monkeypatch.syspath_prepend(TRACKER_DIR)
+    return importlib.import_module("retention").downsample_sessions
+
+
+def _bucket_totals(entries, bucket_seconds):
+    """{(bucket, app): seconds} of the day and {app: seconds} after midnight"""
+    totals, past = {}, {}
+    for entry in entries:
+        t, remaining = parse_clock(entry["start"]), entry["duration"]
+        while remaining and t < 86400:
+            part = min(remaining, t - t % bucket_seconds + bucket_seconds - t)
+            key = (t - t % bucket_seconds, entry["app"])
+            totals[key] = totals.get(key, 0) + part
+            t, remaining = t + part, remaining - part
+        if remaining:
+            past[entry["app"]] = past.get(entry["app"], 0) + remaining
+    return totals, past
+
+
+def _hours(write_usage, data):
+    """Seconds per hour of both days, as the analytics read them"""
+    analyzer = LogAnalyzer(write_usage(data))
+    return {
+        date: hour_buckets(columns.starts, columns.ends, day_epoch(date))
+        for date, columns in ((d, analyzer.day_columns(d)) for d in (DAY, NEXT))
+    }
+
+
+@pytest.mark.parametrize("bucket_seconds", [60, 3600])
+def test_downsampling_keeps_bucket_totals(downsample_sessions, bucket_seconds):
+    downsampled = downsample_sessions(SESSIONS[DAY], bucket_seconds)
+
+    assert _bucket_totals(downsampled, bucket_seconds) == _bucket_totals(SESSIONS[DAY], bucket_seconds)
+    assert [e["start"] for e in downsampled] == sorted(e["start"] for e in downsampled)
+
+
+@pytest.mark.parametrize("bucket_seconds", [60, 3600])
+def test_time_past_midnight_stays_with_the_session_that_crossed(downsample_sessions, write_usage, bucket_seconds):
+    downsampled = downsample_sessions(SESSIONS[DAY], bucket_seconds)
+
+    assert [e for e in downsampled if e["end"] < e["start"]] == [{
+        "start": "23:40:00", "end": "00:25:00", "app": "chrome.exe", "title": "video",
+        "duration": 2700, "end_reason": "downsampled",
+    }]
+    assert _hours(write_usage, dict(SESSIONS, **{DAY: downsampled})) == _hours(write_usage, SESSIONS)
+
+
+def test_a_full_last_bucket_is_not_packed_past_midnight(downsample_sessions):
+    # Overlapping sessions (clock changes, old bugs) hold more time than the hour has
+    overlapping = [session("23:00:00", "23:50:00"), session("23:10:00", "23:55:00", "chrome.exe")]
+
+    downsampled = downsample_sessions(overlapping, 3600)
+    assert all(parse_clock(e["start"]) + e["duration"] <= 86400 for e in downsampled)
+    assert {e["app"]: e["duration"] for e in downsampled} == {"Code.exe": 3000, "chrome.exe": 2700}
+
+
+def _random_day(rng):
+    """Sessions as the tracker and pushed devices produce them, including overlaps,
+    sessions past midnight and entries that do not parse"""
+    entries = []
+    t = rng.randrange(0, 3600)
+    while t < 86400:
+        duration = rng.choice([0, 1, 2, 3, 45, 600, 4000])
+        entries.append({
+            "start": f"{t // 3600:02d}:{t % 3600 // 60:02d}:{t % 60:02d}",
+            "end": "",
+            "app": rng.choice(["Code.exe", "chrome.exe", "slack.exe"]),
+            "title": rng.choice(["a", "b", ""]),
+            "duration": duration,
+            "end_reason": "app_switch",
+        })
+        t += duration - rng.choice([0, 0, 0, 30]) + rng.randrange(0, 900)
+    entries.insert(rng.randrange(len(entries)), {"start": "12:00:00", "duration": "x", "app": "bad.exe"})
+    entries.append("not a session")
+    return entries
+
+
+def test_the_backend_and_tracker_copies_agree(monkeypatch):
+    backend = importlib.import_module("models.retention").downsample_sessions
+    monkeypatch.syspath_prepend(TRACKER_DIR)
+    tracker = importlib.import_module("retention").downsample_sessions
+
+    rng = Random(24)
+    for _ in range(20):
+        entries = _random_day(rng)
+        for bucket_seconds in (60, 3600):
+            assert backend(entries, bucket_seconds) == tracker(entries, bucket_seconds)
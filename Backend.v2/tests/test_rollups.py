@@ -0,0 +1,73 @@
+# tests/test_rollups.py
+import json
+from conftest import session
+from manage import main
+from models.partitions import write_partitions
+from models.rollups import rollup_sessions
+from models.usage_store import UsageStore, session_from_entry
+
+DAYS = {
+    "2025-09-15": [session("09:00:00", "09:30:00"), session("09:30:00", "09:31:00", "chrome.exe")],
+    "2025-09-16": [session("10:00:00", "10:05:00", "Chrome.exe")],
+}
+
+
+def _tamper(path, change):
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    change(raw)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(raw, f)
+
+
+def test_rollups_are_saved_and_reused_while_the_day_is_unchanged(write_usage):
+    path = write_usage(DAYS)
+    UsageStore(path).refresh()
+
+    def double(raw):
+        raw["days"]["2025-09-15"]["total_seconds"] *= 2
+    _tamper(f"{path}.rollups", double)
+    # Saved totals are taken as they are while the day's fingerprint matches...
+    assert UsageStore(path).rollup("2025-09-15").total_seconds == 2 * 1860
+
+    # ...and folded again once its sessions change
+    write_usage(dict(DAYS, **{"2025-09-15": DAYS["2025-09-15"] + [session("11:00:00", "11:00:10")]}))
+    assert UsageStore(path).rollup("2025-09-15").total_seconds == 1870
+
+
+def test_rebuild_rollups_checks_and_rewrites_the_saved_rollups(write_usage, capsys):
+    path = write_usage(DAYS)
+    assert main(["rebuild-rollups", "--json-file", path, "--check"]) == 0
+    assert "2 days are not saved" in capsys.readouterr().out
+
+    UsageStore(path).refresh()
+    assert main(["rebuild-rollups", "--json-file", path, "--check"]) == 0
+
+    def move(raw):
+        raw["days"]["2025-09-16"]["apps"] = [["code.exe", 300]]
+    _tamper(f"{path}.rollups", move)
+    assert main(["rebuild-rollups", "--json-file", path, "--check"]) == 1
+    assert "differ from the raw sessions on 1 days: 2025-09-16" in capsys.readouterr().out
+
+    assert main(["rebuild-rollups", "--json-file", path]) == 0
+    assert main(["rebuild-rollups", "--json-file", path, "--check"]) == 0
+    assert UsageStore(path).rollup("2025-09-16").app_seconds == {"chrome.exe": 300}
+
+
+def test_rebuild_rollups_checks_partition_indexes(tmp_path, capsys):
+    folder = str(tmp_path / "days")
+    write_partitions(DAYS, folder)
+    assert main(["rebuild-rollups", "--partition-dir", folder, "--check"]) == 0
+
+    def drop(raw):
+        raw["days"]["2025-09-15"]["sessions"] = 1
+    _tamper(str(tmp_path / "days" / "2025-09.index.json"), drop)
+    assert main(["rebuild-rollups", "--partition-dir", folder, "--check"]) == 1
+    assert "on 1 days: 2025-09-15" in capsys.readouterr().out
+
+    assert main(["rebuild-rollups", "--partition-dir", folder]) == 0
+    assert main(["rebuild-rollups", "--partition-dir", folder, "--check"]) == 0
+    with open(tmp_path / "days" / "2025-09.index.json", encoding="utf-8") as f:
+        entry = json.load(f)["days"]["2025-09-15"]
+    expected = rollup_sessions(session_from_entry(e) for e in DAYS["2025-09-15"])
+    assert (entry["sessions"], entry["total_seconds"]) == (expected.session_count, expected.total_seconds)
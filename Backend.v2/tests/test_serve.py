@@ -0,0 +1,21 @@
+# tests/test_serve.py
+from conftest import session
+
+
+def test_the_supervisor_starts_the_retention_job(chrome, write_usage, tmp_path, monkeypatch):
+    import models.retention
+    import serve
+    from config import Config
+
+    started = []
+    monkeypatch.setattr(models.retention, "start_retention_job", lambda: started.append(True))
+    monkeypatch.setattr(Config, "JSON_FILE", write_usage({"2025-09-15": [session("09:00:00", "09:30:00")]}))
+    monkeypatch.setattr(Config, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+
+    publisher, snapshot_dir = serve._start_background_jobs()
+    try:
+        assert started == [True]
+        assert snapshot_dir == str(tmp_path / "snapshots")
+        assert (tmp_path / "snapshots" / "CURRENT").exists()
+    finally:
+        publisher.stop()
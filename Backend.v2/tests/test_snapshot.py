@@ -0,0 +1,89 @@
+# tests/test_snapshot.py
+import json
+import os
+from conftest import session
+from models.snapshot import CURRENT, MappedUsageStore, Snapshot, SnapshotPublisher
+from models.usage_store import UsageStore
+
+
+def _history(days):
+    """A month of earlier days, so a delta of a day or two is much smaller than the full file"""
+    history = {
+        f"2025-08-{day:02d}": [session(f"{hour:02d}:00:00", f"{hour:02d}:30:00") for hour in range(8, 18)]
+        for day in range(1, 31)
+    }
+    history.update(days)
+    return history
+
+
+def _append(path, date, *sessions):
+    with open(f"{path}.journal", "a", encoding="utf-8") as f:
+        for s in sessions:
+            f.write(json.dumps(dict(s, date=date)) + "\n")
+
+
+def _current(snapshot_dir):
+    with open(os.path.join(snapshot_dir, CURRENT), encoding="utf-8") as f:
+        return f.read().split()
+
+
+def _assert_same(mapped, store):
+    assert list(mapped.dates()) == list(store.dates())
+    for date in store.dates():
+        assert mapped.get_day(date) == store.get_day(date)
+        assert mapped.rollup(date) == store.rollup(date)
+        assert mapped.day_version(date) == store.day_version(date)
+    for key in store.export_state()["period_versions"]:
+        assert mapped.period_version(*key) == store.period_version(*key)
+    assert mapped.all_time_rollup() == store.all_time_rollup()
+    assert mapped.fingerprint() == store.fingerprint()
+
+
+def test_publishes_only_the_changed_days(write_usage, tmp_path):
+    path = write_usage(_history({
+        "2025-09-14": [session("09:00:00", "10:00:00")],
+        "2025-09-15": [session("09:00:00", "09:30:00", "chrome.exe")],
+    }))
+    store = UsageStore(path)
+    snapshot_dir = str(tmp_path / "snapshots")
+    publisher = SnapshotPublisher(store, snapshot_dir)
+    mapped = MappedUsageStore(snapshot_dir)
+
+    assert publisher.publish()
+    _assert_same(mapped, store)
+    assert not publisher.publish()
+
+    _append(path, "2025-09-15", session("09:30:00", "09:45:00", "slack.exe"))
+    _append(path, "2025-09-16", session("08:00:00", "08:05:00"))
+    assert publisher.publish()
+    full, delta = _current(snapshot_dir)
+    assert list(Snapshot(os.path.join(snapshot_dir, delta)).day_index) == ["2025-09-15", "2025-09-16"]
+    _assert_same(mapped, store)
+
+    # A rewrite that drops a day
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(_history({"2025-09-15": [session("09:00:00", "09:30:00", "chrome.exe")]}), f)
+    os.remove(f"{path}.journal")
+    assert publisher.publish()
+    assert Snapshot(os.path.join(snapshot_dir, _current(snapshot_dir)[-1])).removed == ["2025-09-14", "2025-09-16"]
+    _assert_same(mapped, store)
+    assert mapped.get_day("2025-09-14") == ()
+
+
+def test_writes_every_day_again_after_max_deltas(write_usage, tmp_path):
+    path = write_usage(_history({"2025-09-15": [session("09:00:00", "09:30:00")]}))
+    store = UsageStore(path)
+    snapshot_dir = str(tmp_path / "snapshots")
+    publisher = SnapshotPublisher(store, snapshot_dir, max_deltas=2)
+    mapped = MappedUsageStore(snapshot_dir)
+    publisher.publish()
+
+    for minute in range(4):
+        _append(path, "2025-09-16", session(f"10:0{minute}:00", f"10:0{minute}:30"))
+        publisher.publish()
+        _assert_same(mapped, store)
+    chain = _current(snapshot_dir)
+    assert len(chain) == 2
+    assert list(Snapshot(os.path.join(snapshot_dir, chain[0])).day_index)[-2:] == ["2025-09-15", "2025-09-16"]
+    # Only the files of this CURRENT and the one before it are kept
+    assert len([n for n in os.listdir(snapshot_dir) if n.endswith(".snap")]) <= 4
@@ -0,0 +1,76 @@
+# tests/test_sqlite_store.py
+import os
+import sqlite3
+import pytest
+from models.chrome_store import ChromeSegmentStore
+from models.sqlite_store import SQLiteChromeStore, SQLiteUsageStore, get_database, migrate_from_json
+from models.usage_store import UsageStore
+from conftest import TRACKER_DIR, session
+
+
+def _chrome_record(minute):
+    return {
+        "domain": "example.com",
+        "url": f"https://example.com/{minute}",
+        "start_time": f"2025-09-15T10:{minute:02d}:00.000Z",
+        "end_time": f"2025-09-15T10:{minute:02d}:30.000Z",
+    }
+
+
+def _sources(tmp_path, write_usage):
+    usage = UsageStore(write_usage({
+        "2025-09-15": [session("09:00:00", "09:30:00"), session("09:30:00", "10:00:00", "chrome.exe")],
+    }))
+    chrome = ChromeSegmentStore(str(tmp_path / "segments"))
+    chrome.append([_chrome_record(m) for m in range(3)])
+    return usage, chrome
+
+
+def test_migrate_copies_both_stores(tmp_path, write_usage):
+    usage, chrome = _sources(tmp_path, write_usage)
+    db_file = str(tmp_path / "activity.db")
+    assert migrate_from_json(db_file, usage, chrome) == (2, 3)
+    with pytest.raises(RuntimeError):
+        migrate_from_json(db_file, usage, chrome)
+
+
+def test_failed_migration_leaves_the_database_empty(tmp_path, write_usage, monkeypatch):
+    usage, chrome = _sources(tmp_path, write_usage)
+    db_file = str(tmp_path / "activity.db")
+
+    def broken_records():
+        yield _chrome_record(0)
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(chrome, "iter_records", broken_records)
+    with pytest.raises(RuntimeError):
+        migrate_from_json(db_file, usage, chrome)
+    db = get_database(db_file)
+    assert SQLiteUsageStore(db).count() == 0
+    assert SQLiteChromeStore(db).count() == 0
+
+    monkeypatch.undo()
+    assert migrate_from_json(db_file, usage, chrome) == (2, 3)
+
+
+def test_backend_reads_what_the_tracker_writes(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(TRACKER_DIR)
+    from datetime import datetime
+    from data_manager import SQLiteDataManager
+
+    # The tracker creates the database's folder
+    db_file = str(tmp_path / "new folder" / "activity.db")
+    manager = SQLiteDataManager(db_file)
+    start = datetime(2025, 9, 15, 9, 0, 0)
+    manager.log_app_change({"app_name": "Code.exe", "window_title": "main.py"}, start, start.replace(minute=5), 300)
+    manager.close()
+
+    store = SQLiteUsageStore(get_database(db_file))
+    assert [(s.start, s.end, s.app, s.duration) for s in store.get_day("2025-09-15")] == [(32400, 32700, "Code.exe", 300)]
+    assert store.rollup("2025-09-15").total_seconds == 300
+
+
+def test_the_schema_copies_are_the_same():
+    from models.sqlite_store import APP_SCHEMA_FILE
+    with open(APP_SCHEMA_FILE, "rb") as ours, open(os.path.join(TRACKER_DIR, "app_sessions.sql"), "rb") as theirs:
+        assert ours.read() == theirs.read()
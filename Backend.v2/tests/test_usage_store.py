@@ -0,0 +1,27 @@
+# tests/test_usage_store.py
+import pytest
+from models.usage_store import UsageStore
+
+COMPACT = {
+    "format": "compact-v1",
+    "apps": ["Code.exe"], "titles": [""], "reasons": ["app_switch"],
+    "days": {"2025-09-15": [[32400, 600, 0, 0, 0]]},
+}
+
+
+def test_reads_a_compact_file(write_usage):
+    store = UsageStore(write_usage(COMPACT))
+    [s] = store.get_day("2025-09-15")
+    assert (s.start, s.end, s.app) == (32400, 33000, "Code.exe")
+
+
+@pytest.mark.parametrize("broken", [
+    {key: value for key, value in COMPACT.items() if key != "titles"},
+    dict(COMPACT, days={"2025-09-15": [[32400, 600, 5, 0, 0]]}),
+    dict(COMPACT, days={"2025-09-15": [[32400]]}),
+    dict(COMPACT, days=[]),
+])
+def test_a_broken_compact_file_reads_as_empty(write_usage, capsys, broken):
+    store = UsageStore(write_usage(broken))
+    assert store.days() == {}
+    assert "Error decoding compact file" in capsys.readouterr().out